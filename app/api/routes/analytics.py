@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, status
+from app.models.schemas import PriceStatsRequest, PriceStatsResponse, PriceStatsGroup
+from app.services.price_stats import grouped_stats
+from app.services.runtime import runtime
+from starlette.concurrency import run_in_threadpool
+from datetime import date, timedelta
+import time
+
+router = APIRouter(prefix="/api/v1/analytics", tags=["Analytics"])
+
+# Días desde 1970-01-01 (los días del resumen diario del historial)
+EPOCH = date(1970, 1, 1)
+
+
+def _price_stats(request: PriceStatsRequest) -> PriceStatsResponse:
+    """Lee el resumen diario del historial y calcula las estadísticas por grupo"""
+    history = runtime.price_history
+    last_day = (request.hasta - EPOCH).days if request.hasta else history.day(time.time())
+    first_day = (request.desde - EPOCH).days if request.desde else last_day - 29
+    if first_day > last_day:
+        raise HTTPException(status_code=422, detail="'desde' no puede ser posterior a 'hasta'")
+
+    # Los días previos al rango alimentan la ventana móvil del primer día
+    window = request.ventana_dias if "dia" in request.agrupar_por else 1
+    summary = history.daily_summary(
+        request.nombre_medicamento,
+        first_day - (window - 1),
+        last_day,
+        producto=request.producto,
+        departamento=request.departamento,
+        provincia=request.provincia,
+        distrito=request.distrito
+    )
+    groups = grouped_stats(
+        summary,
+        group_by=request.agrupar_por,
+        percentiles=request.percentiles,
+        window_days=window,
+        first_day=first_day,
+        last_day=last_day
+    )
+    for group in groups:
+        if "dia" in group:
+            group["dia"] = EPOCH + timedelta(days=int(group["dia"]))
+
+    return PriceStatsResponse(
+        success=bool(groups),
+        desde=EPOCH + timedelta(days=first_day),
+        hasta=EPOCH + timedelta(days=last_day),
+        # Cada precio del resumen ocupa 8 bytes (float64); el resumen trae días previos para las ventanas móviles
+        total_precios=sum(len(row[3]) // 8 for row in summary if first_day <= row[0] <= last_day),
+        grupos=[PriceStatsGroup(**group) for group in groups]
+    )
+
+
+@router.post("/prices", response_model=PriceStatsResponse)
+async def get_price_stats(request: PriceStatsRequest):
+    """
+    Estadísticas de precio unitario desde el historial de DIGEMID
+
+    Calcula mínimo, promedio, mediana, percentiles y máximo del precio
+    unitario por día, distrito y/o producto (`agrupar_por`), sin consultar
+    DIGEMID. Se usa el resumen diario del historial: el último precio de cada
+    producto en cada farmacia por día. Con `ventana_dias` mayor que 1 y
+    agrupación por día, cada día resume la ventana móvil que termina en él.
+    """
+    if runtime.price_history is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El historial de precios está desactivado (PRICE_HISTORY_ENABLED)"
+        )
+    if not request.agrupar_por:
+        raise HTTPException(status_code=422, detail="Debe indicar al menos una dimensión en 'agrupar_por'")
+    if any(not 0 <= q <= 100 for q in request.percentiles):
+        raise HTTPException(status_code=422, detail="Los percentiles deben estar entre 0 y 100")
+    return await run_in_threadpool(_price_stats, request)
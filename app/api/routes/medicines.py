@@ -1,57 +1,243 @@
-from fastapi import APIRouter, HTTPException, status
-from app.models.schemas import MedicineSearchRequest, MedicineSearchResponse, MedicineResult
+from fastapi import APIRouter, Header, HTTPException, status
+from app.models.schemas import (
+    MedicineSearchRequest, MedicineSearchResponse, MedicineResult,
+    BasketItem, BasketRequest, BasketResponse, BasketPharmacy, BasketLine
+)
+from app.services.basket import optimize, single_pharmacy_ranking
 from app.services.digemid_scraper import DigemidScraper
-import os
-import random
-from datetime import datetime
+from app.services.deadline import Deadline
+from app.services.hedging import HedgeAttempt
+from app.services.scheduler import Preempted, classify
+from app.services.runtime import runtime
+from app.config import settings
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Tuple
 
 router = APIRouter(prefix="/api/v1/medicines", tags=["Medicines"])
 
 
-def generate_fake_medicine_data(nombre_medicamento: str, departamento: str, provincia: str, distrito: str, limite: int) -> MedicineSearchResponse:
-    """
-    Genera datos fake realistas de medicamentos para cuando falla el scraper
+def _search_key(request: MedicineSearchRequest) -> tuple:
+    """Clave normalizada de la consulta para la caché de resultados recientes"""
+    return (
+        request.nombre_medicamento.strip().upper(),
+        request.departamento.strip().upper(),
+        request.provincia.strip().upper(),
+        request.distrito.strip().upper(),
+    )
+
+
+def _recent_response(request: MedicineSearchRequest, reason: str) -> Optional[MedicineSearchResponse]:
+    """Resultado reciente de la misma consulta marcado como degradado, si lo hay"""
+    cached = runtime.digemid_recent.get(_search_key(request)) if runtime.digemid_recent else None
+    if cached is None:
+        return None
+    result, age = cached
+    resultados = result["resultados"][:request.limite_resultados]
+    return MedicineSearchResponse(
+        success=True,
+        message=f"{reason}: resultados de hace {int(age // 60)} min",
+        total_encontrados=len(resultados),
+        resultados=resultados,
+        degradado=True,
+        antiguedad_segundos=int(age),
+        alcance="distrito",
+        error=None
+    )
+
+
+def _stored_response(request: MedicineSearchRequest, reason: str) -> Optional[MedicineSearchResponse]:
     """
-    farmacias = ["INKAFARMA", "MIFARMA", "BOTICAS PERU", "UNIVERSAL", "FASA", "ARCANGEL"]
-    laboratorios = [
-        "MEDROCK CORPORATION S.A.C.",
-        "FARMINDUSTRIA S.A.",
-        "TECNOQUIMICAS S.A.",
-        "BAGÓ DEL PERU S.A.",
-        "ROEMMERS S.A."
-    ]
-    calles = ["AV. BRASIL", "AV. JAVIER PRADO", "CAL. LAS BEGONIAS", "AV. LARCO", "CAL. PORTUGAL"]
-
-    resultados = []
-    base_price = random.uniform(0.15, 2.50)
-
-    for i in range(min(limite, random.randint(5, 15))):
-        precio_variacion = base_price * random.uniform(0.8, 1.3)
-
-        resultado = MedicineResult(
-            tipo_establecimiento=random.choice(["Privado", "Público"]),
-            fecha_actualizacion=datetime.now().strftime("%d/%m/%Y %I:%M:%S %p"),
-            producto=f"{nombre_medicamento.upper()} {random.choice(['550', '500', '275', '400'])} mg {random.choice(['Tableta', 'Cápsula'])} {random.choice(['Recubierta', ''])} x {random.choice(['10', '20', '100'])} unid.",
-            laboratorio=random.choice(laboratorios),
-            farmacia_botica=random.choice(farmacias),
-            precio_unitario=round(precio_variacion, 2),
-            nombre_comercial=f"{random.choice(farmacias)} - {distrito}",
-            direccion=f"{random.choice(calles)} {random.randint(100, 9999)}",
-            telefono=f"{random.choice(['01', '958', '945', '991'])}{random.randint(100000, 999999)}",
-            departamento_farmacia=departamento,
-            provincia_farmacia=provincia
-        )
-        resultados.append(resultado)
+    Últimos datos guardados en el historial de precios, marcados como degradados
 
+    Si el distrito no tiene datos del medicamento se amplía a la provincia y
+    luego al departamento; `alcance` indica cuál se usó.
+    """
+    if runtime.price_history is None:
+        return None
+    stored = runtime.price_history.last_known(
+        request.nombre_medicamento, request.departamento, request.provincia, request.distrito,
+        limit=request.limite_resultados,
+        max_age=settings.PRICE_HISTORY_FALLBACK_MAX_AGE_DAYS * 86400,
+        budget=settings.PRICE_HISTORY_FALLBACK_BUDGET_MS / 1000
+    )
+    if stored is None:
+        return None
+    scope, resultados, age = stored
     return MedicineSearchResponse(
         success=True,
-        message="Búsqueda completada con datos de prueba (scraper no disponible)",
+        message=f"{reason}: datos guardados ({scope}) de hasta {_describe_age(age)}",
         total_encontrados=len(resultados),
         resultados=resultados,
+        degradado=True,
+        antiguedad_segundos=int(age),
+        alcance=scope,
         error=None
     )
 
 
+def _describe_age(seconds: float) -> str:
+    """Antigüedad legible: minutos, horas o días"""
+    if seconds < 3600:
+        return f"hace {int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"hace {int(seconds // 3600)} h"
+    return f"hace {int(seconds // 86400)} días"
+
+
+def _cached_response(request: MedicineSearchRequest, reason: str) -> Optional[MedicineSearchResponse]:
+    """Resultado reciente de la misma consulta o, si no lo hay, los últimos datos guardados"""
+    return _recent_response(request, reason) or _stored_response(request, reason)
+
+
+def _fallback_response(request: MedicineSearchRequest, error: Optional[str] = None) -> MedicineSearchResponse:
+    """
+    Respuesta con los mejores datos reales disponibles cuando DIGEMID no está disponible
+
+    Usa el resultado reciente de la misma consulta o el historial de precios;
+    si no hay ninguno, informa el fallo sin inventar resultados.
+    """
+    cached = _cached_response(request, "DIGEMID no disponible")
+    if cached is not None:
+        return cached
+
+    return MedicineSearchResponse(
+        success=False,
+        message="DIGEMID no disponible y no hay datos guardados para esta búsqueda",
+        total_encontrados=0,
+        resultados=[],
+        degradado=True,
+        error=error or "DIGEMID no disponible"
+    )
+
+
+def _admission_check(request: MedicineSearchRequest, deadline: Deadline) -> Optional[MedicineSearchResponse]:
+    """
+    Control de admisión: estima si la búsqueda alcanzaría a terminar a tiempo
+
+    La espera se estima con la cola del planificador de DIGEMID y la duración
+    reciente de los turnos. Una búsqueda que no terminaría dentro de su tiempo
+    límite (o que esperaría más que BROWSER_ACQUIRE_TIMEOUT) se responde con el
+    resultado reciente o los datos guardados si el cliente lo permite y, si no,
+    con 503.
+
+    Returns:
+        Respuesta desde caché, o None si la búsqueda se admite
+
+    Raises:
+        HTTPException: 503 con Retry-After si la búsqueda se rechaza
+    """
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return None
+    scheduler = runtime.digemid_scheduler
+    wait = scheduler.estimate_wait(request.prioridad)
+    if wait is None:
+        return None
+    needed = wait + (scheduler.typical_service() or 0.0)
+    if wait <= deadline.bound(settings.BROWSER_ACQUIRE_TIMEOUT) and deadline.allows(needed):
+        return None
+
+    scheduler.shed()
+    print(f"⛔ Búsqueda rechazada por sobrecarga: espera estimada {wait:.0f}s")
+    if request.permitir_cache:
+        cached = _cached_response(request, "Servicio sobrecargado")
+        if cached is not None:
+            return cached
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Servicio sobrecargado: espera estimada de {wait:.0f}s",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))}
+    )
+
+
+def _run_search(request: MedicineSearchRequest, deadline: Deadline, attempt: HedgeAttempt) -> dict:
+    """
+    Ejecuta la búsqueda con un navegador prestado por el pool de DIGEMID
+
+    Antes de tomar el navegador espera su turno en el planificador de DIGEMID,
+    que limita el ritmo y la concurrencia contra el origen. Una búsqueda de
+    fondo interrumpida por una interactiva vuelve a la cola y se retoma desde
+    su checkpoint si le toca el mismo navegador.
+
+    Args:
+        request: Parámetros de búsqueda
+        deadline: Tiempo límite de la petición
+        attempt: Intento en curso (el redundante no espera turno ni navegador libre)
+
+    Returns:
+        Diccionario de resultados devuelto por el scraper
+    """
+    while True:
+        try:
+            return _search_in_turn(request, deadline, attempt)
+        except Preempted as e:
+            print(f"⤵ {str(e)}: la búsqueda vuelve a la cola")
+        except Exception:
+            # Sin turno, sin navegador o con un error al crearlo la búsqueda no
+            # llegó a DIGEMID (los errores del sitio vuelven como resultado); la
+            # prueba del circuito semiabierto es del intento original
+            if not attempt.is_hedge:
+                runtime.digemid_breaker.release()
+            raise
+
+
+def _search_in_turn(request: MedicineSearchRequest, deadline: Deadline, attempt: HedgeAttempt) -> dict:
+    """Un turno del planificador de DIGEMID con un navegador del pool"""
+    wait_timeout = 0 if attempt.is_hedge else deadline.bound(settings.BROWSER_ACQUIRE_TIMEOUT)
+    with runtime.digemid_scheduler.turn(request.prioridad, timeout=wait_timeout) as turn:
+        acquire_timeout = 0 if attempt.is_hedge else deadline.bound(settings.BROWSER_ACQUIRE_TIMEOUT)
+        preempted = None
+        with runtime.digemid_pool.session(timeout=acquire_timeout) as session:
+            scraper = DigemidScraper(
+                headless=settings.HEADLESS_MODE,
+                timeout=settings.TIMEOUT,
+                session=session,
+                extraction_mode=settings.EXTRACTION_MODE,
+                max_retries=settings.SEARCH_MAX_RETRIES,
+                retry_budget=settings.SEARCH_RETRY_BUDGET
+            )
+            started = time.monotonic()
+            try:
+                result = scraper.search_medicines(
+                    nombre_medicamento=request.nombre_medicamento,
+                    departamento=request.departamento,
+                    provincia=request.provincia,
+                    distrito=request.distrito,
+                    limit=request.limite_resultados,
+                    deadline=deadline,
+                    progress=turn.watch(attempt.reached)
+                )
+            except Preempted as e:
+                # El navegador sigue sano: vuelve al pool con el checkpoint de la búsqueda
+                preempted = e
+        if preempted is not None:
+            raise preempted
+        elapsed = time.monotonic() - started
+
+        # Un intento cancelado o cortado por el tiempo límite del cliente no dice nada de DIGEMID
+        if attempt.cancelled:
+            return result
+        if not result["success"] and result["parcial"]:
+            runtime.digemid_breaker.release()
+            return result
+
+        turn.outcome = classify(result["success"], elapsed, settings.SCHEDULER_SLOW_SECONDS, result["bloqueado"])
+
+    runtime.digemid_breaker.record(result["success"], elapsed)
+
+    if session.proxy_endpoint is not None:
+        runtime.proxy_pool.record(
+            session.proxy_endpoint, result["success"] and not result["bloqueado"], error=result["error"]
+        )
+
+    # Registrar la salida Tor que atendió la petición (y rotarla si fue bloqueada)
+    if session.tor_circuit is not None:
+        runtime.tor_pool.record_request(session.tor_circuit, blocked=result["bloqueado"])
+    return result
+
+
 @router.post(
     "/search",
     response_model=MedicineSearchResponse,
@@ -69,6 +255,24 @@ def generate_fake_medicine_data(nombre_medicamento: str, departamento: str, prov
     - **provincia**: Provincia donde buscar (default: LIMA)
     - **distrito**: Distrito donde buscar (default: PUENTE PIEDRA)
     - **limite_resultados**: Número máximo de resultados (default: 10, máx: 50)
+    - **tiempo_limite_ms**: Tiempo máximo de respuesta (opcional). También puede enviarse
+      en la cabecera `X-Deadline-Ms`; se usa el menor de los dos. Si el tiempo no alcanza
+      se omiten los detalles de farmacia y se devuelven las filas obtenidas con `parcial=true`.
+    - **prioridad**: `interactiva` (default), `lote` o `fondo`. Las interactivas tienen
+      capacidad reservada y el trabajo de fondo se interrumpe entre fases para cederles el turno.
+
+    - **permitir_cache**: Si ante sobrecarga puede responderse con el resultado reciente
+      de la misma consulta o con los datos guardados (default: true)
+
+    Si DIGEMID está fallando (circuito abierto) se responde de inmediato con el resultado
+    reciente de la misma consulta o con los últimos datos guardados del medicamento, en el
+    distrito o, si no hay, en la provincia o el departamento (`alcance`), marcados con
+    `degradado=true` y su antigüedad en `antiguedad_segundos`. Sin datos guardados se
+    responde `success=false`.
+
+    Si la espera estimada en la cola no permite terminar dentro del tiempo límite, la
+    búsqueda se rechaza de inmediato con `503` y la cabecera `Retry-After`, o se responde
+    con datos recientes o guardados (`degradado=true`) si `permitir_cache` lo permite.
 
     **Ejemplo de uso:**
     ```json
@@ -82,12 +286,16 @@ def generate_fake_medicine_data(nombre_medicamento: str, departamento: str, prov
     ```
     """
 )
-async def search_medicines(request: MedicineSearchRequest):
+async def search_medicines(
+    request: MedicineSearchRequest,
+    x_deadline_ms: Optional[int] = Header(default=None, alias="X-Deadline-Ms")
+):
     """
     Endpoint para buscar medicamentos en DIGEMID
 
     Args:
         request: Objeto con los parámetros de búsqueda
+        x_deadline_ms: Tiempo máximo de respuesta en milisegundos (cabecera X-Deadline-Ms)
 
     Returns:
         MedicineSearchResponse: Respuesta con los resultados encontrados
@@ -95,54 +303,212 @@ async def search_medicines(request: MedicineSearchRequest):
     Raises:
         HTTPException: Si ocurre un error durante la búsqueda
     """
+    # Con el circuito abierto no se espera al navegador (el historial se consulta fuera del event loop)
+    if not runtime.digemid_breaker.allow():
+        return await run_in_threadpool(_fallback_response, request, "DIGEMID no disponible (circuito abierto)")
+
+    # El tiempo límite corre desde que llega la petición, incluida la espera por un navegador
+    deadline = Deadline.from_ms(request.tiempo_limite_ms, x_deadline_ms)
+
+    # Rechazar de inmediato lo que no alcanzaría a terminar a tiempo; lo descartado
+    # no llega a DIGEMID y deja libre la prueba del circuito semiabierto
     try:
-        # Configurar el scraper según variables de entorno
-        headless = os.getenv("HEADLESS_MODE", "true").lower() == "true"
-        timeout = int(os.getenv("TIMEOUT", "30"))
-        use_tor = os.getenv("USE_TOR", "false").lower() == "true"
-        tor_port = int(os.getenv("TOR_PORT", "9050"))
-
-        # Crear instancia del scraper
-        scraper = DigemidScraper(
-            headless=headless,
-            timeout=timeout,
-            use_tor=use_tor,
-            tor_port=tor_port
-        )
+        cached = await run_in_threadpool(_admission_check, request, deadline)
+    except HTTPException:
+        runtime.digemid_breaker.release()
+        raise
+    if cached is not None:
+        runtime.digemid_breaker.release()
+        return cached
 
-        # Realizar la búsqueda
-        result = scraper.search_medicines(
-            nombre_medicamento=request.nombre_medicamento,
-            departamento=request.departamento,
-            provincia=request.provincia,
-            distrito=request.distrito,
-            limit=request.limite_resultados
+    try:
+        # Realizar la búsqueda en un navegador del pool, fuera del event loop
+        result = await run_in_threadpool(
+            runtime.digemid_hedger.run,
+            lambda attempt: _run_search(request, deadline, attempt)
         )
 
         # Verificar si la búsqueda fue exitosa
         if not result["success"]:
-            # En caso de fallo, retornar datos fake realistas
-            return generate_fake_medicine_data(
-                nombre_medicamento=request.nombre_medicamento,
-                departamento=request.departamento,
-                provincia=request.provincia,
-                distrito=request.distrito,
-                limite=request.limite_resultados
-            )
+            # En caso de fallo, responder con datos recientes o guardados
+            return await run_in_threadpool(_fallback_response, request, result["error"])
 
+        if not result["parcial"]:
+            runtime.digemid_recent.put(_search_key(request), result)
+        # Las filas parciales también son datos reales de DIGEMID
+        if runtime.price_history is not None:
+            runtime.price_history.append(
+                request.nombre_medicamento, request.departamento, request.provincia, request.distrito,
+                result["resultados"]
+            )
         return MedicineSearchResponse(**result)
 
     except HTTPException:
         raise
     except Exception as e:
-        # En caso de error inesperado, retornar datos fake realistas
-        return generate_fake_medicine_data(
-            nombre_medicamento=request.nombre_medicamento,
-            departamento=request.departamento,
-            provincia=request.provincia,
-            distrito=request.distrito,
-            limite=request.limite_resultados
+        # En caso de error inesperado, responder con datos recientes o guardados
+        return await run_in_threadpool(_fallback_response, request, str(e))
+
+
+def _basket_search(request: BasketRequest, item: BasketItem) -> MedicineSearchRequest:
+    """Búsqueda DIGEMID de un medicamento de la canasta, con todas las farmacias posibles"""
+    return MedicineSearchRequest(
+        nombre_medicamento=item.nombre_medicamento,
+        departamento=request.departamento,
+        provincia=request.provincia,
+        distrito=request.distrito,
+        limite_resultados=50,
+        tiempo_limite_ms=request.tiempo_limite_ms,
+        prioridad=request.prioridad
+    )
+
+
+def _known_prices(search: MedicineSearchRequest) -> Tuple[str, List[dict]]:
+    """Precios del distrito sin consultar DIGEMID: resultado reciente o historial de precios"""
+    cached = runtime.digemid_recent.get(_search_key(search)) if runtime.digemid_recent else None
+    if cached is not None:
+        return "reciente", cached[0]["resultados"]
+    if runtime.price_history is not None:
+        stored = runtime.price_history.last_known(
+            search.nombre_medicamento, search.departamento, search.provincia, search.distrito,
+            limit=search.limite_resultados,
+            max_age=settings.BASKET_STORE_MAX_AGE,
+            budget=settings.PRICE_HISTORY_FALLBACK_BUDGET_MS / 1000,
+            widen=False
         )
+        if stored is not None:
+            return "historial", stored[1]
+    return "sin_datos", []
+
+
+async def _searched_prices(search: MedicineSearchRequest) -> Tuple[str, List[dict]]:
+    """Precios del distrito buscados en DIGEMID (con los mismos respaldos que /search)"""
+    try:
+        response = await search_medicines(search, None)
+    except HTTPException:
+        return "sin_datos", []
+    # Los datos de otros distritos no sirven para comprar en este
+    if not response.success or (response.degradado and response.alcance != "distrito"):
+        return "sin_datos", []
+    return "historial" if response.degradado else "digemid", [r.model_dump() for r in response.resultados]
+
+
+def _basket_pharmacy(pharmacy: tuple, lines: List[BasketLine], missing: List[str]) -> BasketPharmacy:
+    farmacia_botica, nombre_comercial, direccion, telefono = pharmacy
+    return BasketPharmacy(
+        farmacia_botica=farmacia_botica,
+        nombre_comercial=nombre_comercial,
+        direccion=direccion,
+        telefono=telefono,
+        lineas=lines,
+        total=round(sum(line.subtotal for line in lines), 2),
+        faltantes=missing
+    )
+
+
+def _plan_basket(request: BasketRequest, prices: List[List[dict]], sources: Dict[str, str]) -> BasketResponse:
+    """Arma la matriz de costos por farmacia y elige las farmacias de la canasta"""
+    # Por cada medicamento, la fila más barata de cada farmacia
+    cheapest: List[Dict[tuple, dict]] = []
+    for rows in prices:
+        by_pharmacy: Dict[tuple, dict] = {}
+        for row in rows:
+            key = (row["farmacia_botica"], row.get("nombre_comercial", ""), row.get("direccion", ""), row.get("telefono", ""))
+            if key not in by_pharmacy or row["precio_unitario"] < by_pharmacy[key]["precio_unitario"]:
+                by_pharmacy[key] = row
+        cheapest.append(by_pharmacy)
+    costs = [
+        {pharmacy: row["precio_unitario"] * item.cantidad for pharmacy, row in options.items()}
+        for item, options in zip(request.medicamentos, cheapest)
+    ]
+
+    def line(index: int, pharmacy: tuple) -> BasketLine:
+        item, row = request.medicamentos[index], cheapest[index][pharmacy]
+        return BasketLine(
+            nombre_medicamento=item.nombre_medicamento,
+            cantidad=item.cantidad,
+            producto=row["producto"],
+            precio_unitario=row["precio_unitario"],
+            subtotal=round(row["precio_unitario"] * item.cantidad, 2)
+        )
+
+    plan = optimize(costs, request.max_farmacias, settings.BASKET_EXACT_MAX_COMBINATIONS)
+    farmacias = [
+        _basket_pharmacy(
+            pharmacy, [line(i, p) for i, p in sorted(plan.assignment.items()) if p == pharmacy], []
+        )
+        for pharmacy in plan.pharmacies
+    ]
+    alternativas = [
+        _basket_pharmacy(
+            pharmacy,
+            [line(i, pharmacy) for i in range(len(costs)) if pharmacy in costs[i]],
+            [item.nombre_medicamento for i, item in enumerate(request.medicamentos) if pharmacy not in costs[i]]
+        )
+        for pharmacy, _, _ in single_pharmacy_ranking(costs)
+    ]
+    return BasketResponse(
+        success=bool(farmacias),
+        metodo=plan.method,
+        total=round(plan.total, 2),
+        farmacias=farmacias,
+        faltantes=[
+            item.nombre_medicamento for i, item in enumerate(request.medicamentos) if i not in plan.assignment
+        ],
+        alternativas=alternativas,
+        fuentes=sources
+    )
+
+
+@router.post(
+    "/basket",
+    response_model=BasketResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Farmacias más baratas para una lista de medicamentos"
+)
+async def optimize_basket(request: BasketRequest):
+    """
+    Elige la farmacia, o las hasta `max_farmacias` farmacias, del distrito
+    que cubren más medicamentos de la lista al menor costo total
+
+    Los precios salen del resultado reciente de cada búsqueda o del historial
+    de precios (hasta BASKET_STORE_MAX_AGE segundos). Sólo los medicamentos
+    sin datos del distrito se buscan en DIGEMID, todos a la vez, si
+    `permitir_busqueda` lo permite. Con pocas farmacias candidatas se prueban
+    todas las combinaciones (`metodo=exacto`); si no, se usa una heurística
+    voraz con búsqueda local (`metodo=heuristico`).
+
+    La respuesta trae lo que se compra en cada farmacia elegida, los
+    medicamentos que no cubre ninguna (`faltantes`), las mejores farmacias
+    para comprar todo en una sola (`alternativas`, con lo que les falta) y el
+    origen de los precios de cada medicamento (`fuentes`). Cada medicamento
+    debe aparecer una sola vez en la lista.
+    """
+    if len(request.medicamentos) > settings.BASKET_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Máximo {settings.BASKET_MAX_ITEMS} medicamentos por canasta (se pidieron {len(request.medicamentos)})"
+        )
+    # Cada medicamento va una sola vez, con su cantidad total (fuentes y faltantes se identifican por nombre)
+    names = [item.nombre_medicamento.strip().upper() for item in request.medicamentos]
+    repeated = sorted({name for name in names if names.count(name) > 1})
+    if repeated:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Medicamentos repetidos en la canasta: {', '.join(repeated)}; indique la cantidad total una sola vez"
+        )
+
+    searches = [_basket_search(request, item) for item in request.medicamentos]
+    known = await run_in_threadpool(lambda: [_known_prices(search) for search in searches])
+
+    missing = [i for i, (source, _) in enumerate(known) if source == "sin_datos"]
+    if missing and request.permitir_busqueda:
+        searched = await asyncio.gather(*(_searched_prices(searches[i]) for i in missing))
+        for i, found in zip(missing, searched):
+            known[i] = found
+
+    sources = {item.nombre_medicamento: source for item, (source, _) in zip(request.medicamentos, known)}
+    return await run_in_threadpool(_plan_basket, request, [rows for _, rows in known], sources)
 
 
 @router.get(
@@ -161,5 +527,6 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "DIGEMID Medicine Search API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "circuito_digemid": runtime.digemid_breaker.state if runtime.digemid_breaker else None
     }
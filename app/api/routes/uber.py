@@ -1,76 +1,332 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import UberRideRequest, UberRideResponse, RideOption
+from fastapi import APIRouter, Header, HTTPException
+from app.models.schemas import (
+    UberRideRequest, UberRideResponse,
+    UberRoutePair, UberBatchRequest, UberBatchItem, UberBatchResponse
+)
 from app.services.uber_scraper import UberScraper
+from app.services.deadline import Deadline
+from app.services.fare_cache import fare_key
+from app.services.hedging import HedgeAttempt
+from app.services.place_cache import normalize_place
+from app.services.scheduler import Preempted, classify
+from app.services.runtime import runtime
 from app.config import settings
-import random
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import time
+from typing import List, Optional
 
 router = APIRouter(prefix="/uber", tags=["uber"])
 
 
-def generate_fake_uber_data(pickup: str, destination: str) -> UberRideResponse:
-    """
-    Genera datos fake realistas de Uber para cuando falla el scraper
-    """
-    # Precios base variados según tipo de servicio
-    servicios = {
-        "UberX": random.uniform(15.0, 35.0),
-        "Uber Comfort": random.uniform(20.0, 45.0),
-        "Uber Pet": random.uniform(18.0, 40.0),
-        "Uber Black": random.uniform(30.0, 60.0),
-        "UberXL": random.uniform(25.0, 50.0)
-    }
+def _quote_key(request: UberRideRequest) -> tuple:
+    """Clave normalizada de la consulta para la caché de resultados recientes"""
+    return (" ".join(request.pickup_location.lower().split()), " ".join(request.destination.lower().split()))
 
-    # Generar opciones aleatorias (2-5 servicios disponibles)
-    servicios_disponibles = random.sample(list(servicios.items()), k=random.randint(2, min(5, len(servicios))))
 
-    resultados = []
-    for tipo, precio_base in servicios_disponibles:
-        # Agregar variación al precio
-        precio_final = precio_base * random.uniform(0.9, 1.15)
-        tiempo_espera = random.randint(2, 8)
-
-        resultado = RideOption(
-            tipo_viaje=tipo,
-            precio=f"{precio_final:.2f} PEN",
-            tiempo_espera=f"{tiempo_espera} min"
-        )
-        resultados.append(resultado)
+def _fare_key(request: UberRideRequest) -> tuple:
+    """Clave espacial (celdas geohash de los lugares resueltos) de la caché de tarifas"""
+    return fare_key(
+        request.pickup_location, request.destination, runtime.uber_places, settings.FARE_CACHE_GEOHASH_PRECISION
+    )
 
-    # Ordenar por precio (más barato primero)
-    resultados.sort(key=lambda x: float(x.precio.replace(" PEN", "")))
 
+def _estimated_response(request: UberRideRequest) -> Optional[UberRideResponse]:
+    """Estimación de las tarifas a partir del historial, o None si no alcanza"""
+    if runtime.fare_history is None:
+        return None
+    estimate = runtime.fare_history.estimate(request.pickup_location, request.destination, runtime.uber_places)
+    if estimate is None:
+        return None
     return UberRideResponse(
         success=True,
-        pickup=pickup,
-        destination=destination,
-        total_opciones=len(resultados),
-        resultados=resultados,
-        error=None
+        pickup=request.pickup_location,
+        destination=request.destination,
+        total_opciones=len(estimate.options),
+        resultados=estimate.options,
+        estimado=True,
+        base_estimacion=estimate.basis
     )
 
 
+def _fallback_response(request: UberRideRequest, error: Optional[str] = None) -> UberRideResponse:
+    """
+    Respuesta cuando Uber no está disponible
+
+    En orden: la cotización reciente del mismo viaje o la estimación del
+    historial de tarifas. Sin ninguna de las dos la respuesta es un fallo
+    (`success=False`), no precios inventados.
+    """
+    cached = runtime.uber_recent.get(_quote_key(request)) if runtime.uber_recent else None
+    if cached is not None:
+        result, age = cached
+        response = UberRideResponse(**result)
+        response.antiguedad_segundos = int(age)
+    else:
+        response = _estimated_response(request) or UberRideResponse(
+            success=False,
+            pickup=request.pickup_location,
+            destination=request.destination
+        )
+    response.degradado = True
+    response.error = error
+    return response
+
+
+def _too_slow(request: UberRideRequest) -> Optional[float]:
+    """Espera estimada (cola + cotización) si supera FARE_ESTIMATE_MAX_WAIT; None si no"""
+    scheduler = runtime.uber_scheduler
+    wait = scheduler.estimate_wait(request.prioridad)
+    if wait is None:
+        return None
+    needed = wait + (scheduler.typical_service() or 0.0)
+    return needed if needed > settings.FARE_ESTIMATE_MAX_WAIT else None
+
+
+def _run_quote(request: UberRideRequest, attempt: HedgeAttempt, deadline: Deadline) -> dict:
+    """
+    Cotiza el viaje con un navegador prestado por el pool de Uber, en el turno que asigne su planificador
+
+    Una cotización de fondo interrumpida por una interactiva vuelve a la cola.
+    La espera por turno y navegador no supera el tiempo que le queda a la petición.
+    """
+    while True:
+        try:
+            return _quote_in_turn(request, attempt, deadline)
+        except Preempted as e:
+            print(f"⤵ {str(e)}: la cotización vuelve a la cola")
+        except Exception:
+            # Sin turno, sin navegador o con un error al crearlo la cotización no
+            # llegó a Uber (los errores del sitio vuelven como resultado)
+            if not attempt.is_hedge:
+                runtime.uber_breaker.release()
+            raise
+
+
+def _quote_in_turn(request: UberRideRequest, attempt: HedgeAttempt, deadline: Deadline) -> dict:
+    """Un turno del planificador de Uber con un navegador del pool"""
+    wait_timeout = 0 if attempt.is_hedge else deadline.bound(settings.BROWSER_ACQUIRE_TIMEOUT)
+    with runtime.uber_scheduler.turn(request.prioridad, timeout=wait_timeout) as turn:
+        acquire_timeout = 0 if attempt.is_hedge else deadline.bound(settings.BROWSER_ACQUIRE_TIMEOUT)
+        preempted = None
+        with runtime.uber_pool.session(timeout=acquire_timeout) as session:
+            scraper = UberScraper(
+                headless=settings.HEADLESS_MODE,
+                timeout=settings.TIMEOUT,
+                session=session,
+                extraction_mode=settings.EXTRACTION_MODE,
+                cookies=runtime.uber_cookies,
+                places=runtime.uber_places,
+                network_capture=settings.UBER_NETWORK_CAPTURE
+            )
+            started = time.monotonic()
+            try:
+                result = scraper.get_ride_prices(
+                    pickup_location=request.pickup_location,
+                    destination=request.destination,
+                    progress=turn.watch(attempt.reached)
+                )
+            except Preempted as e:
+                # El navegador sigue sano: vuelve al pool
+                preempted = e
+        # La cotización deja la sesión en la página de tarifas: se devuelve al formulario en segundo plano
+        if runtime.uber_sessions is not None:
+            runtime.uber_sessions.park(session)
+        if preempted is not None:
+            raise preempted
+        elapsed = time.monotonic() - started
+
+        if attempt.cancelled:
+            return result
+
+        # Una página sin tarifas suele ser un bloqueo: cuenta como fallo
+        success = result["success"] and bool(result["resultados"])
+        turn.outcome = classify(success, elapsed, settings.SCHEDULER_SLOW_SECONDS)
+
+    runtime.uber_breaker.record(success, elapsed)
+    if session.proxy_endpoint is not None:
+        runtime.proxy_pool.record(session.proxy_endpoint, success, error=result.get("error"))
+    return result
+
+
+def _quote(request: UberRideRequest, deadline: Optional[Deadline] = None) -> UberRideResponse:
+    """
+    Cotiza un viaje: caché de tarifas, circuit breaker y navegador del pool
+
+    Con `deadline` (el tiempo que le queda a un lote) no se espera turno ni
+    navegador más allá de ese límite.
+
+    Nunca lanza excepciones: si Uber falla responde con la cotización reciente
+    o la estimación del historial, marcadas como degradadas, o con un fallo.
+    """
+    cached = runtime.uber_fares.get(_fare_key(request)) if runtime.uber_fares else None
+    if cached is not None:
+        result, age = cached
+        response = UberRideResponse(**result)
+        response.antiguedad_segundos = int(age)
+        return response
+
+    # Con Uber saturado se responde al instante con la estimación del historial, si la hay
+    slow = _too_slow(request)
+    if slow is not None:
+        estimated = _estimated_response(request)
+        if estimated is not None:
+            runtime.uber_scheduler.shed()
+            estimated.degradado = True
+            estimated.error = f"Uber saturado: espera estimada de {slow:.0f}s"
+            return estimated
+
+    # Con el circuito abierto no se espera al navegador
+    if not runtime.uber_breaker.allow():
+        return _fallback_response(request, error="Uber no disponible (circuito abierto)")
+
+    try:
+        deadline = deadline or Deadline()
+        result = runtime.uber_hedger.run(lambda attempt: _run_quote(request, attempt, deadline))
+
+        # Un fallo o una página sin tarifas se responde como con Uber caído
+        if not (result["success"] and result["resultados"]):
+            return _fallback_response(request, error=result.get("error") or "Uber no devolvió tarifas")
+
+        runtime.uber_recent.put(_quote_key(request), result)
+        # La clave se calcula después de cotizar: los lugares ya quedaron resueltos
+        runtime.uber_fares.put(_fare_key(request), result)
+        if runtime.fare_history is not None:
+            runtime.fare_history.record(
+                request.pickup_location, request.destination, runtime.uber_places, result["resultados"]
+            )
+        return UberRideResponse(**result)
+
+    except Exception as e:
+        # En caso de error, responder con la cotización reciente o la estimación
+        return _fallback_response(request, error=str(e))
+
+
 @router.post("/quote", response_model=UberRideResponse)
 async def get_uber_quote(request: UberRideRequest):
     """
     Obtiene cotización de viaje en Uber
+
+    Si el mismo par de lugares se cotizó hace menos de FARE_CACHE_TTL segundos
+    se responde con esa cotización, indicando su antigüedad en
+    `antiguedad_segundos`.
+
+    Si Uber falla, o está caído (circuito abierto, se responde de inmediato),
+    se responde con la cotización reciente del mismo viaje o con una
+    estimación del historial de tarifas, marcada con `degradado=true`. Sin
+    ninguna de las dos la respuesta lleva `success=false` y el error.
+    Si Uber está saturado (la espera estimada supera FARE_ESTIMATE_MAX_WAIT)
+    se responde con la estimación. Las estimaciones llevan `estimado=true` y,
+    por tipo de viaje, la banda `precio_minimo`-`precio_maximo` y las
+    `muestras` usadas.
     """
+    return await run_in_threadpool(_quote, request)
+
+
+def _batch_pairs(request: UberBatchRequest) -> List[UberRoutePair]:
+    """Pares explícitos más la matriz origenes × destinos, sin repetir"""
+    pairs = list(request.pares) + [
+        UberRoutePair(pickup_location=pickup, destination=destination)
+        for pickup in request.origenes for destination in request.destinos
+    ]
+    unique = {}
+    for pair in pairs:
+        unique.setdefault((normalize_place(pair.pickup_location), normalize_place(pair.destination)), pair)
+    return list(unique.values())
+
+
+def _batch_waves(pairs: List[UberRoutePair]) -> List[List[int]]:
+    """
+    Ordena los pares en tandas para resolver cada lugar una sola vez
+
+    Dentro de una tanda, cada ubicación que aún no está en la caché de lugares
+    la resuelve un solo par; los demás pares que la usan pasan a una tanda
+    siguiente, cuando ya está resuelta. Así, con un origen y N destinos, el
+    primer par resuelve el origen y los otros N-1 lo reutilizan juntos en la
+    segunda tanda.
+    """
+    known = {
+        normalize_place(text) for pair in pairs for text in (pair.pickup_location, pair.destination)
+        if runtime.uber_places is not None and runtime.uber_places.contains(text)
+    }
+    waves, remaining = [], list(range(len(pairs)))
+    while remaining:
+        wave, claimed, deferred = [], set(), []
+        for index in remaining:
+            pair = pairs[index]
+            pending = {normalize_place(text) for text in (pair.pickup_location, pair.destination)} - known
+            if pending & claimed:
+                deferred.append(index)
+            else:
+                wave.append(index)
+                claimed |= pending
+        waves.append(wave)
+        known |= claimed
+        remaining = deferred
+    return waves
+
+
+def _batch_item(pair: UberRoutePair, prioridad: str, deadline: Deadline) -> UberBatchItem:
     try:
-        scraper = UberScraper(
-            headless=settings.HEADLESS_MODE,
-            timeout=settings.TIMEOUT,
-            cookies_file="galleta_uber.json"
+        response = _quote(UberRideRequest(
+            pickup_location=pair.pickup_location, destination=pair.destination, prioridad=prioridad
+        ), deadline)
+    except Exception as e:
+        return UberBatchItem(
+            pickup_location=pair.pickup_location, destination=pair.destination, success=False, error=str(e)
         )
+    return UberBatchItem(
+        pickup_location=pair.pickup_location,
+        destination=pair.destination,
+        success=response.success and not response.degradado,
+        cotizacion=response,
+        error=response.error
+    )
 
-        result = scraper.get_ride_prices(
-            pickup_location=request.pickup_location,
-            destination=request.destination
-        )
 
-        return UberRideResponse(**result)
+@router.post("/quote/batch", response_model=UberBatchResponse)
+async def get_uber_quotes_batch(
+    request: UberBatchRequest,
+    x_deadline_ms: Optional[int] = Header(default=None, alias="X-Deadline-Ms")
+):
+    """
+    Cotiza varios viajes en una sola llamada
 
-    except Exception as e:
-        # En caso de error, retornar datos fake realistas
-        return generate_fake_uber_data(
-            pickup=request.pickup_location,
-            destination=request.destination
+    Acepta una lista de pares (`pares`), una matriz (`origenes` × `destinos`)
+    o ambas. Los pares se cotizan en paralelo con los navegadores del pool,
+    respetando el planificador de Uber, así que la latencia total depende del
+    límite de concurrencia y no del número de pares. Cada ubicación se escribe
+    una sola vez: los pares que la repiten usan el lugar ya resuelto. Cada par
+    trae su propia cotización o error, en el orden pedido.
+
+    Con `tiempo_limite_ms` o la cabecera `X-Deadline-Ms` (se usa el menor) los
+    pares no esperan turno ni navegador más allá del tiempo que le queda al
+    lote: los que no alcanzan se responden como una cotización fallida
+    (estimación del historial o reciente, si la hay).
+    """
+    pairs = _batch_pairs(request)
+    if not pairs:
+        raise HTTPException(status_code=422, detail="Debe indicar pares u origenes y destinos")
+    if len(pairs) > settings.UBER_BATCH_MAX_PAIRS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Máximo {settings.UBER_BATCH_MAX_PAIRS} pares por lote (se pidieron {len(pairs)})"
         )
+
+    # El tiempo límite corre para el lote completo, incluidas las dos tandas
+    deadline = Deadline.from_ms(request.tiempo_limite_ms, x_deadline_ms)
+    items: List[Optional[UberBatchItem]] = [None] * len(pairs)
+    for wave in _batch_waves(pairs):
+        responses = await asyncio.gather(*(
+            run_in_threadpool(_batch_item, pairs[index], request.prioridad, deadline) for index in wave
+        ))
+        for index, item in zip(wave, responses):
+            items[index] = item
+
+    exitosos = sum(1 for item in items if item.success)
+    return UberBatchResponse(
+        success=exitosos == len(items),
+        total_pares=len(items),
+        exitosos=exitosos,
+        resultados=items
+    )
@@ -13,11 +13,133 @@ class Settings(BaseSettings):
     # Selenium/Scraping
     HEADLESS_MODE: bool = True
     TIMEOUT: int = 30
+    # "dom" consulta el DOM vivo elemento por elemento; "snapshot" procesa el HTML localmente
+    EXTRACTION_MODE: str = "dom"
+    # Reintentos de una búsqueda DIGEMID (se reanudan desde la última fase completada)
+    SEARCH_MAX_RETRIES: int = 2
+    SEARCH_RETRY_BUDGET: int = 60
+
+    # Pool de navegadores
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_ACQUIRE_TIMEOUT: int = 60
+    BROWSER_MAX_SEARCHES: int = 50
+
+    # Sesiones de Uber: cookies cargadas una vez por navegador y renovadas en segundo plano
+    UBER_COOKIES_FILE: str = "galleta_uber.json"
+    UBER_PREWARM_SESSIONS: int = 1
+    UBER_SESSION_CHECK_INTERVAL: int = 60
+    UBER_COOKIE_EXPIRY_WARNING: int = 86400
+    # Leer las tarifas de las respuestas de red de la app (DevTools) en lugar del DOM
+    UBER_NETWORK_CAPTURE: bool = True
+    # Caché de lugares resueltos (texto de ubicación -> sugerencia elegida)
+    PLACE_CACHE_TTL: int = 604800
+    PLACE_CACHE_MAX_ENTRIES: int = 1000
+    # Caché de tarifas por celdas geohash de origen y destino
+    FARE_CACHE_TTL: int = 120
+    FARE_CACHE_MAX_ENTRIES: int = 2000
+    FARE_CACHE_GEOHASH_PRECISION: int = 7
+    # Historial de tarifas (SQLite) para estimar precios cuando Uber está lento o fallando
+    FARE_HISTORY_ENABLED: bool = True
+    FARE_HISTORY_DB: str = ".history/tarifas_uber.db"
+    FARE_HISTORY_GEOHASH_PRECISION: int = 6
+    FARE_HISTORY_DISTANCE_BUCKET_KM: float = 2.0
+    FARE_HISTORY_HOUR_WINDOW: int = 2
+    FARE_HISTORY_MIN_SAMPLES: int = 3
+    FARE_HISTORY_MAX_AGE_DAYS: int = 30
+    FARE_HISTORY_UTC_OFFSET: int = -5
+    # Espera estimada (cola + cotización) a partir de la cual se responde con la estimación
+    FARE_ESTIMATE_MAX_WAIT: float = 30
+    # Pares origen/destino máximos por llamada a /uber/quote/batch
+    UBER_BATCH_MAX_PAIRS: int = 25
+
+    # Hedging: segundo intento cuando el primero se atrasa respecto de su percentil histórico
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 90.0
+    HEDGE_MAX_RATE: float = 0.1
+    HEDGE_MIN_SAMPLES: int = 20
+
+    # Planificador de cortesía: ritmo y concurrencia máximos contra cada origen (AIMD)
+    SCHEDULER_DIGEMID_PER_MINUTE: float = 30
+    SCHEDULER_UBER_PER_MINUTE: float = 12
+    SCHEDULER_BURST: int = 3
+    SCHEDULER_MAX_CONCURRENCY: int = 2
+    SCHEDULER_SLOW_SECONDS: float = 60
+    SCHEDULER_BLOCK_COOLDOWN: int = 30
+    SCHEDULER_INTERACTIVE_RESERVE: int = 1
+
+    # Control de admisión: rechazar (503) las búsquedas que no alcanzarían a terminar a tiempo
+    ADMISSION_CONTROL_ENABLED: bool = True
+
+    # Circuit breaker por servicio externo y respuestas con datos recientes mientras está abierto
+    CIRCUIT_FAILURE_RATE: float = 0.5
+    CIRCUIT_SLOW_CALL_SECONDS: float = 90
+    CIRCUIT_SLOW_CALL_RATE: float = 0.8
+    CIRCUIT_WINDOW: int = 20
+    CIRCUIT_MIN_CALLS: int = 5
+    CIRCUIT_OPEN_SECONDS: int = 60
+    CIRCUIT_HALF_OPEN_SUCCESSES: int = 2
+    RECENT_RESULTS_TTL: int = 1800
+    RECENT_RESULTS_MAX_ENTRIES: int = 500
+
+    # Historial de precios de DIGEMID (SQLite), escrito por lotes fuera de la petición
+    PRICE_HISTORY_ENABLED: bool = True
+    PRICE_HISTORY_DB: str = ".history/precios_digemid.db"
+    PRICE_HISTORY_BATCH_SIZE: int = 500
+    PRICE_HISTORY_FLUSH_INTERVAL: float = 2.0
+    PRICE_HISTORY_MAX_PENDING: int = 50000
+    PRICE_HISTORY_UTC_OFFSET: int = -5
+    # Respuesta con los últimos datos guardados cuando DIGEMID no está disponible
+    PRICE_HISTORY_FALLBACK_MAX_AGE_DAYS: int = 30
+    PRICE_HISTORY_FALLBACK_BUDGET_MS: int = 50
+
+    # Canasta de medicamentos: tamaño máximo, antigüedad de los precios guardados y búsqueda exacta
+    BASKET_MAX_ITEMS: int = 20
+    BASKET_STORE_MAX_AGE: int = 86400
+    BASKET_EXACT_MAX_COMBINATIONS: int = 200000
+
+    # Perfiles persistentes de Chrome (caché HTTP, service workers, cookies)
+    BROWSER_PERSISTENT_PROFILES: bool = True
+    BROWSER_PROFILES_DIR: str = ".browser_profiles"
+    BROWSER_PROFILE_TEMPLATE_MAX_AGE: int = 21600
+    # Segundos mínimos entre actualizaciones de la plantilla de un servicio
+    BROWSER_PROFILE_REFRESH_INTERVAL: int = 600
+
+    # Gobernador de memoria
+    BROWSER_MAX_RSS_MB: int = 1500
+    BROWSER_MAX_JS_HEAP_MB: int = 512
+    MEMORY_GOVERNOR_INTERVAL: int = 15
+    NODE_MEMORY_HIGH_PERCENT: float = 80.0
+    NODE_MEMORY_CRITICAL_PERCENT: float = 92.0
+
+    # Proxy local con caché compartida de recursos estáticos
+    ASSET_PROXY_ENABLED: bool = False
+    ASSET_PROXY_PORT: int = 8899
+    ASSET_PROXY_CACHE_DIR: str = ".asset_cache"
+    ASSET_PROXY_DEFAULT_TTL: int = 3600
+    ASSET_PROXY_INTERCEPT_HOSTS: list = ["opm-digemid.minsa.gob.pe", "m.uber.com"]
+    ASSET_PROXY_CERT_FILE: str = ""
+    ASSET_PROXY_KEY_FILE: str = ""
+    ASSET_PROXY_CERT_SPKI: str = ""
+
+    # Pool de proxies de salida: lista de socks5://host:puerto o http://host:puerto
+    # (los circuitos Tor se agregan si USE_TOR=true)
+    PROXY_LIST: list = []
+    PROXY_POOL_UPSTREAMS: list = ["digemid"]
+    PROXY_PROBE_URL: str = "https://opm-digemid.minsa.gob.pe/"
+    PROXY_PROBE_INTERVAL: int = 60
 
     # Tor
     USE_TOR: bool = False
     TOR_PORT: int = 9050
     TOR_CONTROL_PORT: int = 9051
+    # Instancias de Tor en paralelo (puertos TOR_PORT + 2*i y TOR_CONTROL_PORT + 2*i)
+    TOR_CIRCUITS: int = 2
+    TOR_DATA_DIR: str = ".tor"
+    TOR_HEALTH_INTERVAL: int = 60
+    # Rotación de identidad en segundo plano (0 = desactivada)
+    TOR_ROTATE_AFTER_REQUESTS: int = 50
+    TOR_ROTATE_INTERVAL: int = 900
+    TOR_ROTATE_ON_BLOCK: bool = True
 
     # API
     API_V1_PREFIX: str = "/api/v1"
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import medicines, uber
+from app.api.routes import analytics, medicines, uber
+from app.services.runtime import runtime
 import os
 from dotenv import load_dotenv
 
@@ -52,6 +53,19 @@ app.add_middleware(
 # Incluir routers
 app.include_router(medicines.router)
 app.include_router(uber.router)
+app.include_router(analytics.router)
+
+
+@app.on_event("startup")
+def startup():
+    """Crea los pools de navegadores y las tareas en segundo plano"""
+    runtime.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """Cierra los navegadores y detiene las tareas en segundo plano"""
+    runtime.stop()
 
 
 @app.get("/", tags=["Root"])
@@ -80,7 +94,8 @@ async def health():
     """
     return {
         "status": "healthy",
-        "application": "DIGEMID Medicine Search API"
+        "application": "DIGEMID Medicine Search API",
+        "recursos": runtime.stats()
     }
 
 
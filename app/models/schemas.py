@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from datetime import date
+from typing import Dict, Optional, List, Literal
 
 
 class MedicineSearchRequest(BaseModel):
@@ -9,6 +10,20 @@ class MedicineSearchRequest(BaseModel):
     provincia: str = Field(default="LIMA", description="Provincia donde buscar")
     distrito: str = Field(default="PUENTE PIEDRA", description="Distrito donde buscar")
     limite_resultados: int = Field(default=10, description="Número máximo de resultados a devolver", ge=1, le=50)
+    tiempo_limite_ms: Optional[int] = Field(
+        default=None,
+        description="Tiempo máximo de respuesta en milisegundos; al agotarse se devuelven resultados parciales",
+        ge=1000,
+        le=600000
+    )
+    prioridad: Literal["interactiva", "lote", "fondo"] = Field(
+        default="interactiva",
+        description="Clase de prioridad: interactiva (usuario esperando), lote o fondo (interrumpible)"
+    )
+    permitir_cache: bool = Field(
+        default=True,
+        description="Si ante sobrecarga puede responderse con el resultado reciente de la misma consulta"
+    )
 
     class Config:
         json_schema_extra = {
@@ -17,7 +32,8 @@ class MedicineSearchRequest(BaseModel):
                 "departamento": "LIMA",
                 "provincia": "LIMA",
                 "distrito": "PUENTE PIEDRA",
-                "limite_resultados": 10
+                "limite_resultados": 10,
+                "tiempo_limite_ms": 45000
             }
         }
 
@@ -60,6 +76,13 @@ class MedicineSearchResponse(BaseModel):
     message: str = Field(..., description="Mensaje descriptivo del resultado")
     total_encontrados: int = Field(..., description="Total de resultados encontrados")
     resultados: List[MedicineResult] = Field(default=[], description="Lista de medicamentos encontrados")
+    parcial: bool = Field(default=False, description="Indica si el tiempo límite cortó la búsqueda antes de completarla")
+    degradado: bool = Field(default=False, description="Indica si la respuesta no viene de DIGEMID sino de datos locales")
+    antiguedad_segundos: int = Field(default=0, description="Segundos desde que se obtuvieron los datos más antiguos (0 = recién consultados)")
+    alcance: Optional[str] = Field(
+        default=None,
+        description="Ubicación de los datos guardados: distrito, provincia o departamento (sólo respuestas degradadas)"
+    )
     error: Optional[str] = Field(default=None, description="Mensaje de error si ocurrió alguno")
 
     class Config:
@@ -68,6 +91,7 @@ class MedicineSearchResponse(BaseModel):
                 "success": True,
                 "message": "Búsqueda completada exitosamente",
                 "total_encontrados": 10,
+                "parcial": False,
                 "resultados": [
                     {
                         "tipo_establecimiento": "Privado",
@@ -83,10 +107,94 @@ class MedicineSearchResponse(BaseModel):
         }
 
 
+class BasketItem(BaseModel):
+    """Medicamento de la canasta"""
+    nombre_medicamento: str = Field(..., description="Nombre del medicamento (como en /medicines/search)", min_length=1)
+    cantidad: int = Field(default=1, description="Unidades a comprar", ge=1)
+
+
+class BasketRequest(BaseModel):
+    """Request model para optimizar la compra de una lista de medicamentos"""
+    medicamentos: List[BasketItem] = Field(..., description="Lista de medicamentos a comprar", min_length=1)
+    departamento: str = Field(default="LIMA", description="Departamento donde comprar")
+    provincia: str = Field(default="LIMA", description="Provincia donde comprar")
+    distrito: str = Field(default="PUENTE PIEDRA", description="Distrito donde comprar")
+    max_farmacias: int = Field(default=2, description="Farmacias máximas entre las que repartir la compra", ge=1, le=5)
+    permitir_busqueda: bool = Field(
+        default=True,
+        description="Si los medicamentos sin precios guardados se buscan en DIGEMID"
+    )
+    tiempo_limite_ms: Optional[int] = Field(
+        default=None,
+        description="Tiempo máximo de cada búsqueda en DIGEMID, en milisegundos",
+        ge=1000,
+        le=600000
+    )
+    prioridad: Literal["interactiva", "lote", "fondo"] = Field(
+        default="interactiva",
+        description="Clase de prioridad de las búsquedas en DIGEMID"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "medicamentos": [
+                    {"nombre_medicamento": "APRONAX", "cantidad": 10},
+                    {"nombre_medicamento": "PARACETAMOL", "cantidad": 20}
+                ],
+                "departamento": "LIMA",
+                "provincia": "LIMA",
+                "distrito": "MIRAFLORES",
+                "max_farmacias": 2
+            }
+        }
+
+
+class BasketLine(BaseModel):
+    """Medicamento comprado en una farmacia"""
+    nombre_medicamento: str = Field(..., description="Medicamento de la lista")
+    cantidad: int = Field(..., description="Unidades")
+    producto: str = Field(..., description="Producto más barato de la farmacia para el medicamento")
+    precio_unitario: float = Field(..., description="Precio unitario en soles")
+    subtotal: float = Field(..., description="Precio unitario × cantidad")
+
+
+class BasketPharmacy(BaseModel):
+    """Farmacia con los medicamentos que se compran en ella"""
+    farmacia_botica: str = Field(..., description="Nombre de la farmacia o botica")
+    nombre_comercial: str = Field(default="", description="Nombre comercial de la farmacia")
+    direccion: str = Field(default="", description="Dirección de la farmacia")
+    telefono: str = Field(default="", description="Teléfono de la farmacia")
+    lineas: List[BasketLine] = Field(default=[], description="Medicamentos que se compran en la farmacia")
+    total: float = Field(..., description="Costo de los medicamentos en la farmacia")
+    faltantes: List[str] = Field(default=[], description="Medicamentos de la lista que la farmacia no tiene")
+
+
+class BasketResponse(BaseModel):
+    """Response model para la optimización de una canasta"""
+    success: bool = Field(..., description="Indica si se encontró al menos una farmacia")
+    metodo: str = Field(..., description="exacto (se probaron todos los conjuntos) o heuristico")
+    total: float = Field(..., description="Costo total de los medicamentos cubiertos")
+    farmacias: List[BasketPharmacy] = Field(default=[], description="Farmacias elegidas y lo que se compra en cada una")
+    faltantes: List[str] = Field(default=[], description="Medicamentos que no cubre ninguna farmacia elegida")
+    alternativas: List[BasketPharmacy] = Field(
+        default=[],
+        description="Mejores farmacias para comprar toda la lista en una sola, con sus faltantes"
+    )
+    fuentes: Dict[str, str] = Field(
+        default={},
+        description="Origen de los precios de cada medicamento: reciente, historial, digemid o sin_datos"
+    )
+
+
 class UberRideRequest(BaseModel):
     """Request model para cotización de viaje en Uber"""
     pickup_location: str = Field(..., description="Lugar de recogida", min_length=1)
     destination: str = Field(..., description="Destino del viaje", min_length=1)
+    prioridad: Literal["interactiva", "lote", "fondo"] = Field(
+        default="interactiva",
+        description="Clase de prioridad: interactiva (usuario esperando), lote o fondo (interrumpible)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -102,13 +210,20 @@ class RideOption(BaseModel):
     tipo_viaje: str = Field(..., description="Tipo de viaje (UberX, Uber Pet, etc.)")
     precio: str = Field(..., description="Precio del viaje")
     tiempo_espera: str = Field(default="", description="Tiempo estimado de espera")
+    precio_valor: Optional[float] = Field(default=None, description="Monto numérico del precio (el menor si es un rango)")
+    moneda: Optional[str] = Field(default=None, description="Código de moneda del precio (PEN, USD, ...)")
+    precio_minimo: Optional[float] = Field(default=None, description="Límite inferior de la banda de confianza (sólo estimaciones)")
+    precio_maximo: Optional[float] = Field(default=None, description="Límite superior de la banda de confianza (sólo estimaciones)")
+    muestras: Optional[int] = Field(default=None, description="Cotizaciones del historial usadas en la estimación")
 
     class Config:
         json_schema_extra = {
             "example": {
                 "tipo_viaje": "UberX",
                 "precio": "27,90 PEN",
-                "tiempo_espera": "3 min"
+                "tiempo_espera": "3 min",
+                "precio_valor": 27.9,
+                "moneda": "PEN"
             }
         }
 
@@ -120,6 +235,10 @@ class UberRideResponse(BaseModel):
     destination: Optional[str] = Field(default=None, description="Destino")
     total_opciones: int = Field(default=0, description="Total de opciones de viaje encontradas")
     resultados: List[RideOption] = Field(default=[], description="Lista de opciones de viaje disponibles")
+    degradado: bool = Field(default=False, description="Indica si la respuesta no viene de Uber sino de datos locales")
+    antiguedad_segundos: int = Field(default=0, description="Segundos desde que se obtuvo la cotización (0 = recién consultada)")
+    estimado: bool = Field(default=False, description="Indica si los precios son una estimación del historial y no una cotización")
+    base_estimacion: Optional[str] = Field(default=None, description="Historial usado para estimar (ruta, distancia, ...)")
     error: Optional[str] = Field(default=None, description="Mensaje de error si ocurrió alguno")
 
     class Config:
@@ -144,3 +263,106 @@ class UberRideResponse(BaseModel):
                 "error": None
             }
         }
+
+
+class UberRoutePair(BaseModel):
+    """Par origen/destino de una cotización en lote"""
+    pickup_location: str = Field(..., description="Lugar de recogida", min_length=1)
+    destination: str = Field(..., description="Destino del viaje", min_length=1)
+
+
+class UberBatchRequest(BaseModel):
+    """Request model para cotizar varios viajes de Uber en una sola llamada"""
+    pares: List[UberRoutePair] = Field(default=[], description="Pares origen/destino a cotizar")
+    origenes: List[str] = Field(default=[], description="Orígenes de la matriz (se combinan con cada destino)")
+    destinos: List[str] = Field(default=[], description="Destinos de la matriz")
+    prioridad: Literal["interactiva", "lote", "fondo"] = Field(
+        default="interactiva",
+        description="Clase de prioridad de todas las cotizaciones del lote"
+    )
+    tiempo_limite_ms: Optional[int] = Field(
+        default=None,
+        description="Tiempo máximo del lote completo en milisegundos; los pares no esperan navegador más allá de él",
+        ge=1000,
+        le=600000
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "origenes": ["Plaza de Armas, Lima", "Miraflores, Lima"],
+                "destinos": ["Aeropuerto Jorge Chávez, Lima", "Jockey Plaza, Lima"]
+            }
+        }
+
+
+class UberBatchItem(BaseModel):
+    """Resultado de un par origen/destino dentro del lote"""
+    pickup_location: str = Field(..., description="Lugar de recogida")
+    destination: str = Field(..., description="Destino del viaje")
+    success: bool = Field(..., description="Indica si se obtuvo una cotización de Uber para el par")
+    cotizacion: Optional[UberRideResponse] = Field(default=None, description="Cotización del par")
+    error: Optional[str] = Field(default=None, description="Error del par, si ocurrió alguno")
+
+
+class UberBatchResponse(BaseModel):
+    """Response model para cotizaciones en lote"""
+    success: bool = Field(..., description="Indica si todos los pares se cotizaron con datos de Uber")
+    total_pares: int = Field(..., description="Número de pares cotizados")
+    exitosos: int = Field(..., description="Pares con cotización de Uber (no degradada)")
+    resultados: List[UberBatchItem] = Field(default=[], description="Resultado por par, en el orden pedido")
+
+
+class PriceStatsRequest(BaseModel):
+    """Request model para estadísticas de precios del historial de DIGEMID"""
+    nombre_medicamento: str = Field(..., description="Medicamento buscado (como en /medicines/search)", min_length=1)
+    producto: Optional[str] = Field(default=None, description="Producto exacto dentro de los resultados del medicamento")
+    departamento: Optional[str] = Field(default=None, description="Filtrar por departamento de búsqueda")
+    provincia: Optional[str] = Field(default=None, description="Filtrar por provincia de búsqueda")
+    distrito: Optional[str] = Field(default=None, description="Filtrar por distrito de búsqueda")
+    desde: Optional[date] = Field(default=None, description="Primer día (por defecto, 30 días antes de hasta)")
+    hasta: Optional[date] = Field(default=None, description="Último día (por defecto, hoy)")
+    agrupar_por: List[Literal["dia", "distrito", "producto"]] = Field(
+        default=["dia"],
+        description="Dimensiones de los grupos"
+    )
+    percentiles: List[float] = Field(default=[25, 75, 90], description="Percentiles adicionales (0-100)")
+    ventana_dias: int = Field(
+        default=1,
+        description="Con agrupación por día, días de la ventana móvil que termina en cada día",
+        ge=1,
+        le=90
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "nombre_medicamento": "APRONAX",
+                "departamento": "LIMA",
+                "agrupar_por": ["dia", "distrito"],
+                "percentiles": [10, 90],
+                "ventana_dias": 7
+            }
+        }
+
+
+class PriceStatsGroup(BaseModel):
+    """Estadísticas de precio unitario de un grupo"""
+    dia: Optional[date] = Field(default=None, description="Día (último de la ventana móvil)")
+    distrito: Optional[str] = Field(default=None, description="Distrito de búsqueda")
+    producto: Optional[str] = Field(default=None, description="Producto")
+    n: int = Field(..., description="Precios del grupo (uno por farmacia y día)")
+    minimo: float = Field(..., description="Precio unitario mínimo")
+    promedio: float = Field(..., description="Precio unitario promedio")
+    mediana: float = Field(..., description="Mediana del precio unitario")
+    maximo: float = Field(..., description="Precio unitario máximo")
+    percentiles: Dict[str, float] = Field(default={}, description="Percentiles pedidos (p10, p90, ...)")
+
+
+class PriceStatsResponse(BaseModel):
+    """Response model para estadísticas de precios"""
+    success: bool = Field(..., description="Indica si hay datos en el historial para la consulta")
+    desde: date = Field(..., description="Primer día incluido")
+    hasta: date = Field(..., description="Último día incluido")
+    total_precios: int = Field(..., description="Precios del resumen diario leídos")
+    grupos: List[PriceStatsGroup] = Field(default=[], description="Estadísticas por grupo, ordenadas por clave")
@@ -1,4 +1,6 @@
 from .digemid_scraper import DigemidScraper
 from .tor_manager import TorManager
+from .browser_pool import BrowserPool, BrowserSession
+from .memory_governor import MemoryGovernor
 
-__all__ = ["DigemidScraper", "TorManager"]
+__all__ = ["DigemidScraper", "TorManager", "BrowserPool", "BrowserSession", "MemoryGovernor"]
@@ -0,0 +1,477 @@
+"""
+Proxy local con caché compartida de recursos estáticos para los navegadores
+"""
+import email.utils
+import hashlib
+import http.client
+import json
+import os
+import select
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Extensiones que se consideran recursos estáticos cacheables
+STATIC_EXTENSIONS = (
+    ".js", ".mjs", ".css", ".map", ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".webp", ".avif",
+)
+
+# Cabeceras hop-by-hop que no se reenvían
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "proxy-connection", "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Convierte una cabecera Cache-Control en un diccionario de directivas"""
+    directives = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+class AssetStore:
+    """
+    Almacén direccionado por contenido para respuestas estáticas
+
+    Los cuerpos se guardan una sola vez por hash SHA-256 aunque varias URLs
+    los compartan. El índice (URL → hash, cabeceras y vigencia) vive en memoria
+    y se persiste en disco al detener el proxy.
+    """
+
+    def __init__(self, cache_dir: str = ".asset_cache", default_ttl: int = 3600):
+        """
+        Inicializa el almacén
+
+        Args:
+            cache_dir: Directorio donde se guardan los blobs y el índice
+            default_ttl: Vigencia (segundos) de recursos estáticos sin cabeceras de caché explícitas
+        """
+        self.cache_dir = Path(cache_dir)
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.index_path = self.cache_dir / "index.json"
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        if self.index_path.exists():
+            try:
+                self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._index = {}
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve la entrada del índice para una clave, si existe y su blob sigue en disco"""
+        with self._lock:
+            entry = self._index.get(key)
+        if entry and self._blob_path(entry["digest"]).exists():
+            return entry
+        return None
+
+    def read(self, entry: Dict) -> bytes:
+        """Lee el cuerpo de una entrada"""
+        return self._blob_path(entry["digest"]).read_bytes()
+
+    def freshness(self, status: int, headers: List[Tuple[str, str]], static: bool) -> Optional[float]:
+        """
+        Calcula hasta cuándo puede servirse una respuesta desde caché
+
+        Returns:
+            Timestamp de expiración, o None si la respuesta no es cacheable
+        """
+        if status != 200:
+            return None
+        lowered = {k.lower(): v for k, v in headers}
+        directives = _parse_cache_control(lowered.get("cache-control", ""))
+        if "no-store" in directives or "private" in directives:
+            return None
+        vary = {v.strip().lower() for v in lowered.get("vary", "").split(",") if v.strip()}
+        if vary - {"accept-encoding", "origin"}:
+            return None
+
+        now = time.time()
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name) is not None:
+                try:
+                    return now + int(directives[name])
+                except ValueError:
+                    return None
+        if "no-cache" in directives:
+            # Se guarda pero siempre se revalida
+            return now
+        if lowered.get("expires"):
+            try:
+                return email.utils.parsedate_to_datetime(lowered["expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now + self.default_ttl if static else None
+
+    def put(self, key: str, status: int, headers: List[Tuple[str, str]], body: bytes, expires_at: float):
+        """Guarda una respuesta en el almacén"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+
+        with self._lock:
+            self._index[key] = {
+                "digest": digest,
+                "status": status,
+                "headers": headers,
+                "size": len(body),
+                "stored_at": time.time(),
+                "expires_at": expires_at,
+            }
+
+    def refresh(self, key: str, headers: List[Tuple[str, str]], expires_at: float):
+        """Extiende la vigencia de una entrada tras una revalidación 304"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry:
+                entry["expires_at"] = expires_at
+                entry["stored_at"] = time.time()
+                known = {k.lower() for k, _ in headers}
+                entry["headers"] = [(k, v) for k, v in entry["headers"] if k.lower() not in known] + headers
+
+    def save(self):
+        """Persiste el índice en disco"""
+        with self._lock:
+            data = json.dumps(self._index)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def stats(self) -> Dict:
+        """Tamaño del almacén"""
+        with self._lock:
+            entries = list(self._index.values())
+        return {
+            "entradas": len(entries),
+            "blobs": len({e["digest"] for e in entries}),
+            "bytes": sum(e["size"] for e in entries),
+        }
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    """Maneja peticiones HTTP del navegador y túneles CONNECT"""
+
+    protocol_version = "HTTP/1.1"
+    # Host y puerto del túnel HTTPS interceptado (sólo en conexiones interceptadas)
+    tunnel_host: Optional[str] = None
+    tunnel_port: int = 443
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def proxy(self) -> "CachingProxy":
+        return self.server.proxy
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        port = int(port or 443)
+
+        if self.proxy.should_intercept(host):
+            self.send_response(200, "Connection Established")
+            self.end_headers()
+            try:
+                tls = self.proxy.server_tls_context.wrap_socket(self.connection, server_side=True)
+            except (ssl.SSLError, OSError):
+                self.close_connection = True
+                return
+            handler = type("_InterceptedHandler", (_ProxyHandler,), {"tunnel_host": host, "tunnel_port": port})
+            handler(tls, self.client_address, self.server)
+            self.close_connection = True
+            return
+
+        try:
+            upstream = self.proxy.open_socket(host, port)
+        except OSError as e:
+            self.send_error(502, f"No se pudo conectar a {host}: {str(e)}")
+            return
+
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        self.proxy.count("tuneles")
+        self._pipe(self.connection, upstream)
+        self.close_connection = True
+
+    def _pipe(self, client: socket.socket, upstream: socket.socket):
+        """Copia bytes en ambos sentidos hasta que alguno cierre"""
+        sockets = [client, upstream]
+        try:
+            while True:
+                readable, _, errored = select.select(sockets, [], sockets, 60)
+                if errored or not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    (upstream if sock is client else client).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def _target(self) -> Tuple[str, str, int, str]:
+        """Devuelve (esquema, host, puerto, ruta) de la petición actual"""
+        if self.tunnel_host:
+            return "https", self.tunnel_host, self.tunnel_port, self.path
+        parts = urlsplit(self.path)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return parts.scheme or "http", parts.hostname, parts.port or 80, path
+
+    def _handle(self):
+        try:
+            scheme, host, port, path = self._target()
+        except ValueError:
+            self.send_error(400)
+            return
+        if not host:
+            self.send_error(400)
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        headers = [(k, v) for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP]
+
+        try:
+            status, reason, response_headers, response_body = self.proxy.fetch(
+                self.command, scheme, host, port, path, headers, body
+            )
+        except (OSError, http.client.HTTPException) as e:
+            self.send_error(502, f"Error consultando {host}: {str(e)}")
+            return
+
+        self.send_response(status, reason)
+        for name, value in response_headers:
+            if name.lower() not in HOP_BY_HOP and name.lower() != "content-length":
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(response_body)
+
+    do_GET = _handle
+    do_HEAD = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_PATCH = _handle
+    do_DELETE = _handle
+    do_OPTIONS = _handle
+
+
+class CachingProxy:
+    """
+    Proxy HTTP de reenvío que comparten todos los navegadores administrados
+
+    - Los recursos estáticos (JS, CSS, fuentes, imágenes) se sirven desde un
+      AssetStore compartido respetando Cache-Control/Expires y revalidando
+      con ETag/Last-Modified cuando vencen.
+    - Las llamadas a APIs y todo lo que no es cacheable pasan sin cambios.
+    - El HTTPS se tuneliza tal cual; sólo los hosts configurados para
+      intercepción (con un certificado local en el que Chrome confía) se
+      descifran para poder cachear sus bundles.
+    - Opcionalmente encadena la salida a un proxy del ProxyPool (SOCKS/HTTP, Tor).
+    """
+
+    def __init__(
+        self,
+        store: AssetStore,
+        port: int = 8899,
+        upstream_proxy=None,
+        intercept_hosts: Optional[List[str]] = None,
+        cert_file: Optional[str] = None,
+        key_file: Optional[str] = None,
+        upstream_timeout: int = 30
+    ):
+        """
+        Inicializa el proxy
+
+        Args:
+            store: Almacén compartido de recursos
+            port: Puerto local donde escucha el proxy
+            upstream_proxy: ProxyEndpoint por el que salir, o None para salida directa
+            intercept_hosts: Hosts HTTPS cuyos recursos estáticos se cachean
+            cert_file: Certificado (PEM) presentado al navegador para los hosts interceptados
+            key_file: Clave privada del certificado
+            upstream_timeout: Timeout en segundos de las conexiones al origen
+        """
+        self.store = store
+        self.port = port
+        self.upstream_proxy = upstream_proxy
+        self.intercept_hosts = [h.lower() for h in (intercept_hosts or [])]
+        self.upstream_timeout = upstream_timeout
+
+        self.server_tls_context = None
+        if cert_file and key_file and self.intercept_hosts:
+            self.server_tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.server_tls_context.load_cert_chain(cert_file, key_file)
+        self._client_tls_context = ssl.create_default_context()
+
+        self._stats_lock = threading.Lock()
+        self._counters = {
+            "peticiones": 0, "aciertos": 0, "fallos": 0, "revalidados": 0,
+            "pasantes": 0, "tuneles": 0, "bytes_ahorrados": 0, "bytes_origen": 0,
+        }
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        """Valor para --proxy-server de Chrome"""
+        return f"http://127.0.0.1:{self.port}"
+
+    def count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._counters[name] += amount
+
+    def should_intercept(self, host: str) -> bool:
+        """Indica si un túnel HTTPS debe descifrarse para cachear sus recursos"""
+        if self.server_tls_context is None:
+            return False
+        host = host.lower()
+        return any(host == h or host.endswith("." + h) for h in self.intercept_hosts)
+
+    def open_socket(self, host: str, port: int) -> socket.socket:
+        """Abre una conexión TCP al origen, directa o a través del proxy configurado"""
+        if self.upstream_proxy is not None:
+            return self.upstream_proxy.open_socket(host, port, self.upstream_timeout)
+        return socket.create_connection((host, port), timeout=self.upstream_timeout)
+
+    def _request_upstream(
+        self, method: str, scheme: str, host: str, port: int, path: str,
+        headers: List[Tuple[str, str]], body: Optional[bytes]
+    ) -> Tuple[int, str, List[Tuple[str, str]], bytes]:
+        sock = self.open_socket(host, port)
+        if scheme == "https":
+            sock = self._client_tls_context.wrap_socket(sock, server_hostname=host)
+
+        connection = http.client.HTTPConnection(host, port, timeout=self.upstream_timeout)
+        connection.sock = sock
+        try:
+            connection.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+            for name, value in headers:
+                connection.putheader(name, value)
+            if body is not None:
+                connection.putheader("Content-Length", str(len(body)))
+            connection.endheaders(body)
+            response = connection.getresponse()
+            data = response.read()
+            return response.status, response.reason, response.getheaders(), data
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _is_static(method: str, path: str) -> bool:
+        return method == "GET" and urlsplit(path).path.lower().endswith(STATIC_EXTENSIONS)
+
+    def fetch(
+        self, method: str, scheme: str, host: str, port: int, path: str,
+        headers: List[Tuple[str, str]], body: Optional[bytes]
+    ) -> Tuple[int, str, List[Tuple[str, str]], bytes]:
+        """
+        Resuelve una petición del navegador, desde caché si es posible
+
+        Returns:
+            (status, reason, cabeceras, cuerpo) para responder al navegador
+        """
+        self.count("peticiones")
+        if not self._is_static(method, path):
+            self.count("pasantes")
+            result = self._request_upstream(method, scheme, host, port, path, headers, body)
+            self.count("bytes_origen", len(result[3]))
+            return result
+
+        encoding = next((v for k, v in headers if k.lower() == "accept-encoding"), "")
+        key = f"{scheme}://{host}:{port}{path}|{encoding}"
+        entry = self.store.get(key)
+
+        if entry and entry["expires_at"] > time.time():
+            data = self.store.read(entry)
+            self.count("aciertos")
+            self.count("bytes_ahorrados", len(data))
+            return entry["status"], "OK", entry["headers"], data
+
+        request_headers = headers
+        if entry:
+            # Entrada vencida: revalidar con el origen
+            validators = {k.lower(): v for k, v in entry["headers"]}
+            request_headers = [
+                (k, v) for k, v in headers if k.lower() not in ("if-none-match", "if-modified-since")
+            ]
+            if validators.get("etag"):
+                request_headers.append(("If-None-Match", validators["etag"]))
+            if validators.get("last-modified"):
+                request_headers.append(("If-Modified-Since", validators["last-modified"]))
+
+        status, reason, response_headers, data = self._request_upstream(
+            method, scheme, host, port, path, request_headers, body
+        )
+        self.count("bytes_origen", len(data))
+
+        if entry and status == 304:
+            expires_at = self.store.freshness(200, entry["headers"] + response_headers, static=True)
+            self.store.refresh(key, response_headers, expires_at or time.time())
+            cached = self.store.read(entry)
+            self.count("revalidados")
+            self.count("bytes_ahorrados", len(cached))
+            return entry["status"], "OK", entry["headers"], cached
+
+        self.count("fallos")
+        expires_at = self.store.freshness(status, response_headers, static=True)
+        if expires_at is not None:
+            self.store.put(key, status, response_headers, data, expires_at)
+        return status, reason, response_headers, data
+
+    def start(self):
+        """Inicia el proxy en un hilo en segundo plano"""
+        if self._server:
+            return
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _ProxyHandler)
+        self._server.daemon_threads = True
+        self._server.proxy = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"asset-proxy-{self.port}", daemon=True)
+        self._thread.start()
+        salida = self.upstream_proxy.label if self.upstream_proxy is not None else "directa"
+        print(f"✓ Proxy de recursos escuchando en {self.address} (salida {salida})")
+
+    def stop(self):
+        """Detiene el proxy y persiste el índice de la caché"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.store.save()
+
+    def stats(self) -> Dict:
+        """Métricas del proxy: tasa de aciertos y bytes ahorrados"""
+        with self._stats_lock:
+            counters = dict(self._counters)
+        cacheable = counters["aciertos"] + counters["revalidados"] + counters["fallos"]
+        counters["tasa_aciertos"] = round(
+            (counters["aciertos"] + counters["revalidados"]) / cacheable, 3
+        ) if cacheable else 0.0
+        counters["puerto"] = self.port
+        return counters
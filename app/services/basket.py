@@ -0,0 +1,168 @@
+"""
+Optimización de una canasta de medicamentos entre farmacias
+
+Dada la lista de medicamentos y los precios de cada farmacia, elige la
+farmacia, o el conjunto de hasta `max_pharmacies` farmacias, que cubre más
+medicamentos de la lista y, a igual cobertura, cuesta menos en total; cada
+medicamento se compra en la más barata del conjunto que lo tiene.
+
+Si el número de conjuntos posibles es pequeño (después de descartar las
+farmacias dominadas por otra más barata en todo) se prueban todos y el
+resultado es exacto. Si no, se construye el conjunto de forma voraz y se
+mejora intercambiando farmacias mientras baje el costo.
+"""
+import itertools
+from math import comb
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+EXACT = "exacto"
+HEURISTIC = "heuristico"
+
+
+class BasketPlan:
+    """Conjunto de farmacias elegido y la farmacia de cada medicamento"""
+
+    def __init__(self, pharmacies: List[Hashable], assignment: Dict[int, Hashable], total: float, method: str):
+        """
+        Args:
+            pharmacies: Farmacias elegidas
+            assignment: Índice del medicamento -> farmacia donde se compra (sólo los cubiertos)
+            total: Costo total de los medicamentos cubiertos
+            method: "exacto" o "heuristico"
+        """
+        self.pharmacies = pharmacies
+        self.assignment = assignment
+        self.total = total
+        self.method = method
+
+
+def _score(costs: np.ndarray) -> Tuple[int, float]:
+    """Medicamentos sin cubrir y costo de los cubiertos (menor es mejor)"""
+    covered = np.isfinite(costs)
+    return int((~covered).sum()), float(costs[covered].sum())
+
+
+def _prune_dominated(matrix: np.ndarray) -> np.ndarray:
+    """Índices de las farmacias que no están dominadas (otra igual o más barata en todo y distinta)"""
+    keep = []
+    for i in range(len(matrix)):
+        dominated = np.all(matrix <= matrix[i], axis=1) & np.any(matrix < matrix[i], axis=1)
+        # Entre farmacias idénticas se conserva la primera
+        identical = np.all(matrix == matrix[i], axis=1)
+        if not dominated.any() and not identical[:i].any():
+            keep.append(i)
+    return np.array(keep, dtype=np.int64)
+
+
+def _exact(
+    matrix: np.ndarray, candidates: np.ndarray, max_pharmacies: int, chunk: int = 4096
+) -> Tuple[Tuple[int, ...], Tuple[int, float]]:
+    """Prueba todos los conjuntos, evaluando cada bloque de `chunk` conjuntos con una operación vectorizada"""
+    best, best_score = (), (matrix.shape[1] + 1, 0.0)
+    for size in range(1, min(max_pharmacies, len(candidates)) + 1):
+        combos = itertools.combinations(candidates, size)
+        while True:
+            block = np.array(list(itertools.islice(combos, chunk)), dtype=np.int64).reshape(-1, size)
+            if len(block) == 0:
+                break
+            costs = matrix[block].min(axis=1)
+            covered = np.isfinite(costs)
+            uncovered = (~covered).sum(axis=1)
+            totals = np.where(covered, costs, 0.0).sum(axis=1)
+            i = np.lexsort((totals, uncovered))[0]
+            score = (int(uncovered[i]), float(totals[i]))
+            if score < best_score:
+                best, best_score = tuple(block[i]), score
+    return best, best_score
+
+
+def _heuristic(matrix: np.ndarray, candidates: np.ndarray, max_pharmacies: int) -> Tuple[Tuple[int, ...], Tuple[int, float]]:
+    chosen: List[int] = []
+    current = np.full(matrix.shape[1], np.inf)
+    # Voraz: agregar la farmacia que más mejora la cobertura y luego el costo
+    while len(chosen) < max_pharmacies:
+        options = [(i, _score(np.minimum(current, matrix[i]))) for i in candidates if i not in chosen]
+        if not options:
+            break
+        index, score = min(options, key=lambda option: option[1])
+        if chosen and score >= _score(current):
+            break
+        chosen.append(index)
+        current = np.minimum(current, matrix[index])
+
+    # Búsqueda local: reemplazar una farmacia elegida por otra mientras mejore
+    best_score = _score(current)
+    improved = True
+    while improved:
+        improved = False
+        for position, i in itertools.product(range(len(chosen)), candidates):
+            if i in chosen:
+                continue
+            trial = chosen[:position] + [i] + chosen[position + 1:]
+            score = _score(matrix[trial].min(axis=0))
+            if score < best_score:
+                chosen, best_score, improved = trial, score, True
+                break
+    return tuple(chosen), best_score
+
+
+def optimize(
+    prices: Sequence[Dict[Hashable, float]],
+    max_pharmacies: int = 2,
+    exact_max_combinations: int = 200000
+) -> BasketPlan:
+    """
+    Elige las farmacias para una canasta
+
+    Args:
+        prices: Por cada medicamento de la lista, farmacia -> costo (precio × cantidad)
+        max_pharmacies: Farmacias máximas del conjunto
+        exact_max_combinations: Conjuntos posibles hasta los que se prueba todo
+
+    Returns:
+        Plan con las farmacias elegidas, la farmacia de cada medicamento y el total
+    """
+    pharmacies = sorted({p for item in prices for p in item}, key=str)
+    if not pharmacies:
+        return BasketPlan([], {}, 0.0, EXACT)
+
+    matrix = np.full((len(pharmacies), len(prices)), np.inf)
+    position = {p: i for i, p in enumerate(pharmacies)}
+    for column, item in enumerate(prices):
+        for pharmacy, cost in item.items():
+            matrix[position[pharmacy], column] = cost
+
+    candidates = _prune_dominated(matrix)
+    combinations = sum(comb(len(candidates), size) for size in range(1, max_pharmacies + 1))
+    if combinations <= exact_max_combinations:
+        method, (chosen, (_, total)) = EXACT, _exact(matrix, candidates, max_pharmacies)
+    else:
+        method, (chosen, (_, total)) = HEURISTIC, _heuristic(matrix, candidates, max_pharmacies)
+
+    # Sin farmacias que aporten no se elige ninguna
+    chosen = [i for i in chosen if np.isfinite(matrix[i]).any()]
+    assignment = {}
+    if chosen:
+        sub = matrix[chosen]
+        for column in range(len(prices)):
+            if np.isfinite(sub[:, column]).any():
+                assignment[column] = pharmacies[chosen[int(np.argmin(sub[:, column]))]]
+    used = [pharmacies[i] for i in chosen if pharmacies[i] in assignment.values()]
+    return BasketPlan(used, assignment, total, method)
+
+
+def single_pharmacy_ranking(prices: Sequence[Dict[Hashable, float]], limit: int = 5) -> List[Tuple[Hashable, int, float]]:
+    """
+    Mejores farmacias para comprar toda la lista en una sola
+
+    Returns:
+        Tuplas (farmacia, medicamentos que tiene, costo de esos medicamentos), de la mejor a la peor
+    """
+    totals: Dict[Hashable, List[float]] = {}
+    for item in prices:
+        for pharmacy, cost in item.items():
+            totals.setdefault(pharmacy, []).append(cost)
+    ranking = sorted(totals.items(), key=lambda entry: (-len(entry[1]), sum(entry[1])))
+    return [(pharmacy, len(costs), sum(costs)) for pharmacy, costs in ranking[:limit]]
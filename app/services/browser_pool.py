@@ -0,0 +1,341 @@
+"""
+Pool de sesiones de navegador reutilizables para los scrapers
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class BrowserSession:
+    """Sesión de Chrome administrada por un BrowserPool"""
+
+    def __init__(self, pool_name: str, slot: int):
+        """
+        Inicializa la sesión
+
+        Args:
+            pool_name: Nombre del pool dueño de la sesión (digemid, uber)
+            slot: Índice del slot que ocupa dentro del pool
+        """
+        self.pool_name = pool_name
+        self.slot = slot
+        self.driver = None
+        self.created_at = time.time()
+        self.last_used: Optional[float] = None
+        self.searches_served = 0
+        self.rss_mb = 0.0
+        self.js_heap_mb = 0.0
+        self.retire_reason: Optional[str] = None
+        # Progreso de la última búsqueda que no terminó (para reanudar reintentos)
+        self.checkpoint = None
+        # Proxy de salida fijo de la sesión y su circuito Tor, si lo es
+        self.proxy_endpoint = None
+        self.tor_circuit = None
+        # Login del servicio (cookies cargadas y su vencimiento), si lo requiere
+        self.login = None
+        self._finalizers: List[Callable[[], None]] = []
+
+    @property
+    def driver_pid(self) -> Optional[int]:
+        """PID del proceso chromedriver de la sesión"""
+        try:
+            return self.driver.service.process.pid
+        except Exception:
+            return None
+
+    def on_close(self, callback: Callable[[], None]):
+        """Registra una función a ejecutar cuando la sesión se cierre"""
+        self._finalizers.append(callback)
+
+    def is_alive(self) -> bool:
+        """
+        Verifica que el navegador siga respondiendo
+
+        Returns:
+            True si el driver responde a comandos
+        """
+        if self.driver is None:
+            return False
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def quit(self):
+        """Cierra el navegador y libera los recursos asociados"""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"⚠ Error cerrando navegador {self.pool_name}#{self.slot}: {str(e)}")
+            self.driver = None
+
+        for callback in self._finalizers:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠ Error liberando recursos de {self.pool_name}#{self.slot}: {str(e)}")
+        self._finalizers = []
+
+    def to_dict(self) -> Dict:
+        """Resumen serializable de la sesión"""
+        return {
+            "slot": self.slot,
+            "driver_pid": self.driver_pid,
+            "edad_segundos": round(time.time() - self.created_at, 1),
+            "busquedas": self.searches_served,
+            "rss_mb": round(self.rss_mb, 1),
+            "js_heap_mb": round(self.js_heap_mb, 1),
+            "retirar": self.retire_reason,
+        }
+
+
+class BrowserPool:
+    """Administra un conjunto acotado de sesiones de Chrome reutilizables"""
+
+    def __init__(
+        self,
+        name: str,
+        driver_factory: Callable[[BrowserSession], object],
+        size: int = 2,
+        max_searches: int = 50
+    ):
+        """
+        Inicializa el pool
+
+        Args:
+            name: Nombre del pool (se usa en logs y métricas)
+            driver_factory: Función que recibe la sesión y devuelve un WebDriver listo
+            size: Número máximo de navegadores simultáneos
+            max_searches: Búsquedas que puede atender una sesión antes de reciclarse
+        """
+        self.name = name
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        self.max_searches = max_searches
+        self.concurrency_limit = self.size
+
+        self._cond = threading.Condition()
+        self._sessions: Dict[int, BrowserSession] = {}
+        self._idle: List[BrowserSession] = []
+        self._free_slots: List[int] = list(range(self.size))
+        self._in_use = 0
+        self._maintenance = 0
+        self._closed = False
+        self.recycled = 0
+
+    def _can_acquire(self) -> bool:
+        return self._in_use < self.concurrency_limit and (bool(self._idle) or bool(self._free_slots))
+
+    def acquire(self, timeout: Optional[float] = None) -> BrowserSession:
+        """
+        Obtiene una sesión libre, creando el navegador si hace falta
+
+        Args:
+            timeout: Segundos máximos de espera por una sesión libre
+
+        Returns:
+            BrowserSession lista para usarse
+
+        Raises:
+            TimeoutError: Si no se liberó ninguna sesión a tiempo
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"El pool {self.name} está cerrado")
+            if not self._cond.wait_for(self._can_acquire, timeout=timeout):
+                raise TimeoutError(f"No hay navegadores libres en el pool {self.name}")
+
+            self._in_use += 1
+            if self._idle:
+                session = self._idle.pop()
+                session.last_used = time.time()
+                return session
+
+            slot = self._free_slots.pop(0)
+            session = BrowserSession(self.name, slot)
+            self._sessions[slot] = session
+
+        # El navegador se crea fuera del lock: puede tardar varios segundos
+        try:
+            session.driver = self.driver_factory(session)
+        except Exception:
+            session.quit()
+            with self._cond:
+                self._forget(session)
+                self._in_use -= 1
+                self._cond.notify_all()
+            raise
+
+        session.last_used = time.time()
+        print(f"✓ Navegador {self.name}#{session.slot} iniciado")
+        return session
+
+    def release(self, session: BrowserSession, discard: bool = False):
+        """
+        Devuelve una sesión al pool
+
+        Args:
+            session: Sesión obtenida con acquire()
+            discard: Si la sesión debe cerrarse en lugar de reutilizarse
+        """
+        session.searches_served += 1
+        if not discard and session.retire_reason is None:
+            if session.searches_served >= self.max_searches:
+                session.retire_reason = f"{session.searches_served} búsquedas atendidas"
+            elif not session.is_alive():
+                session.retire_reason = "el navegador no responde"
+
+        retire = discard or session.retire_reason is not None or self._closed
+        with self._cond:
+            self._in_use -= 1
+            if not retire:
+                self._idle.append(session)
+            self._cond.notify_all()
+
+        if retire:
+            self._retire(session, session.retire_reason or "descartada")
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """
+        Context manager que adquiere y libera una sesión
+
+        Si el bloque lanza una excepción la sesión se descarta.
+        """
+        session = self.acquire(timeout=timeout)
+        try:
+            yield session
+        except BaseException:
+            self.release(session, discard=True)
+            raise
+        else:
+            self.release(session)
+
+    def mark_for_recycle(self, session: BrowserSession, reason: str):
+        """
+        Marca una sesión para reciclarse
+
+        Si está libre se cierra de inmediato; si está en uso se cierra al liberarse.
+        """
+        with self._cond:
+            if session.retire_reason is None:
+                session.retire_reason = reason
+            idle = session in self._idle
+            if idle:
+                self._idle.remove(session)
+
+        if idle:
+            self._retire(session, reason)
+
+    def _retire(self, session: BrowserSession, reason: str):
+        """Cierra una sesión y libera su slot"""
+        print(f"♻ Reciclando navegador {self.name}#{session.slot}: {reason}")
+        session.quit()
+        with self._cond:
+            self._forget(session)
+            self.recycled += 1
+            self._cond.notify_all()
+
+    def _forget(self, session: BrowserSession):
+        """Libera el slot de una sesión (requiere el lock)"""
+        if self._sessions.get(session.slot) is session:
+            del self._sessions[session.slot]
+            self._free_slots.append(session.slot)
+            self._free_slots.sort()
+
+    def maintain(
+        self,
+        callback: Callable[[BrowserSession], Optional[str]],
+        only: Optional[BrowserSession] = None
+    ) -> int:
+        """
+        Ejecuta una tarea de mantenimiento sobre cada sesión libre
+
+        Mientras dura la tarea la sesión no puede adquirirse. Si el callback
+        devuelve un motivo, la sesión se recicla.
+
+        Args:
+            callback: Función que recibe la sesión y devuelve un motivo de reciclaje o None
+            only: Limitar el mantenimiento a esta sesión (si sigue libre)
+
+        Returns:
+            Número de sesiones revisadas
+        """
+        with self._cond:
+            pending = [s for s in self._idle if only is None or s is only]
+            self._idle = [s for s in self._idle if s not in pending]
+            self._maintenance += len(pending)
+
+        for session in pending:
+            try:
+                reason = callback(session)
+            except Exception as e:
+                reason = f"error en mantenimiento: {str(e)}"
+            reason = reason or session.retire_reason
+
+            if reason:
+                session.retire_reason = session.retire_reason or reason
+                with self._cond:
+                    self._maintenance -= 1
+                self._retire(session, session.retire_reason)
+            else:
+                with self._cond:
+                    self._maintenance -= 1
+                    if self._closed:
+                        retire = True
+                    else:
+                        retire = False
+                        self._idle.append(session)
+                    self._cond.notify_all()
+                if retire:
+                    self._retire(session, "pool cerrado")
+        return len(pending)
+
+    def set_concurrency_limit(self, limit: int):
+        """
+        Ajusta cuántas sesiones pueden usarse a la vez
+
+        Args:
+            limit: Nuevo límite (se acota entre 1 y el tamaño del pool)
+        """
+        limit = max(1, min(self.size, limit))
+        with self._cond:
+            if limit != self.concurrency_limit:
+                print(f"Pool {self.name}: concurrencia {self.concurrency_limit} → {limit}")
+            self.concurrency_limit = limit
+            self._cond.notify_all()
+
+    def sessions(self) -> List[BrowserSession]:
+        """Lista de sesiones vivas (libres y en uso)"""
+        with self._cond:
+            return list(self._sessions.values())
+
+    def managed_pids(self) -> List[int]:
+        """PIDs de chromedriver de las sesiones vivas"""
+        return [pid for pid in (s.driver_pid for s in self.sessions()) if pid]
+
+    def stats(self) -> Dict:
+        """Estado actual del pool"""
+        with self._cond:
+            return {
+                "tamano": self.size,
+                "limite_concurrencia": self.concurrency_limit,
+                "en_uso": self._in_use,
+                "libres": len(self._idle),
+                "reciclados": self.recycled,
+                "sesiones": [s.to_dict() for s in self._sessions.values()],
+            }
+
+    def close(self):
+        """Cierra todas las sesiones libres y rechaza nuevas adquisiciones"""
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._cond.notify_all()
+
+        for session in idle:
+            self._retire(session, "pool cerrado")
@@ -0,0 +1,203 @@
+"""
+Perfiles persistentes de Chrome para los navegadores del pool
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+# Archivos que Chrome deja bloqueados mientras el perfil está en uso
+LOCK_FILES = ("SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile")
+
+# Contenido que no vale la pena copiar al clonar la plantilla
+CLONE_IGNORE = shutil.ignore_patterns(*LOCK_FILES, "Crashpad", "*.tmp", "BrowserMetrics*")
+
+
+class ProfileManager:
+    """
+    Administra directorios user-data-dir reutilizables, uno por slot del pool
+
+    La caché HTTP, los service workers y las cookies del perfil sobreviven al
+    reciclaje del navegador. Cada servicio tiene además un perfil plantilla que
+    se actualiza desde un slot caliente y se clona para los slots nuevos, así
+    un navegador recién creado ya tiene los bundles del SPA en caché.
+
+    Copiar un perfil (caché incluida) puede llevar segundos, así que la
+    plantilla se actualiza en un hilo aparte y no en el cierre del navegador,
+    que corre en el hilo de una petición.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = ".browser_profiles",
+        template_max_age: int = 6 * 3600,
+        refresh_interval: int = 600
+    ):
+        """
+        Inicializa el administrador de perfiles
+
+        Args:
+            base_dir: Directorio donde se guardan los perfiles
+            template_max_age: Segundos tras los cuales la plantilla se vuelve a copiar desde un slot
+            refresh_interval: Segundos mínimos entre intentos de actualizar la plantilla de un servicio
+        """
+        self.base_dir = Path(base_dir).resolve()
+        self.template_max_age = template_max_age
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._copied = threading.Condition(self._lock)
+        # Slots que se están copiando a la plantilla y último intento por servicio
+        self._copying: Set[Tuple[str, int]] = set()
+        self._last_refresh: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-template")
+        self.clones = 0
+        self.refreshes = 0
+
+    def _upstream_dir(self, upstream: str) -> Path:
+        return self.base_dir / upstream
+
+    def slot_dir(self, upstream: str, slot: int) -> Path:
+        """Directorio de perfil de un slot"""
+        return self._upstream_dir(upstream) / f"slot-{slot}"
+
+    def template_dir(self, upstream: str) -> Path:
+        """Directorio del perfil plantilla de un servicio"""
+        return self._upstream_dir(upstream) / "template"
+
+    def prepare(self, upstream: str, slot: int) -> str:
+        """
+        Deja listo el perfil de un slot antes de iniciar Chrome
+
+        Si el slot ya tiene perfil se reutiliza; si no, se clona la plantilla.
+
+        Args:
+            upstream: Servicio dueño del perfil (digemid, uber)
+            slot: Slot del pool
+
+        Returns:
+            Ruta del directorio para --user-data-dir
+        """
+        path = self.slot_dir(upstream, slot)
+        template = self.template_dir(upstream)
+
+        with self._lock:
+            # Un slot que se está copiando a la plantilla no se reabre hasta terminar la copia
+            self._copied.wait_for(lambda: (upstream, slot) not in self._copying)
+            if not path.exists():
+                if template.exists():
+                    shutil.copytree(template, path, ignore=CLONE_IGNORE)
+                    self.clones += 1
+                    print(f"✓ Perfil {upstream}/slot-{slot} clonado desde la plantilla")
+                else:
+                    path.mkdir(parents=True)
+
+        self._clear_locks(path)
+        self._mark_clean_exit(path)
+        return str(path)
+
+    def release(self, upstream: str, slot: int):
+        """
+        Se llama al cerrar el navegador de un slot
+
+        Si la plantilla no existe o está vencida se programa su reemplazo por
+        una copia del perfil del slot, que ya contiene la caché caliente. Se
+        hace como mucho un intento cada `refresh_interval` segundos por servicio.
+        """
+        path = self.slot_dir(upstream, slot)
+        template = self.template_dir(upstream)
+        if not path.exists():
+            return
+
+        with self._lock:
+            if template.exists() and time.time() - template.stat().st_mtime < self.template_max_age:
+                return
+            now = time.monotonic()
+            last = self._last_refresh.get(upstream)
+            if last is not None and now - last < self.refresh_interval:
+                return
+            self._last_refresh[upstream] = now
+            self._copying.add((upstream, slot))
+
+        try:
+            self._executor.submit(self._refresh_template, upstream, slot)
+        except RuntimeError:
+            # El administrador ya se cerró
+            self._done_copying(upstream, slot)
+
+    def _done_copying(self, upstream: str, slot: int):
+        with self._lock:
+            self._copying.discard((upstream, slot))
+            self._copied.notify_all()
+
+    def _refresh_template(self, upstream: str, slot: int):
+        """Reemplaza la plantilla de un servicio por una copia del perfil del slot (hilo aparte)"""
+        path = self.slot_dir(upstream, slot)
+        template = self.template_dir(upstream)
+        staging = template.with_name("template.tmp")
+        retired = template.with_name("template.old")
+        try:
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.copytree(path, staging, ignore=CLONE_IGNORE)
+            # El cambio de plantilla es breve y no coincide con un clon en curso
+            with self._lock:
+                if template.exists():
+                    template.rename(retired)
+                staging.rename(template)
+                # copytree conserva el mtime del slot; la vigencia cuenta desde la copia
+                os.utime(template)
+                self.refreshes += 1
+            shutil.rmtree(retired, ignore_errors=True)
+            print(f"✓ Plantilla de perfil {upstream} actualizada desde slot-{slot}")
+        except Exception as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            print(f"⚠ No se pudo actualizar la plantilla de {upstream}: {str(e)}")
+        finally:
+            self._done_copying(upstream, slot)
+
+    def close(self):
+        """Espera la actualización de plantilla en curso y descarta las pendientes"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._copying.clear()
+            self._copied.notify_all()
+
+    def _clear_locks(self, path: Path):
+        """Elimina bloqueos que Chrome dejó si se cerró de forma abrupta"""
+        for name in LOCK_FILES:
+            lock = path / name
+            try:
+                if lock.is_symlink() or lock.exists():
+                    lock.unlink()
+            except OSError:
+                continue
+
+    def _mark_clean_exit(self, path: Path):
+        """Evita el diálogo de 'restaurar páginas' tras un cierre abrupto"""
+        preferences = path / "Default" / "Preferences"
+        if not preferences.exists():
+            return
+        try:
+            data = json.loads(preferences.read_text(encoding="utf-8"))
+            profile = data.setdefault("profile", {})
+            if profile.get("exit_type") == "Normal" and profile.get("exited_cleanly", True):
+                return
+            profile["exit_type"] = "Normal"
+            profile["exited_cleanly"] = True
+            preferences.write_text(json.dumps(data), encoding="utf-8")
+        except (OSError, ValueError):
+            pass
+
+    def stats(self) -> Dict:
+        """Estado de los perfiles"""
+        return {
+            "directorio": str(self.base_dir),
+            "clonados": self.clones,
+            "plantillas_actualizadas": self.refreshes,
+            "plantillas": sorted(
+                p.parent.name for p in self.base_dir.glob("*/template") if p.is_dir()
+            ) if self.base_dir.exists() else [],
+        }
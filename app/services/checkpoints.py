@@ -0,0 +1,66 @@
+"""
+Checkpoints de búsqueda para reanudar reintentos desde la última fase completada
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class SearchCheckpoint:
+    """
+    Progreso de una búsqueda guardado en la sesión del navegador
+
+    Registra la última fase completada, las filas leídas de la tabla y los
+    resultados que ya tienen sus detalles, de modo que un reintento continúa
+    desde ahí en lugar de empezar de cero.
+    """
+
+    def __init__(self, key: Tuple, phases: Sequence[str], rows_phase: str):
+        """
+        Args:
+            key: Identificador de la búsqueda (parámetros de la consulta)
+            phases: Fases de la búsqueda en orden de ejecución
+            rows_phase: Fase que produce las filas de la tabla
+        """
+        self.key = key
+        self.phases = tuple(phases)
+        self.rows_phase = rows_phase
+        self.completed: Optional[str] = None
+        self.rows: List[Optional[Dict]] = []
+        self.details: Dict[Tuple, Dict] = {}
+        self.retries = 0
+        self.updated_at = time.time()
+
+    def done(self, phase: str) -> bool:
+        """Indica si la fase ya se completó"""
+        if self.completed is None:
+            return False
+        return self.phases.index(self.completed) >= self.phases.index(phase)
+
+    def complete(self, phase: str):
+        """Marca una fase como completada"""
+        if not self.done(phase):
+            self.completed = phase
+        self.updated_at = time.time()
+
+    def rewind(self, phase: Optional[str] = None):
+        """
+        Vuelve a una fase anterior (p. ej. si el navegador se reinició)
+
+        Los detalles ya obtenidos se conservan: se asocian por contenido de la
+        fila y se reutilizan cuando la misma fila vuelve a aparecer.
+        """
+        self.completed = phase
+        if not self.done(self.rows_phase):
+            self.rows = []
+        self.updated_at = time.time()
+
+    def add_details(self, row_key: Tuple, result: Dict):
+        self.details[row_key] = result
+        self.updated_at = time.time()
+
+    def is_stale(self, max_age: float) -> bool:
+        return time.time() - self.updated_at > max_age
+
+    def describe(self) -> str:
+        """Descripción corta para logs"""
+        return f"fase '{self.completed or 'inicio'}', {len(self.details)} filas con detalle"
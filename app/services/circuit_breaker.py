@@ -0,0 +1,170 @@
+"""
+Circuit breaker por servicio externo (DIGEMID, Uber)
+
+Cuando el origen está caído o nos bloquea, cada petición terminaría esperando
+el timeout completo de Selenium. El breaker observa la tasa de fallos y de
+llamadas lentas recientes y, si superan el umbral, se abre: mientras está
+abierto las peticiones no usan el navegador y se responden de inmediato con
+datos locales. Pasado un tiempo deja pasar peticiones de prueba (semiabierto)
+para detectar que el origen se recuperó.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+CLOSED = "cerrado"
+OPEN = "abierto"
+HALF_OPEN = "semiabierto"
+
+
+class CircuitBreaker:
+    """Circuit breaker basado en la tasa de fallos y de llamadas lentas"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 90,
+        slow_call_rate: float = 0.8,
+        window: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 60,
+        half_open_successes: int = 2,
+        probe_timeout: float = 120
+    ):
+        """
+        Args:
+            name: Nombre del servicio (para logs y métricas)
+            failure_rate: Proporción de fallos en la ventana que abre el circuito
+            slow_call_seconds: Duración a partir de la cual una llamada cuenta como lenta
+            slow_call_rate: Proporción de llamadas lentas en la ventana que abre el circuito
+            window: Número de llamadas recientes que se evalúan
+            min_calls: Llamadas mínimas en la ventana antes de evaluar las tasas
+            open_seconds: Segundos que el circuito permanece abierto antes de probar
+            half_open_successes: Pruebas exitosas seguidas necesarias para cerrar el circuito
+            probe_timeout: Segundos tras los cuales una prueba sin resultado se da por perdida
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_successes = half_open_successes
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._probe_successes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.last_reason: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _open(self, reason: str):
+        """Abre el circuito (requiere el lock)"""
+        if self._state != OPEN:
+            print(f"⚡ Circuito {self.name} abierto: {reason}")
+            self.opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self._probe_successes = 0
+        self.last_reason = reason
+
+    def allow(self) -> bool:
+        """
+        Indica si una petición puede usar el servicio externo
+
+        Con el circuito semiabierto sólo se permite una prueba a la vez.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                print(f"⚡ Circuito {self.name} semiabierto: probando el servicio")
+                self._state = HALF_OPEN
+                self._probe_started = None
+                self._probe_successes = 0
+
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.probe_timeout
+            ):
+                self._probe_started = now
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool, seconds: float):
+        """
+        Registra el resultado de una llamada al servicio externo
+
+        Args:
+            success: Si la llamada obtuvo datos del servicio
+            seconds: Duración de la llamada
+        """
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not success:
+                    self._open("falló la petición de prueba")
+                elif slow:
+                    self._open(f"la petición de prueba tardó {seconds:.0f}s")
+                else:
+                    self._probe_successes += 1
+                    self._probe_started = None
+                    if self._probe_successes >= self.half_open_successes:
+                        print(f"⚡ Circuito {self.name} cerrado: el servicio se recuperó")
+                        self._state = CLOSED
+                        self._calls.clear()
+                return
+
+            # Llamadas que empezaron antes de abrirse el circuito
+            if self._state == OPEN:
+                return
+
+            self._calls.append((not success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+            slow_calls = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._open(f"{failures:.0%} de llamadas fallidas")
+            elif slow_calls >= self.slow_call_rate:
+                self._open(f"{slow_calls:.0%} de llamadas lentas")
+
+    def release(self):
+        """
+        Libera la prueba en curso sin registrar un resultado
+
+        Para llamadas que no llegaron al servicio (sin turno del planificador,
+        sin navegador libre o sin poder crearlo, cortadas por el tiempo límite
+        del cliente): no dicen nada del origen y la siguiente petición puede
+        hacer la prueba.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_started = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                "estado": self._state,
+                "tasa_fallos": round(sum(1 for f, _ in self._calls if f) / calls, 3) if calls else 0.0,
+                "tasa_lentas": round(sum(1 for _, s in self._calls if s) / calls, 3) if calls else 0.0,
+                "llamadas_ventana": calls,
+                "aperturas": self.opened,
+                "rechazadas": self.rejected,
+                "ultimo_motivo": self.last_reason,
+            }
@@ -0,0 +1,79 @@
+"""
+Presupuesto de tiempo de una petición
+"""
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Se agotó el tiempo disponible para la petición"""
+
+    def __init__(self, phase: str):
+        super().__init__(f"Tiempo límite agotado en la fase '{phase}'")
+        self.phase = phase
+
+
+class Deadline:
+    """
+    Momento límite en el que el cliente dejará de esperar la respuesta
+
+    Un Deadline sin presupuesto nunca vence, así el código puede consultarlo
+    siempre sin distinguir si el cliente envió o no un límite.
+    """
+
+    def __init__(self, budget_seconds: Optional[float] = None):
+        """
+        Inicializa el deadline
+
+        Args:
+            budget_seconds: Segundos disponibles a partir de ahora (None = sin límite)
+        """
+        self.budget_seconds = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds if budget_seconds is not None else None
+
+    @classmethod
+    def from_ms(cls, *budgets_ms: Optional[int]) -> "Deadline":
+        """
+        Crea un deadline a partir de uno o más presupuestos en milisegundos
+
+        Se usa el más estricto de los presupuestos presentes.
+        """
+        present = [b for b in budgets_ms if b is not None]
+        return cls(min(present) / 1000 if present else None)
+
+    @property
+    def bounded(self) -> bool:
+        """Indica si el deadline tiene un presupuesto"""
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """Segundos restantes (infinito si no hay presupuesto)"""
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        """Segundos transcurridos desde que se creó"""
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        """Indica si queda tiempo para una tarea que tarda aproximadamente `seconds`"""
+        return self.remaining() >= seconds
+
+    def bound(self, seconds: float) -> float:
+        """Acota un timeout para que no supere el tiempo restante"""
+        return max(0.0, min(seconds, self.remaining()))
+
+    def check(self, phase: str):
+        """
+        Verifica que no se haya agotado el tiempo
+
+        Raises:
+            DeadlineExceeded: Si el deadline ya venció
+        """
+        if self.expired():
+            raise DeadlineExceeded(phase)
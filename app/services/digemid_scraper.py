@@ -1,5 +1,5 @@
 import time
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -8,6 +8,16 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
+from .browser_pool import BrowserSession
+from .checkpoints import SearchCheckpoint
+from .deadline import Deadline, DeadlineExceeded
+from .hedging import HedgeCancelled
+from .scheduler import Preempted
+from .html_extract import parse_digemid_results
+
+
+class UpstreamBlocked(Exception):
+    """DIGEMID respondió con una página de bloqueo o CAPTCHA"""
 
 
 class DigemidScraper:
@@ -33,49 +43,112 @@ class DigemidScraper:
         "OYON": "09", "YAUYOS": "10"
     }
 
-    def __init__(self, headless: bool = True, timeout: int = 30, use_tor: bool = False, tor_port: int = 9050):
+    # Segundos aproximados que toma abrir, leer y cerrar el modal de detalle de una fila
+    DETAIL_SECONDS = 6
+
+    # Fases que se registran en el checkpoint de la búsqueda, en orden
+    CHECKPOINT_PHASES = ("navegacion", "modal", "medicamento", "ubicacion", "filas", "detalles")
+
+    # Segundos que un checkpoint guardado en la sesión sigue siendo reanudable
+    CHECKPOINT_MAX_AGE = 300
+
+    # Textos de las páginas de bloqueo (WAF, CAPTCHA, límite de peticiones)
+    BLOCK_MARKERS = (
+        "captcha", "the requested url was rejected", "access denied",
+        "attention required", "too many requests", "request unsuccessful",
+    )
+
+    def __init__(
+        self,
+        headless: bool = True,
+        timeout: int = 30,
+        use_tor: bool = False,
+        tor_port: int = 9050,
+        session: Optional[BrowserSession] = None,
+        user_data_dir: Optional[str] = None,
+        proxy_server: Optional[str] = None,
+        extra_arguments: Optional[List[str]] = None,
+        extraction_mode: str = "dom",
+        max_retries: int = 2,
+        retry_budget: float = 60
+    ):
         """
         Inicializa el scraper
 
         Args:
             headless: Si debe ejecutarse en modo headless (sin interfaz gráfica)
             timeout: Tiempo máximo de espera en segundos
-            use_tor: Si debe usar la red Tor para la conexión
+            use_tor: Si debe usar la red Tor para la conexión (Tor debe estar corriendo)
             tor_port: Puerto SOCKS de Tor (default: 9050)
+            session: Sesión de navegador del pool a reutilizar (no se cierra al terminar)
+            user_data_dir: Perfil persistente de Chrome (caché y service workers del SPA)
+            proxy_server: Proxy para Chrome (p. ej. el proxy local de recursos); tiene prioridad sobre Tor
+            extra_arguments: Argumentos adicionales para Chrome
+            extraction_mode: "dom" (celda por celda vía WebDriver) o "snapshot" (HTML procesado localmente)
+            max_retries: Reintentos máximos por búsqueda (se reanudan desde el último checkpoint)
+            retry_budget: Segundos máximos que pueden consumir los reintentos
         """
         self.headless = headless
         self.timeout = timeout
         self.use_tor = use_tor
         self.tor_port = tor_port
+        self.session = session
+        self.user_data_dir = user_data_dir
+        self.proxy_server = proxy_server
+        self.extra_arguments = extra_arguments or []
+        self.extraction_mode = extraction_mode
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
         self.driver = None
-        self.tor_manager = None
+        self.checkpoint: Optional[SearchCheckpoint] = None
+        self.deadline = Deadline()
+        self.current_phase: Optional[str] = None
+        self.partial = False
+        self.progress: Optional[Callable[[str], None]] = None
+
+    def _phase(self, name: str, enforce: bool = True):
+        """
+        Marca el inicio de una fase de la búsqueda
+
+        Args:
+            name: Nombre de la fase
+            enforce: Si debe abortarse la búsqueda cuando ya no queda tiempo
+
+        Raises:
+            DeadlineExceeded: Si ya no queda tiempo para continuar
+            HedgeCancelled: Si otro intento de la misma búsqueda ya terminó
+            Preempted: Si el trabajo de fondo debe ceder su turno
+        """
+        self.current_phase = name
+        if self.progress is not None:
+            self.progress(name)
+        if enforce:
+            self.deadline.check(name)
+
+    def _wait(self, seconds: float) -> WebDriverWait:
+        """WebDriverWait cuyo timeout no supera el tiempo restante de la petición"""
+        return WebDriverWait(self.driver, max(0.5, self.deadline.bound(seconds)))
 
     def _setup_driver(self):
-        """Configura el driver de Selenium"""
+        """
+        Configura el driver de Selenium
+
+        Returns:
+            El WebDriver creado (también queda en self.driver)
+        """
         import os
         from pathlib import Path
 
         chrome_options = Options()
 
-        # Si se usa Tor, iniciar y configurar
-        if self.use_tor:
-            from .tor_manager import TorManager
-
-            print("\n🧅 Configurando conexión Tor...")
-            self.tor_manager = TorManager(tor_port=self.tor_port)
+        # Tor lo administra la aplicación (TorPool): aquí sólo se apunta Chrome al
+        # puerto SOCKS del circuito asignado, salvo que un proxy local ya encadene a Tor
+        if self.use_tor and not self.proxy_server:
+            print(f"\n🧅 Usando circuito Tor en el puerto {self.tor_port}")
+            chrome_options.add_argument(f'--proxy-server=socks5://127.0.0.1:{self.tor_port}')
 
-            # Iniciar Tor si no está corriendo
-            if not self.tor_manager.start_tor():
-                print("⚠ Advertencia: No se pudo iniciar Tor, continuando sin proxy")
-                self.use_tor = False
-            else:
-                # Probar la conexión
-                if self.tor_manager.test_connection():
-                    print("✓ Conexión Tor verificada y funcionando")
-                    # Configurar Chrome para usar Tor
-                    chrome_options.add_argument(f'--proxy-server=socks5://127.0.0.1:{self.tor_port}')
-                else:
-                    print("⚠ Advertencia: Tor está corriendo pero la conexión falló")
+        if self.proxy_server:
+            chrome_options.add_argument(f"--proxy-server={self.proxy_server}")
 
         if self.headless:
             chrome_options.add_argument("--headless=new")
@@ -89,6 +162,16 @@ class DigemidScraper:
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
 
+        # Perfil persistente: conserva la caché del bundle Angular entre navegadores
+        if self.user_data_dir:
+            chrome_options.add_argument(f"--user-data-dir={self.user_data_dir}")
+            chrome_options.add_argument("--no-first-run")
+            chrome_options.add_argument("--no-default-browser-check")
+            chrome_options.add_argument("--hide-crash-restore-bubble")
+
+        for argument in self.extra_arguments:
+            chrome_options.add_argument(argument)
+
         # User agent más común
         if self.use_tor:
             chrome_options.add_argument(
@@ -129,11 +212,12 @@ class DigemidScraper:
                 raise Exception(f"No se pudo iniciar ChromeDriver. Error 1: {str(e)}, Error 2: {str(e2)}")
 
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        return self.driver
 
     def _close_modal(self):
         """Cierra el modal inicial si está presente"""
         try:
-            wait = WebDriverWait(self.driver, 10)
+            wait = self._wait(10)
 
             # Esperar a que el modal sea visible
             modal = wait.until(
@@ -176,7 +260,7 @@ class DigemidScraper:
         Args:
             nombre_medicamento: Nombre del medicamento a buscar
         """
-        wait = WebDriverWait(self.driver, self.timeout)
+        wait = self._wait(self.timeout)
 
         print(f"Buscando campo de entrada para medicamento...")
         # Buscar el input de búsqueda - Esperar a que esté listo
@@ -235,7 +319,7 @@ class DigemidScraper:
         """
         from selenium.webdriver.support.ui import Select
 
-        wait = WebDriverWait(self.driver, self.timeout)
+        wait = self._wait(self.timeout)
 
         # Seleccionar departamento
         print(f"Seleccionando departamento: {departamento}")
@@ -328,7 +412,7 @@ class DigemidScraper:
         Returns:
             Diccionario con los detalles de la farmacia
         """
-        wait = WebDriverWait(self.driver, 10)
+        wait = self._wait(10)
         details = {}
 
         try:
@@ -377,17 +461,135 @@ class DigemidScraper:
 
         return details
 
-    def _extract_results(self, limit: int = 10) -> List[Dict]:
+    def _extract_rows(self, table, row_elements: List, limit: int) -> List[Optional[Dict]]:
+        """
+        Extrae las columnas básicas de las filas de la tabla
+
+        En modo "snapshot" se toma el outerHTML de la tabla una sola vez y se
+        procesa en el propio proceso; en modo "dom" se consulta celda por celda.
+
+        Args:
+            table: Elemento table.table.table-striped
+            row_elements: Filas (tbody tr) de la tabla
+            limit: Número máximo de filas a extraer
+
+        Returns:
+            Una entrada por fila (None si la fila no se pudo leer)
+        """
+        if self.extraction_mode == "snapshot":
+            rows = parse_digemid_results(table.get_attribute("outerHTML"), limit)
+            if len(rows) == min(limit, len(row_elements)):
+                return rows
+            print("⚠ La instantánea HTML no coincide con la tabla, usando extracción DOM")
+
+        rows = []
+        for i, row in enumerate(row_elements[:limit]):
+            try:
+                cells = row.find_elements(By.TAG_NAME, "td")
+                if len(cells) < 7:
+                    rows.append(None)
+                    continue
+
+                precio_str = cells[5].text.strip()
+
+                # Convertir precio a float
+                try:
+                    precio_unitario = float(precio_str)
+                except ValueError:
+                    precio_unitario = 0.0
+
+                rows.append({
+                    "tipo_establecimiento": cells[0].text.strip(),
+                    "fecha_actualizacion": cells[1].text.strip(),
+                    "producto": cells[2].text.strip(),
+                    "laboratorio": cells[3].text.strip(),
+                    "farmacia_botica": cells[4].text.strip(),
+                    "precio_unitario": precio_unitario,
+                })
+            except Exception as e:
+                print(f"  ✗ Error extrayendo fila {i+1}: {str(e)}")
+                rows.append(None)
+
+        return rows
+
+    def _extract_row_details(self, row) -> Dict:
+        """
+        Abre el modal "Ver detalle" de una fila y extrae los datos de la farmacia
+
+        Args:
+            row: Elemento tr de la tabla de resultados
+
+        Returns:
+            Diccionario con los detalles (vacíos si no se pudieron obtener)
+        """
+        try:
+            # Buscar el botón de detalle en la última celda
+            cells = row.find_elements(By.TAG_NAME, "td")
+            detail_link = cells[6].find_element(By.CSS_SELECTOR, "a[title='Ver detalle']")
+
+            # Hacer scroll al elemento
+            self.driver.execute_script("arguments[0].scrollIntoView(true);", detail_link)
+            time.sleep(0.5)
+
+            # Hacer clic
+            print(f"  Haciendo clic en 'Ver detalle'...")
+            try:
+                detail_link.click()
+            except:
+                self.driver.execute_script("arguments[0].click();", detail_link)
+
+            time.sleep(2)  # Esperar a que se abra el modal
+
+            # Extraer detalles del modal
+            details = self._extract_pharmacy_details()
+
+            # Cerrar el modal
+            try:
+                close_btn = self.driver.find_element(By.XPATH, "//button[contains(@class, 'close') or contains(text(), 'Cerrar')]")
+                close_btn.click()
+                time.sleep(1)
+            except:
+                # Intentar presionar ESC
+                from selenium.webdriver.common.keys import Keys
+                self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
+                time.sleep(1)
+
+            return details
+
+        except Exception as e:
+            # Si el navegador murió no tiene sentido seguir con las demás filas
+            if not self._driver_alive():
+                raise
+            print(f"  ⚠ No se pudo obtener detalles: {str(e)}")
+            return self._empty_details()
+
+    @staticmethod
+    def _empty_details() -> Dict:
+        """Detalles de farmacia vacíos para filas sin modal"""
+        return {
+            "nombre_comercial": "",
+            "direccion": "",
+            "telefono": "",
+            "departamento_farmacia": "",
+            "provincia_farmacia": ""
+        }
+
+    def _extract_results(self, limit: int = 10, checkpoint: Optional[SearchCheckpoint] = None) -> List[Dict]:
         """
         Extrae los resultados de la tabla
 
         Args:
             limit: Número máximo de resultados a extraer
+            checkpoint: Progreso de la búsqueda; las filas que ya tienen detalle no se vuelven a abrir
 
         Returns:
             Lista de diccionarios con los datos de los medicamentos
         """
-        wait = WebDriverWait(self.driver, self.timeout)
+        if checkpoint is None:
+            checkpoint = SearchCheckpoint(None, self.CHECKPOINT_PHASES, rows_phase="filas")
+            checkpoint.complete("ubicacion")
+
+        wait = self._wait(self.timeout)
         results = []
 
         try:
@@ -397,102 +599,219 @@ class DigemidScraper:
             )
 
             # Extraer las filas del tbody
-            rows = table.find_elements(By.CSS_SELECTOR, "tbody tr")
-            print(f"Total de filas encontradas: {len(rows)}")
+            row_elements = table.find_elements(By.CSS_SELECTOR, "tbody tr")
+            print(f"Total de filas encontradas: {len(row_elements)}")
 
-            for i, row in enumerate(rows[:limit]):
-                try:
-                    print(f"\nProcesando fila {i+1}/{min(limit, len(rows))}...")
-
-                    cells = row.find_elements(By.TAG_NAME, "td")
-
-                    if len(cells) >= 7:
-                        tipo_establecimiento = cells[0].text.strip()
-                        fecha_actualizacion = cells[1].text.strip()
-                        producto = cells[2].text.strip()
-                        laboratorio = cells[3].text.strip()
-                        farmacia_botica = cells[4].text.strip()
-                        precio_str = cells[5].text.strip()
-
-                        # Convertir precio a float
-                        try:
-                            precio_unitario = float(precio_str)
-                        except ValueError:
-                            precio_unitario = 0.0
-
-                        # Hacer clic en "Ver detalle" para obtener información adicional
-                        details = {}
-                        try:
-                            # Buscar el botón de detalle en la última celda
-                            detail_link = cells[6].find_element(By.CSS_SELECTOR, "a[title='Ver detalle']")
-
-                            # Hacer scroll al elemento
-                            self.driver.execute_script("arguments[0].scrollIntoView(true);", detail_link)
-                            time.sleep(0.5)
-
-                            # Hacer clic
-                            print(f"  Haciendo clic en 'Ver detalle'...")
-                            try:
-                                detail_link.click()
-                            except:
-                                self.driver.execute_script("arguments[0].click();", detail_link)
-
-                            time.sleep(2)  # Esperar a que se abra el modal
-
-                            # Extraer detalles del modal
-                            details = self._extract_pharmacy_details()
-
-                            # Cerrar el modal
-                            try:
-                                close_btn = self.driver.find_element(By.XPATH, "//button[contains(@class, 'close') or contains(text(), 'Cerrar')]")
-                                close_btn.click()
-                                time.sleep(1)
-                            except:
-                                # Intentar presionar ESC
-                                from selenium.webdriver.common.keys import Keys
-                                self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-                                time.sleep(1)
-
-                        except Exception as e:
-                            print(f"  ⚠ No se pudo obtener detalles: {str(e)}")
-                            details = {
-                                "nombre_comercial": "",
-                                "direccion": "",
-                                "telefono": "",
-                                "departamento_farmacia": "",
-                                "provincia_farmacia": ""
-                            }
-
-                        # Combinar información básica con detalles
-                        result = {
-                            "tipo_establecimiento": tipo_establecimiento,
-                            "fecha_actualizacion": fecha_actualizacion,
-                            "producto": producto,
-                            "laboratorio": laboratorio,
-                            "farmacia_botica": farmacia_botica,
-                            "precio_unitario": precio_unitario,
-                            **details  # Agregar detalles de la farmacia
-                        }
-
-                        results.append(result)
-                        print(f"  ✓ Fila {i+1} procesada")
+            if not checkpoint.done("filas"):
+                checkpoint.rows = self._extract_rows(table, row_elements, limit)
+                checkpoint.complete("filas")
+            rows = checkpoint.rows
 
-                except Exception as e:
-                    print(f"  ✗ Error extrayendo fila {i+1}: {str(e)}")
+            for i, row in enumerate(rows):
+                if row is None:
+                    continue
+
+                # Fila ya procesada en un intento anterior
+                row_key = self._row_key(row)
+                if row_key in checkpoint.details:
+                    results.append(checkpoint.details[row_key])
+                    continue
+
+                print(f"\nProcesando fila {i+1}/{len(rows)}...")
+                self._phase("detalles", enforce=False)
+
+                # Los detalles son opcionales: se omiten si no queda tiempo
+                if not self.deadline.allows(self.DETAIL_SECONDS):
+                    if not self.partial:
+                        print(f"  ⏱ Tiempo insuficiente, se omiten los detalles desde la fila {i+1}")
+                    self.partial = True
+                    results.append({**row, **self._empty_details()})
                     continue
 
+                # Hacer clic en "Ver detalle" para obtener información adicional
+                details = self._extract_row_details(row_elements[i])
+
+                # Combinar información básica con detalles
+                result = {**row, **details}
+                checkpoint.add_details(row_key, result)
+                results.append(result)
+                print(f"  ✓ Fila {i+1} procesada")
+
+            if not self.partial:
+                checkpoint.complete("detalles")
+
         except TimeoutException:
             print("No se encontraron resultados en la tabla")
 
         return results
 
+    def _collected(self, checkpoint: SearchCheckpoint) -> List[Dict]:
+        """
+        Resultados ya obtenidos de una búsqueda interrumpida
+
+        Cada fila leída de la tabla va con sus detalles si ya se obtuvieron y
+        con detalles vacíos si no, igual que cuando se acaba el tiempo.
+        """
+        rows = [row for row in checkpoint.rows if row is not None]
+        if not rows:
+            # Tras un retroceso sólo quedan las filas que ya tenían detalle
+            return list(checkpoint.details.values())
+        return [
+            checkpoint.details.get(self._row_key(row)) or {**row, **self._empty_details()}
+            for row in rows
+        ]
+
+    @staticmethod
+    def _row_key(row: Dict) -> tuple:
+        """Identifica una fila por su contenido (estable entre reintentos)"""
+        return (
+            row["producto"], row["farmacia_botica"], row["laboratorio"],
+            row["precio_unitario"], row["fecha_actualizacion"],
+        )
+
+    def _driver_alive(self) -> bool:
+        """Verifica que el navegador siga respondiendo"""
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _detect_block(self) -> Optional[str]:
+        """
+        Revisa si la página actual es una página de bloqueo
+
+        Returns:
+            El texto de bloqueo encontrado, o None
+        """
+        try:
+            page = f"{self.driver.title} {self.driver.page_source[:20000]}".lower()
+        except Exception:
+            return None
+        return next((marker for marker in self.BLOCK_MARKERS if marker in page), None)
+
+    def _load_checkpoint(self, key: tuple) -> SearchCheckpoint:
+        """
+        Obtiene el checkpoint de la búsqueda guardado en la sesión
+
+        Si la sesión tiene un checkpoint reciente de la misma búsqueda se reanuda
+        desde él; si no, se empieza uno nuevo.
+        """
+        holder = self.session if self.session is not None else self
+        checkpoint = holder.checkpoint
+        if checkpoint is not None and checkpoint.key == key and not checkpoint.is_stale(self.CHECKPOINT_MAX_AGE):
+            # La página pudo cambiar desde el intento anterior: se vuelve a navegar,
+            # pero las filas que ya tienen detalle no se vuelven a abrir
+            print(f"↻ Reanudando búsqueda anterior: {checkpoint.describe()}")
+            checkpoint.rewind(None)
+            checkpoint.retries = 0
+            return checkpoint
+
+        checkpoint = SearchCheckpoint(key, self.CHECKPOINT_PHASES, rows_phase="filas")
+        holder.checkpoint = checkpoint
+        return checkpoint
+
+    def _clear_checkpoint(self):
+        holder = self.session if self.session is not None else self
+        holder.checkpoint = None
+
+    def _prepare_retry(self, checkpoint: SearchCheckpoint, error: Exception, retry_started: float) -> bool:
+        """
+        Decide si se reintenta tras un error y deja el navegador listo para reanudar
+
+        Returns:
+            True si debe reintentarse desde el checkpoint
+        """
+        if checkpoint.retries >= self.max_retries:
+            return False
+        if time.monotonic() - retry_started > self.retry_budget:
+            print("⚠ Presupuesto de reintentos agotado")
+            return False
+        if not self.deadline.allows(self.DETAIL_SECONDS):
+            return False
+
+        checkpoint.retries += 1
+        print(f"\n↻ Error en la fase '{self.current_phase}': {str(error)}")
+        print(f"↻ Reintento {checkpoint.retries}/{self.max_retries} desde {checkpoint.describe()}")
+
+        if not self._driver_alive():
+            # Un navegador del pool que murió lo reemplaza el propio pool
+            if self.session is not None:
+                return False
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self._setup_driver()
+            checkpoint.rewind(None)
+            return True
+
+        # Cerrar cualquier modal que haya quedado abierto
+        try:
+            from selenium.webdriver.common.keys import Keys
+            self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
+            time.sleep(1)
+        except Exception:
+            pass
+        return True
+
+    def _run_phases(
+        self,
+        checkpoint: SearchCheckpoint,
+        nombre_medicamento: str,
+        departamento: str,
+        provincia: str,
+        distrito: str,
+        limit: int
+    ) -> List[Dict]:
+        """Ejecuta las fases de la búsqueda que aún no figuran como completadas en el checkpoint"""
+        # Navegar a la página
+        if not checkpoint.done("navegacion"):
+            self._phase("navegacion")
+            print(f"\n2. Navegando a {self.BASE_URL}...")
+            self.driver.get(self.BASE_URL)
+            print("Página cargada, esperando elementos...")
+            time.sleep(self.deadline.bound(5))  # Dar más tiempo para que cargue completamente
+            marker = self._detect_block()
+            if marker:
+                raise UpstreamBlocked(f"Página de bloqueo de DIGEMID ({marker})")
+            checkpoint.complete("navegacion")
+
+        # Cerrar modal inicial
+        if not checkpoint.done("modal"):
+            self._phase("modal")
+            print("\n3. Cerrando modal inicial (si existe)...")
+            self._close_modal()
+            checkpoint.complete("modal")
+
+        # Buscar medicamento
+        if not checkpoint.done("medicamento"):
+            self._phase("medicamento")
+            print("\n4. Buscando medicamento...")
+            self._search_medicine(nombre_medicamento)
+            checkpoint.complete("medicamento")
+
+        # Seleccionar ubicación
+        if not checkpoint.done("ubicacion"):
+            self._phase("ubicacion")
+            print("\n5. Seleccionando ubicación...")
+            self._select_location(departamento, provincia, distrito)
+            checkpoint.complete("ubicacion")
+
+        # Extraer resultados (leer las filas es barato: se intenta aunque no quede tiempo)
+        self._phase("resultados", enforce=False)
+        print("\n6. Extrayendo resultados...")
+        return self._extract_results(limit, checkpoint)
+
     def search_medicines(
         self,
         nombre_medicamento: str,
         departamento: str = "LIMA",
         provincia: str = "LIMA",
         distrito: str = "PUENTE PIEDRA",
-        limit: int = 10
+        limit: int = 10,
+        deadline: Optional[Deadline] = None,
+        progress: Optional[Callable[[str], None]] = None
     ) -> Dict:
         """
         Realiza la búsqueda completa de medicamentos
@@ -503,64 +822,106 @@ class DigemidScraper:
             provincia: Provincia donde buscar
             distrito: Distrito donde buscar
             limit: Número máximo de resultados
+            deadline: Tiempo límite del cliente; si se agota se devuelven las filas obtenidas
+            progress: Callback que recibe el nombre de cada fase alcanzada
 
         Returns:
             Diccionario con los resultados de la búsqueda
         """
+        self.deadline = deadline or Deadline()
+        self.progress = progress
+        self.partial = False
+        checkpoint = self._load_checkpoint((nombre_medicamento, departamento, provincia, distrito, limit))
+        retry_started = None
+
         try:
             print("="*80)
             print(f"Iniciando búsqueda de: {nombre_medicamento}")
             print(f"Ubicación: {departamento} > {provincia} > {distrito}")
+            if self.deadline.bounded:
+                print(f"Tiempo límite: {self.deadline.remaining():.1f}s")
             print("="*80)
 
             # Configurar el driver
-            print("\n1. Configurando ChromeDriver...")
-            self._setup_driver()
-
-            # Navegar a la página
-            print(f"\n2. Navegando a {self.BASE_URL}...")
-            self.driver.get(self.BASE_URL)
-            print("Página cargada, esperando elementos...")
-            time.sleep(5)  # Dar más tiempo para que cargue completamente
+            self._phase("navegador")
+            if self.session is not None:
+                print(f"\n1. Usando navegador del pool ({self.session.pool_name}#{self.session.slot})...")
+                self.driver = self.session.driver
+            else:
+                print("\n1. Configurando ChromeDriver...")
+                self._setup_driver()
 
-            # Cerrar modal inicial
-            print("\n3. Cerrando modal inicial (si existe)...")
-            self._close_modal()
+            while True:
+                try:
+                    results = self._run_phases(
+                        checkpoint, nombre_medicamento, departamento, provincia, distrito, limit
+                    )
+                    break
+                except (DeadlineExceeded, HedgeCancelled, UpstreamBlocked, Preempted):
+                    raise
+                except Exception as e:
+                    retry_started = retry_started or time.monotonic()
+                    if not self._prepare_retry(checkpoint, e, retry_started):
+                        raise
 
-            # Buscar medicamento
-            print("\n4. Buscando medicamento...")
-            self._search_medicine(nombre_medicamento)
+            self.partial = self.partial or (self.deadline.expired() and len(results) < limit)
 
-            # Seleccionar ubicación
-            print("\n5. Seleccionando ubicación...")
-            self._select_location(departamento, provincia, distrito)
+            if self.partial:
+                print(f"\n⏱ Búsqueda parcial: {len(results)} resultados en {self.deadline.elapsed():.1f}s")
+                message = "Búsqueda parcial: el tiempo límite no alcanzó para completar todos los datos"
+            else:
+                print(f"\n✓ Búsqueda completada: {len(results)} resultados encontrados")
+                message = "Búsqueda completada exitosamente"
 
-            # Extraer resultados
-            print("\n6. Extrayendo resultados...")
-            results = self._extract_results(limit)
-            print(f"\n✓ Búsqueda completada: {len(results)} resultados encontrados")
+            if not results and self.deadline.expired():
+                raise DeadlineExceeded(self.current_phase)
+            self._phase("fin", enforce=False)
+            self._clear_checkpoint()
 
             return {
                 "success": True,
-                "message": "Búsqueda completada exitosamente",
+                "message": message,
                 "total_encontrados": len(results),
                 "resultados": results,
+                "parcial": self.partial,
+                "bloqueado": False,
                 "error": None
             }
 
+        except Preempted:
+            # El checkpoint queda en la sesión para retomar la búsqueda en el próximo turno
+            raise
         except Exception as e:
+            # Un error de espera suele ser una página de bloqueo que no tiene los elementos
+            blocked = isinstance(e, UpstreamBlocked) or (
+                not isinstance(e, (DeadlineExceeded, HedgeCancelled)) and self._detect_block() is not None
+            )
+
+            # Conservar el trabajo hecho: las filas leídas se devuelven como parciales
+            collected = self._collected(checkpoint)[:limit]
+            if collected and not isinstance(e, HedgeCancelled):
+                print(f"\n⚠ Búsqueda interrumpida ({str(e)}), devolviendo {len(collected)} resultados obtenidos")
+                return {
+                    "success": True,
+                    "message": "Búsqueda parcial: se devuelven los resultados obtenidos antes del error",
+                    "total_encontrados": len(collected),
+                    "resultados": collected,
+                    "parcial": True,
+                    "bloqueado": blocked,
+                    "error": str(e)
+                }
+
             return {
                 "success": False,
                 "message": "Error durante la búsqueda",
                 "total_encontrados": 0,
                 "resultados": [],
+                "parcial": isinstance(e, DeadlineExceeded),
+                "bloqueado": blocked,
                 "error": str(e)
             }
 
         finally:
-            if self.driver:
+            # Los navegadores del pool los cierra el propio pool
+            if self.driver and self.session is None:
                 self.driver.quit()
-
-            # Limpiar recursos de Tor
-            if self.tor_manager:
-                self.tor_manager.stop_tor()
@@ -0,0 +1,52 @@
+"""
+Clave espacial para la caché de tarifas de Uber
+
+Las tarifas de un mismo par origen/destino casi no cambian en un par de
+minutos. Las cotizaciones se guardan por celda geohash de los lugares
+resueltos (ver PlaceCache), así que dos textos distintos para el mismo lugar,
+o dos puntos a pocos metros, comparten la tarifa guardada. Si un lugar aún no
+está resuelto se usa su texto normalizado.
+"""
+from typing import Optional, Tuple
+
+from .place_cache import PlaceCache, ResolvedPlace, normalize_place
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude: float, longitude: float, precision: int = 7) -> str:
+    """Celda geohash de un punto (precisión 7 ≈ 150 m, 6 ≈ 1 km)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    cell, bits, bit_count, even = [], 0, 0, True
+    while len(cell) < precision:
+        value, interval = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(cell)
+
+
+def place_bucket(text: str, places: Optional[PlaceCache], precision: int) -> str:
+    """Celda del lugar si está resuelto con coordenadas; si no, su texto normalizado"""
+    return bucket_of(text, places.get(text) if places is not None else None, precision)
+
+
+def bucket_of(text: str, place: Optional[ResolvedPlace], precision: int) -> str:
+    """Celda de un lugar ya buscado en la caché (None si no está resuelto)"""
+    if place is not None and place.latitude is not None and place.longitude is not None:
+        return f"geo:{geohash(float(place.latitude), float(place.longitude), precision)}"
+    return f"texto:{normalize_place(text)}"
+
+
+def fare_key(pickup: str, destination: str, places: Optional[PlaceCache], precision: int = 7) -> Tuple[str, str]:
+    """Clave de la caché de tarifas para un par origen/destino"""
+    return place_bucket(pickup, places, precision), place_bucket(destination, places, precision)
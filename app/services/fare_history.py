@@ -0,0 +1,323 @@
+"""
+Historial de tarifas de Uber y estimación a partir de él
+
+Cada cotización exitosa se guarda en una base SQLite local: celdas de origen
+y destino, distancia, tipo de viaje, precio, tiempo de espera y hora. Cuando
+Uber está lento, fallando o con el circuito abierto, la API responde con una
+estimación por tipo de viaje calculada del historial (mediana y banda de
+percentiles 10-90) en lugar de precios inventados.
+
+La estimación usa, en orden, el historial de la misma ruta en la misma
+franja horaria, de la misma ruta a cualquier hora, de rutas de distancia
+parecida en la misma franja y de distancia parecida a cualquier hora; la
+primera en la que algún tipo de viaje reúna suficientes cotizaciones. Los
+tipos de viaje con menos cotizaciones se omiten de la estimación, y las
+cotizaciones en monedas distintas no se mezclan en una misma mediana.
+
+La estimación no toca la base: las cotizaciones vigentes se cargan al
+iniciar en un índice en memoria por ruta y por tramo de distancia, que cada
+cotización nueva actualiza al instante. Las inserciones se encolan y las
+escribe un hilo en segundo plano, como en PriceHistory, así que una escritura
+lenta no retrasa ninguna estimación.
+"""
+import math
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .fare_cache import bucket_of
+from .place_cache import PlaceCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tarifas (
+    ts REAL NOT NULL,
+    ruta TEXT NOT NULL,
+    distancia_km REAL,
+    tramo_distancia INTEGER,
+    hora INTEGER NOT NULL,
+    tipo_viaje TEXT NOT NULL,
+    precio REAL NOT NULL,
+    moneda TEXT,
+    tiempo_espera TEXT
+);
+CREATE INDEX IF NOT EXISTS tarifas_ruta ON tarifas (ruta, ts);
+CREATE INDEX IF NOT EXISTS tarifas_distancia ON tarifas (tramo_distancia, ts);
+"""
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia en línea recta entre dos puntos, en km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _quantile(values: List[float], q: float) -> float:
+    """Percentil por interpolación lineal de una lista ordenada"""
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class FareEstimate:
+    """Estimación de tarifas de una ruta"""
+
+    def __init__(self, basis: str, options: List[Dict]):
+        """
+        Args:
+            basis: Historial usado ("ruta", "ruta_cualquier_hora", "distancia", ...)
+            options: Opciones de viaje con precio estimado y banda de confianza
+        """
+        self.basis = basis
+        self.options = options
+
+
+class FareHistory:
+    """Historial de tarifas en SQLite con estimador en memoria por ruta, distancia y hora del día"""
+
+    def __init__(
+        self,
+        path: str,
+        geohash_precision: int = 6,
+        distance_bucket_km: float = 2.0,
+        hour_window: int = 2,
+        min_samples: int = 3,
+        max_age_days: float = 30,
+        max_rows: int = 200,
+        max_pending: int = 10000,
+        utc_offset_hours: int = -5
+    ):
+        """
+        Args:
+            path: Archivo SQLite del historial
+            geohash_precision: Precisión de las celdas que agrupan rutas (6 ≈ 1 km)
+            distance_bucket_km: Ancho de los tramos de distancia para rutas parecidas
+            hour_window: Horas a cada lado de la hora actual que forman la franja
+            min_samples: Cotizaciones mínimas de un tipo de viaje para estimar su precio
+            max_age_days: Antigüedad máxima de las cotizaciones usadas (y guardadas)
+            max_rows: Cotizaciones más recientes que se usan por fuente de estimación
+            max_pending: Cotizaciones encoladas a partir de las cuales no se guardan las nuevas
+            utc_offset_hours: Desfase de la hora local de las tarifas (Perú: -5)
+        """
+        self.path = Path(path)
+        self.geohash_precision = geohash_precision
+        self.distance_bucket_km = distance_bucket_km
+        self.hour_window = hour_window
+        self.min_samples = min_samples
+        self.max_age = max_age_days * 86400
+        self.max_rows = max_rows
+        self.utc_offset = utc_offset_hours * 3600
+        # Cotizaciones que se conservan por ruta o tramo: en promedio alcanzan
+        # para juntar max_rows dentro de cualquier franja horaria
+        self._keep = max_rows * math.ceil(24 / (2 * hour_window + 1))
+        self.recorded = 0
+        self.estimates = 0
+        self.misses = 0
+        self.dropped = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        with self._conn:
+            self._conn.execute("DELETE FROM tarifas WHERE ts < ?", (time.time() - self.max_age,))
+
+        # Índice en memoria: (ts, hora, tipo_viaje, precio, moneda, tiempo_espera) del más antiguo al más reciente
+        self._lock = threading.Lock()
+        self._by_route: Dict[str, Deque[tuple]] = defaultdict(lambda: deque(maxlen=self._keep))
+        self._by_distance: Dict[int, Deque[tuple]] = defaultdict(lambda: deque(maxlen=self._keep))
+        self._rows = 0
+        for ts, route, bucket, *sample in self._conn.execute(
+            "SELECT ts, ruta, tramo_distancia, hora, tipo_viaje, precio, moneda, tiempo_espera FROM tarifas ORDER BY ts"
+        ):
+            self._index(route, bucket, (ts, *sample))
+            self._rows += 1
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fare-history", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el escritor después de guardar las cotizaciones pendientes"""
+        self._stop.set()
+        if self._thread is None:
+            self._conn.close()
+            return
+        # El escritor cierra la conexión al salir; si sigue a mitad de un lote, la cierra él al terminarlo
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._write(self._next_batch())
+            except Exception as e:
+                print(f"⚠ Error guardando historial de tarifas: {str(e)}")
+        try:
+            while not self._queue.empty():
+                self._write(self._next_batch(wait=False))
+        finally:
+            self._conn.close()
+
+    def _next_batch(self, wait: bool = True) -> List[tuple]:
+        """Junta las cotizaciones encoladas; espera hasta un segundo por la primera"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=1.0) if wait else self._queue.get_nowait())
+            while True:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch: List[tuple]):
+        if not batch:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT INTO tarifas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    def _index(self, route: str, bucket: Optional[int], sample: tuple):
+        self._by_route[route].append(sample)
+        if bucket is not None:
+            self._by_distance[bucket].append(sample)
+
+    def _hour(self, ts: float) -> int:
+        return int((ts + self.utc_offset) // 3600) % 24
+
+    def _hours_around(self, ts: float) -> Tuple[int, ...]:
+        hour = self._hour(ts)
+        return tuple(sorted({(hour + delta) % 24 for delta in range(-self.hour_window, self.hour_window + 1)}))
+
+    def _route(self, pickup: str, destination: str, places: Optional[PlaceCache]) -> Tuple[str, Optional[float]]:
+        """Clave de la ruta (celdas de origen y destino) y su distancia si ambos lugares tienen coordenadas"""
+        # peek: el historial no cuenta aciertos ni fallos de la caché de lugares
+        ends = [places.peek(text) if places is not None else None for text in (pickup, destination)]
+        route = "|".join(
+            bucket_of(text, place, self.geohash_precision) for text, place in zip((pickup, destination), ends)
+        )
+        if all(p is not None and p.latitude is not None and p.longitude is not None for p in ends):
+            return route, haversine_km(
+                float(ends[0].latitude), float(ends[0].longitude),
+                float(ends[1].latitude), float(ends[1].longitude)
+            )
+        return route, None
+
+    def record(self, pickup: str, destination: str, places: Optional[PlaceCache], rides: List[Dict]):
+        """Registra las opciones con precio numérico de una cotización exitosa (no bloquea)"""
+        route, distance = self._route(pickup, destination, places)
+        now = time.time()
+        bucket = int(distance // self.distance_bucket_km) if distance is not None else None
+        hour = self._hour(now)
+        samples = [
+            (now, hour, ride["tipo_viaje"], float(ride["precio_valor"]), ride.get("moneda"), ride.get("tiempo_espera", ""))
+            for ride in rides if ride.get("precio_valor") is not None
+        ]
+        if not samples:
+            return
+        with self._lock:
+            for sample in samples:
+                self._index(route, bucket, sample)
+            self.recorded += len(samples)
+            self._rows += len(samples)
+        for ts, hour, product, price, currency, eta in samples:
+            try:
+                self._queue.put_nowait((ts, route, distance, bucket, hour, product, price, currency, eta))
+            except queue.Full:
+                self.dropped += 1
+
+    def estimate(self, pickup: str, destination: str, places: Optional[PlaceCache]) -> Optional[FareEstimate]:
+        """
+        Estima las tarifas de una ruta a partir del historial en memoria
+
+        Returns:
+            Estimación por tipo de viaje, o None si el historial no alcanza
+        """
+        route, distance = self._route(pickup, destination, places)
+        now = time.time()
+        hours = self._hours_around(now)
+        with self._lock:
+            by_route = list(self._by_route.get(route, ()))
+            by_distance = []
+            if distance is not None:
+                by_distance = list(self._by_distance.get(int(distance // self.distance_bucket_km), ()))
+        levels = [
+            ("ruta", by_route, hours),
+            ("ruta_cualquier_hora", by_route, None),
+        ]
+        if distance is not None:
+            levels += [
+                ("distancia", by_distance, hours),
+                ("distancia_cualquier_hora", by_distance, None),
+            ]
+
+        oldest = now - self.max_age
+        for basis, samples, level_hours in levels:
+            rows = []
+            for ts, hour, product, price, currency, eta in reversed(samples):
+                if ts < oldest or len(rows) >= self.max_rows:
+                    break
+                if level_hours is None or hour in level_hours:
+                    rows.append((product, price, currency, eta))
+            options = self._summarize(rows, self.min_samples)
+            if options:
+                self.estimates += 1
+                return FareEstimate(basis, options)
+
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def _summarize(rows: List[Tuple], min_samples: int) -> List[Dict]:
+        """
+        Mediana y banda de percentiles 10-90 por tipo de viaje, del más barato al más caro
+
+        Las cotizaciones de un tipo de viaje se agrupan además por moneda (sin
+        moneda cuenta como PEN). Los grupos con menos de `min_samples`
+        cotizaciones se omiten: su banda no sería representativa.
+        """
+        by_product = defaultdict(list)
+        for product, price, currency, eta in rows:
+            by_product[(product, currency or "PEN")].append((price, eta))
+
+        options = []
+        for (product, currency), samples in by_product.items():
+            if len(samples) < min_samples:
+                continue
+            prices = sorted(price for price, _ in samples)
+            median = _quantile(prices, 0.5)
+            eta = Counter(e for _, e in samples if e).most_common(1)
+            options.append({
+                "tipo_viaje": product,
+                "precio": f"~{median:.2f} {currency}",
+                "tiempo_espera": eta[0][0] if eta else "",
+                "precio_valor": round(median, 2),
+                "moneda": currency,
+                "precio_minimo": round(_quantile(prices, 0.1), 2),
+                "precio_maximo": round(_quantile(prices, 0.9), 2),
+                "muestras": len(prices),
+            })
+        options.sort(key=lambda option: option["precio_valor"])
+        return options
+
+    def stats(self) -> Dict:
+        return {
+            "cotizaciones_guardadas": self._rows,
+            "registradas": self.recorded,
+            "pendientes": self._queue.qsize(),
+            "descartadas": self.dropped,
+            "estimaciones": self.estimates,
+            "sin_historial": self.misses,
+        }
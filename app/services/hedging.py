@@ -0,0 +1,307 @@
+"""
+Intentos redundantes (hedging) para acotar la latencia de cola de los scrapers
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+class HedgeCancelled(Exception):
+    """El intento fue cancelado porque otro intento terminó primero"""
+
+
+class PhaseLatencyTracker:
+    """
+    Registra cuánto tarda un intento en alcanzar cada fase
+
+    Las latencias se miden desde el inicio del intento y se guardan en una
+    ventana deslizante por fase para calcular percentiles.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Args:
+            window: Número de muestras recientes que se conservan por fase
+            min_samples: Muestras mínimas para calcular un percentil confiable
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(phase, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, phase: str, percentile: float) -> Optional[float]:
+        """
+        Percentil de la latencia para alcanzar una fase
+
+        Returns:
+            Segundos, o None si aún no hay suficientes muestras
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(phase, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def phases(self) -> List[str]:
+        with self._lock:
+            return list(self._samples)
+
+    def stats(self, percentiles=(50, 90, 99)) -> Dict:
+        return {
+            phase: {f"p{p}": (round(v, 2) if v is not None else None)
+                    for p, v in ((p, self.percentile(phase, p)) for p in percentiles)}
+            for phase in self.phases()
+        }
+
+
+class HedgeAttempt:
+    """Estado de un intento: fases alcanzadas y bandera de cancelación"""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.started_at = time.monotonic()
+        self.reached_at: Dict[str, float] = {}
+        self._cancelled = threading.Event()
+
+    @property
+    def is_hedge(self) -> bool:
+        """Indica si es un intento redundante (no el original)"""
+        return self.number > 0
+
+    def start(self):
+        """Marca el comienzo real del intento (no el momento en que se encoló)"""
+        self.started_at = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def reached(self, phase: str):
+        """
+        Callback de progreso para el scraper: registra la fase alcanzada
+
+        Raises:
+            HedgeCancelled: Si otro intento ya ganó
+        """
+        if self._cancelled.is_set():
+            raise HedgeCancelled(f"Intento {self.number} cancelado en la fase '{phase}'")
+        self.reached_at.setdefault(phase, self.elapsed())
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+class HedgedExecutor:
+    """
+    Ejecuta una operación y lanza un segundo intento si el primero se atrasa
+
+    Si el intento original no alcanza alguna fase dentro del percentil
+    configurado de su latencia histórica, se inicia un intento redundante
+    (en otra sesión del pool). Gana el primero que termina con éxito y el otro
+    se cancela en su siguiente fase. La proporción de intentos redundantes se
+    limita para acotar la carga extra sobre el origen.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = False,
+        percentile: float = 90,
+        max_hedge_rate: float = 0.1,
+        min_samples: int = 20,
+        max_workers: int = 4
+    ):
+        """
+        Args:
+            name: Nombre del servicio (para logs y métricas)
+            enabled: Si se lanzan intentos redundantes (las latencias se miden siempre)
+            percentile: Percentil de latencia por fase a partir del cual se lanza el intento redundante
+            max_hedge_rate: Proporción máxima de peticiones que pueden lanzar un intento redundante
+            min_samples: Muestras mínimas por fase antes de lanzar intentos redundantes
+            max_workers: Hilos para los intentos redundantes (el original nunca espera en este pool)
+        """
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.tracker = PhaseLatencyTracker(min_samples=min_samples)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+        self._lock = threading.Lock()
+        self._recent: Deque[bool] = deque(maxlen=100)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_allowed(self) -> bool:
+        """Respeta la tasa máxima de intentos redundantes sobre las peticiones recientes"""
+        with self._lock:
+            if not self._recent:
+                return True
+            return (sum(self._recent) + 1) / len(self._recent) <= self.max_hedge_rate
+
+    def _overdue(self, attempt: HedgeAttempt) -> Optional[float]:
+        """
+        Revisa si el intento se atrasó respecto del percentil de alguna fase
+
+        Returns:
+            None si está atrasado; si no, segundos hasta el próximo umbral a vigilar
+        """
+        elapsed = attempt.elapsed()
+        thresholds = {
+            phase: self.tracker.percentile(phase, self.percentile) for phase in self.tracker.phases()
+        }
+        # Las fases opcionales que el intento ya dejó atrás no cuentan como atraso
+        passed = max(
+            (t for p, t in thresholds.items() if p in attempt.reached_at and t is not None),
+            default=0.0
+        )
+
+        next_check = None
+        for phase, threshold in thresholds.items():
+            if phase in attempt.reached_at or threshold is None or threshold <= passed:
+                continue
+            if elapsed > threshold:
+                return None
+            wait_for = threshold - elapsed
+            next_check = wait_for if next_check is None else min(next_check, wait_for)
+        return next_check if next_check is not None else 1.0
+
+    def _record(self, attempt: HedgeAttempt):
+        for phase, seconds in attempt.reached_at.items():
+            self.tracker.record(phase, seconds)
+
+    @staticmethod
+    def _attempt(operation: Callable[[HedgeAttempt], Dict], attempt: HedgeAttempt) -> Dict:
+        """Ejecuta un intento; el reloj de sus fases corre desde que empieza a ejecutarse"""
+        attempt.start()
+        try:
+            return operation(attempt)
+        except Exception as e:
+            return {"success": False, "error": str(e), "resultados": []}
+
+    def _launch(
+        self,
+        operation: Callable[[HedgeAttempt], Dict],
+        attempt: HedgeAttempt,
+        outcomes: "queue.Queue[Tuple[HedgeAttempt, Dict]]"
+    ):
+        """
+        Inicia un intento en segundo plano; su resultado llega por `outcomes`
+
+        El original corre en un hilo propio, sin cola delante; los redundantes,
+        en el pool de hilos del ejecutor.
+        """
+        def run():
+            outcomes.put((attempt, self._attempt(operation, attempt)))
+
+        if attempt.is_hedge:
+            self._executor.submit(run)
+        else:
+            threading.Thread(target=run, name=f"hedge-{self.name}-{attempt.number}", daemon=True).start()
+
+    def run(
+        self,
+        operation: Callable[[HedgeAttempt], Dict],
+        is_success: Callable[[Dict], bool] = lambda result: bool(result.get("success"))
+    ) -> Dict:
+        """
+        Ejecuta la operación con hedging
+
+        Sin hedging el intento corre en el hilo que llama. Con hedging, el
+        original corre en un hilo propio (sin pasar por una cola) y el que
+        llama vigila sus fases: si se atrasa lanza el intento redundante y
+        devuelve el primer resultado exitoso apenas llega. El perdedor se
+        cancela en su siguiente fase, en segundo plano.
+
+        Args:
+            operation: Función que recibe el HedgeAttempt (usar attempt.reached como
+                callback de progreso) y devuelve el diccionario de resultados
+            is_success: Indica si un resultado cuenta como éxito
+
+        Returns:
+            El resultado del intento ganador (o el del original si ninguno tuvo éxito)
+        """
+        with self._lock:
+            self.requests += 1
+
+        primary = HedgeAttempt(0)
+        if not self.enabled:
+            result = self._attempt(operation, primary)
+            if is_success(result):
+                self._record(primary)
+            with self._lock:
+                self._recent.append(False)
+            return result
+
+        attempts = [primary]
+        outcomes: "queue.Queue[Tuple[HedgeAttempt, Dict]]" = queue.Queue()
+        watching = True
+        fallback_result = None
+        self._launch(operation, primary, outcomes)
+        pending = 1
+
+        try:
+            while pending:
+                timeout = None
+                if watching:
+                    timeout = self._overdue(primary)
+                    if timeout is None:
+                        watching = False
+                        if self._hedge_allowed():
+                            hedge = HedgeAttempt(1)
+                            attempts.append(hedge)
+                            self._launch(operation, hedge, outcomes)
+                            pending += 1
+                            with self._lock:
+                                self.hedges += 1
+                            print(f"⑂ {self.name}: intento atrasado ({primary.elapsed():.1f}s), lanzando intento redundante")
+                        continue
+
+                try:
+                    attempt, result = outcomes.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                pending -= 1
+
+                if is_success(result) and not attempt.cancelled:
+                    self._record(attempt)
+                    if attempt.is_hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return result
+                if fallback_result is None or not attempt.is_hedge:
+                    fallback_result = result
+
+            return fallback_result
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            with self._lock:
+                self._recent.append(len(attempts) > 1)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            recent_rate = sum(self._recent) / len(self._recent) if self._recent else 0.0
+            return {
+                "habilitado": self.enabled,
+                "peticiones": self.requests,
+                "intentos_redundantes": self.hedges,
+                "victorias_redundantes": self.hedge_wins,
+                "tasa_reciente": round(recent_rate, 3),
+                "latencia_por_fase": self.tracker.stats(),
+            }
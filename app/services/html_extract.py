@@ -0,0 +1,312 @@
+"""
+Extracción de resultados a partir de una instantánea HTML
+
+En lugar de consultar el DOM vivo elemento por elemento a través de WebDriver,
+los scrapers pueden tomar el HTML una sola vez (page_source u outerHTML del
+contenedor) y procesarlo aquí, en el propio proceso. Las funciones devuelven
+los mismos diccionarios que DigemidScraper._extract_results y
+UberScraper._extract_prices, y pueden ejecutarse sin navegador sobre HTML
+guardado:
+
+    python -m app.services.html_extract digemid resultados.html
+    python -m app.services.html_extract uber tarifas.html
+"""
+import json
+import re
+import sys
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Elementos HTML que no tienen etiqueta de cierre
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+# Elementos que WebDriver (.text) e innerText muestran en su propia línea
+BLOCK_ELEMENTS = {
+    "address", "article", "blockquote", "dd", "div", "dl", "dt", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "ol", "p", "section",
+    "table", "tr", "ul",
+}
+
+# Campos de detalle que completa el modal "Ver detalle" de DIGEMID
+DIGEMID_DETAIL_FIELDS = (
+    "nombre_comercial", "direccion", "telefono", "departamento_farmacia", "provincia_farmacia",
+)
+
+
+class Node:
+    """Elemento del árbol HTML"""
+
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional["Node"] = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List = []
+        self.parent = parent
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get("class", "").split()
+
+    def text(self) -> str:
+        """
+        Texto visible del elemento, como lo devuelve WebDriver
+
+        Los espacios se normalizan dentro de cada línea; <br> y los elementos
+        de bloque separan líneas.
+        """
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.tag == "br":
+                parts.append("\n")
+            elif node.tag not in ("script", "style"):
+                block = node is not self and node.tag in BLOCK_ELEMENTS
+                if block:
+                    parts.append("\n")
+                    stack.append("\n")
+                stack.extend(reversed(node.children))
+        lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def iter(self):
+        """Recorre los elementos descendientes en orden de documento"""
+        stack = list(reversed([c for c in self.children if isinstance(c, Node)]))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed([c for c in node.children if isinstance(c, Node)]))
+
+    def find_all(self, predicate: Callable[["Node"], bool]) -> List["Node"]:
+        return [node for node in self.iter() if predicate(node)]
+
+    def find(self, predicate: Callable[["Node"], bool]) -> Optional["Node"]:
+        return next((node for node in self.iter() if predicate(node)), None)
+
+    def children_by_tag(self, tag: str) -> List["Node"]:
+        return [c for c in self.children if isinstance(c, Node) and c.tag == tag]
+
+
+class _TreeBuilder(HTMLParser):
+    """Construye un árbol de Node tolerante a HTML mal cerrado"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {})
+        self._current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: (v or "") for k, v in attrs}, self._current)
+        self._current.children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self._current.children.append(Node(tag, {k: (v or "") for k, v in attrs}, self._current))
+
+    def handle_endtag(self, tag):
+        # Cerrar hasta el ancestro correspondiente; ignorar cierres huérfanos
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    """
+    Convierte HTML en un árbol de Node
+
+    Args:
+        html: Documento o fragmento HTML
+
+    Returns:
+        Nodo raíz del documento
+    """
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _has_classes(node: Node, *classes: str) -> bool:
+    node_classes = node.classes
+    return all(c in node_classes for c in classes)
+
+
+def _class_contains(node: Node, fragment: str) -> bool:
+    return fragment in node.attrs.get("class", "")
+
+
+def parse_digemid_results(html: str, limit: int = 10) -> List[Dict]:
+    """
+    Extrae las filas de la tabla de resultados de DIGEMID
+
+    Los campos de detalle (nombre comercial, dirección, etc.) salen vacíos:
+    sólo están disponibles en el modal "Ver detalle".
+
+    Args:
+        html: page_source o outerHTML de table.table.table-striped
+        limit: Número máximo de filas a devolver
+
+    Returns:
+        Lista de diccionarios con el mismo formato que _extract_results
+    """
+    root = parse_html(html)
+    table = root.find(lambda n: n.tag == "table" and _has_classes(n, "table", "table-striped"))
+    if table is None:
+        return []
+
+    rows = []
+    for tbody in table.find_all(lambda n: n.tag == "tbody"):
+        rows.extend(tbody.children_by_tag("tr"))
+
+    results = []
+    for row in rows[:limit]:
+        cells = row.children_by_tag("td")
+        if len(cells) < 7:
+            continue
+
+        try:
+            precio_unitario = float(cells[5].text())
+        except ValueError:
+            precio_unitario = 0.0
+
+        result = {
+            "tipo_establecimiento": cells[0].text(),
+            "fecha_actualizacion": cells[1].text(),
+            "producto": cells[2].text(),
+            "laboratorio": cells[3].text(),
+            "farmacia_botica": cells[4].text(),
+            "precio_unitario": precio_unitario,
+        }
+        result.update({field: "" for field in DIGEMID_DETAIL_FIELDS})
+        results.append(result)
+
+    return results
+
+
+def _is_ride_name(node: Node) -> bool:
+    return node.tag in ("h3", "h4") or (
+        node.tag == "div" and (_class_contains(node, "title") or _class_contains(node, "name"))
+    )
+
+
+def _is_ride_price(node: Node) -> bool:
+    return (node.tag == "p" and ("css-iQlrzm" in node.classes or _class_contains(node, "price"))) or (
+        node.tag == "span" and _class_contains(node, "price")
+    )
+
+
+def _is_ride_time(node: Node) -> bool:
+    return node.tag in ("p", "span", "div") and _class_contains(node, "time")
+
+
+# Símbolos de moneda que Uber muestra en Perú y su código
+CURRENCY_SYMBOLS = {"S/.": "PEN", "S/": "PEN", "US$": "USD", "$": "USD"}
+_AMOUNT = re.compile(r"\d[\d.,]*")
+_CURRENCY_CODE = re.compile(r"\b([A-Z]{3})\b")
+
+
+def parse_price(text: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Separa un precio en monto y moneda: "27,90 PEN" -> (27.9, "PEN")
+
+    Acepta coma o punto decimal y separadores de miles. En un rango
+    ("PEN 20-25") se toma el monto menor.
+
+    Returns:
+        Tupla (monto, moneda); cada valor es None si no se reconoce
+    """
+    match = _AMOUNT.search(text or "")
+    amount = None
+    if match:
+        number = match.group().rstrip(".,")
+        last_comma, last_dot = number.rfind(","), number.rfind(".")
+        decimal = max(last_comma, last_dot)
+        # Un único separador seguido de 3 dígitos es de miles ("1.250")
+        if decimal != -1 and (
+            (last_comma == -1 or last_dot == -1) and len(number) - decimal - 1 == 3
+        ):
+            decimal = -1
+        integer = re.sub(r"[.,]", "", number[:decimal] if decimal != -1 else number)
+        fraction = number[decimal + 1:] if decimal != -1 else ""
+        amount = float(f"{integer}.{fraction or 0}")
+
+    currency = None
+    code = _CURRENCY_CODE.search(text or "")
+    if code:
+        currency = code.group(1)
+    else:
+        currency = next((c for symbol, c in CURRENCY_SYMBOLS.items() if symbol in (text or "")), None)
+    return amount, currency
+
+
+def with_price_value(ride: Dict) -> Dict:
+    """Agrega a una opción de viaje el monto numérico y la moneda de su precio"""
+    amount, currency = parse_price(ride.get("precio", ""))
+    return {
+        **ride,
+        "precio_valor": ride.get("precio_valor", amount),
+        "moneda": ride.get("moneda") or currency,
+    }
+
+
+def parse_uber_prices(html: str) -> List[Dict]:
+    """
+    Extrae las opciones de viaje de la página de tarifas de Uber
+
+    Args:
+        html: page_source de la página de selección de producto
+
+    Returns:
+        Lista de diccionarios con el mismo formato que _extract_prices
+    """
+    root = parse_html(html)
+    results = []
+    # Un botón anidado en otro repite la misma opción
+    seen = set()
+
+    for option in root.find_all(lambda n: n.tag == "div" and n.attrs.get("role") == "button"):
+        name = option.find(_is_ride_name)
+        price = option.find(_is_ride_price)
+        if name is None or price is None:
+            continue
+
+        eta = option.find(_is_ride_time)
+        ride_info = {
+            "tipo_viaje": name.text(),
+            "precio": price.text(),
+            "tiempo_espera": eta.text() if eta is not None else "",
+        }
+        key = (ride_info["tipo_viaje"], ride_info["precio"])
+        if ride_info["tipo_viaje"] and ride_info["precio"] and key not in seen:
+            seen.add(key)
+            results.append(ride_info)
+
+    return results
+
+
+PARSERS = {
+    "digemid": parse_digemid_results,
+    "uber": parse_uber_prices,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in PARSERS:
+        print(f"Uso: python -m app.services.html_extract [{'|'.join(PARSERS)}] archivo.html")
+        sys.exit(1)
+
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        parsed = PARSERS[sys.argv[1]](f.read())
+    print(json.dumps(parsed, indent=2, ensure_ascii=False))
@@ -0,0 +1,262 @@
+"""
+Gobernador de memoria para los navegadores administrados
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from .browser_pool import BrowserPool, BrowserSession
+
+# Nombres de proceso que pertenecen a Chrome/ChromeDriver
+BROWSER_PROCESS_NAMES = ("chromedriver", "chrome", "chromium", "google chrome")
+
+# Procesos más jóvenes que esto pueden ser navegadores que se están iniciando
+ORPHAN_GRACE_SECONDS = 60
+
+
+class MemoryGovernor:
+    """
+    Vigila la memoria de los navegadores y recicla los que se exceden
+
+    En cada ciclo:
+    - Mide el RSS del árbol de procesos de cada sesión y el heap JS vía DevTools
+    - Recicla sesiones que superan los umbrales o que ya no responden
+    - Mata procesos chromedriver/chrome huérfanos de búsquedas que fallaron
+    - Reduce la concurrencia de los pools si el nodo está bajo presión de memoria
+    """
+
+    def __init__(
+        self,
+        pools: List[BrowserPool],
+        max_rss_mb: float = 1500,
+        max_js_heap_mb: float = 512,
+        interval: float = 15,
+        node_high_percent: float = 80.0,
+        node_critical_percent: float = 92.0
+    ):
+        """
+        Inicializa el gobernador
+
+        Args:
+            pools: Pools de navegadores a vigilar
+            max_rss_mb: RSS máximo (MB) del árbol de procesos de una sesión
+            max_js_heap_mb: Heap JS máximo (MB) usado por la página
+            interval: Segundos entre cada muestreo
+            node_high_percent: Uso de memoria del nodo a partir del cual se reduce la concurrencia
+            node_critical_percent: Uso de memoria del nodo a partir del cual se permite una sola sesión
+        """
+        self.pools = pools
+        self.max_rss_mb = max_rss_mb
+        self.max_js_heap_mb = max_js_heap_mb
+        self.interval = interval
+        self.node_high_percent = node_high_percent
+        self.node_critical_percent = node_critical_percent
+
+        self.node_memory_percent: Optional[float] = None
+        self.orphans_killed = 0
+        self._known_pids: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._psutil_warned = False
+
+    def _psutil(self):
+        """Importa psutil si está disponible"""
+        try:
+            import psutil
+            return psutil
+        except ImportError:
+            if not self._psutil_warned:
+                print("⚠ psutil no está instalado: no se medirá la memoria de los navegadores")
+                self._psutil_warned = True
+            return None
+
+    def start(self):
+        """Inicia el muestreo en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el muestreo en segundo plano"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠ Error en el gobernador de memoria: {str(e)}")
+
+    def run_once(self):
+        """Ejecuta un ciclo completo de muestreo, reciclaje y limpieza"""
+        psutil = self._psutil()
+
+        for pool in self.pools:
+            # El RSS se mide por procesos, sin tocar el driver: vale para sesiones en uso
+            for session in pool.sessions():
+                session.rss_mb = self._process_tree_rss_mb(psutil, session)
+                self._remember(psutil, session)
+                if session.rss_mb > self.max_rss_mb:
+                    pool.mark_for_recycle(session, f"RSS {session.rss_mb:.0f} MB > {self.max_rss_mb} MB")
+
+            # El heap JS y la vida del driver sólo se consultan en sesiones libres
+            pool.maintain(self._check_idle_session)
+
+        self.reap_orphans()
+        self._apply_node_pressure(psutil)
+
+    def _check_idle_session(self, session: BrowserSession) -> Optional[str]:
+        """Revisa una sesión libre y devuelve el motivo para reciclarla, si lo hay"""
+        if not session.is_alive():
+            return "el navegador no responde"
+
+        session.js_heap_mb = self._js_heap_mb(session)
+        if session.js_heap_mb > self.max_js_heap_mb:
+            return f"heap JS {session.js_heap_mb:.0f} MB > {self.max_js_heap_mb} MB"
+        return None
+
+    def _process_tree_rss_mb(self, psutil, session: BrowserSession) -> float:
+        """Suma el RSS de chromedriver y todos sus procesos hijos"""
+        pid = session.driver_pid
+        if psutil is None or not pid:
+            return 0.0
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _js_heap_mb(self, session: BrowserSession) -> float:
+        """Lee el heap JS usado por la página mediante el protocolo DevTools"""
+        try:
+            session.driver.execute_cdp_cmd("Performance.enable", {})
+            metrics = session.driver.execute_cdp_cmd("Performance.getMetrics", {})
+        except Exception:
+            return 0.0
+
+        for metric in metrics.get("metrics", []):
+            if metric.get("name") == "JSHeapUsedSize":
+                return metric.get("value", 0) / (1024 * 1024)
+        return 0.0
+
+    def _remember(self, psutil, session: BrowserSession):
+        """Registra los PIDs de una sesión para reconocerlos si quedan huérfanos"""
+        pid = session.driver_pid
+        if psutil is None or not pid:
+            return
+        self._known_pids.add(pid)
+        try:
+            for child in psutil.Process(pid).children(recursive=True):
+                self._known_pids.add(child.pid)
+        except psutil.Error:
+            pass
+
+    def _managed_tree(self, psutil) -> Set[int]:
+        """PIDs de todos los procesos que pertenecen a sesiones vivas"""
+        managed = set()
+        for pool in self.pools:
+            for pid in pool.managed_pids():
+                managed.add(pid)
+                try:
+                    managed.update(child.pid for child in psutil.Process(pid).children(recursive=True))
+                except psutil.Error:
+                    continue
+        return managed
+
+    def reap_orphans(self) -> int:
+        """
+        Mata procesos de Chrome que no pertenecen a ninguna sesión viva
+
+        Se consideran huérfanos los procesos de navegador que son hijos de este
+        proceso, o que alguna vez pertenecieron a una sesión, y que ya no cuelgan
+        de ningún chromedriver administrado.
+
+        Returns:
+            Número de procesos terminados
+        """
+        psutil = self._psutil()
+        if psutil is None:
+            return 0
+
+        managed = self._managed_tree(psutil)
+        candidates = []
+        try:
+            candidates.extend(psutil.Process(os.getpid()).children(recursive=True))
+        except psutil.Error:
+            pass
+        for pid in list(self._known_pids):
+            try:
+                candidates.append(psutil.Process(pid))
+            except psutil.Error:
+                self._known_pids.discard(pid)
+
+        orphans = {}
+        for process in candidates:
+            if process.pid in managed or process.pid in orphans:
+                continue
+            try:
+                name = process.name().lower()
+                if time.time() - process.create_time() < ORPHAN_GRACE_SECONDS:
+                    continue
+            except psutil.Error:
+                continue
+            if any(browser in name for browser in BROWSER_PROCESS_NAMES):
+                orphans[process.pid] = process
+
+        if not orphans:
+            return 0
+
+        for process in orphans.values():
+            try:
+                process.terminate()
+            except psutil.Error:
+                continue
+        _, alive = psutil.wait_procs(list(orphans.values()), timeout=3)
+        for process in alive:
+            try:
+                process.kill()
+            except psutil.Error:
+                continue
+
+        self._known_pids.difference_update(orphans.keys())
+        self.orphans_killed += len(orphans)
+        print(f"🧹 {len(orphans)} procesos de navegador huérfanos terminados")
+        return len(orphans)
+
+    def _apply_node_pressure(self, psutil):
+        """Ajusta la concurrencia de los pools según la memoria libre del nodo"""
+        if psutil is None:
+            return
+        self.node_memory_percent = psutil.virtual_memory().percent
+
+        for pool in self.pools:
+            if self.node_memory_percent >= self.node_critical_percent:
+                limit = 1
+            elif self.node_memory_percent >= self.node_high_percent:
+                limit = max(1, pool.size // 2)
+            else:
+                limit = pool.size
+            pool.set_concurrency_limit(limit)
+
+    def stats(self) -> Dict:
+        """Estado del gobernador"""
+        return {
+            "memoria_nodo_porcentaje": self.node_memory_percent,
+            "max_rss_mb": self.max_rss_mb,
+            "max_js_heap_mb": self.max_js_heap_mb,
+            "huerfanos_terminados": self.orphans_killed,
+        }
@@ -0,0 +1,122 @@
+"""
+Caché de lugares resueltos por Uber
+
+Ingresar una ubicación en m.uber.com cuesta varios segundos: escribir el
+texto, esperar las sugerencias y elegir la primera. El lugar elegido queda en
+la URL de la página como un JSON (parámetro `pickup` o `drop[0]`) con su
+identificador, dirección y coordenadas. Esta caché guarda ese JSON por texto
+normalizado, de modo que las ubicaciones repetidas se inyectan directamente
+en la URL de tarifas sin escribir ni esperar sugerencias.
+"""
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def normalize_place(text: str) -> str:
+    """Texto de ubicación sin mayúsculas, tildes, signos ni espacios repetidos"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+
+class ResolvedPlace:
+    """Sugerencia elegida para un texto de ubicación"""
+
+    def __init__(self, text: str, param: str):
+        """
+        Args:
+            text: Texto de la sugerencia elegida
+            param: JSON del lugar tal como aparece en la URL de m.uber.com
+        """
+        self.text = text
+        self.param = param
+        try:
+            data = json.loads(param)
+        except ValueError:
+            data = {}
+        self.place_id: Optional[str] = data.get("id")
+        self.address: str = data.get("addressLine1") or text
+        self.latitude: Optional[float] = data.get("latitude")
+        self.longitude: Optional[float] = data.get("longitude")
+
+    def to_dict(self) -> Dict:
+        return {
+            "sugerencia": self.text,
+            "id": self.place_id,
+            "direccion": self.address,
+            "latitud": self.latitude,
+            "longitud": self.longitude,
+        }
+
+
+class PlaceCache:
+    """Caché LRU con vencimiento de lugares resueltos"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 604800):
+        """
+        Args:
+            max_entries: Número máximo de ubicaciones guardadas
+            ttl: Segundos que un lugar resuelto se considera válido
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, ResolvedPlace]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, text: str) -> Optional[ResolvedPlace]:
+        key = normalize_place(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, text: str) -> Optional[ResolvedPlace]:
+        """Lugar vigente para el texto sin contar acierto ni fallo ni renovar su posición"""
+        with self._lock:
+            entry = self._entries.get(normalize_place(text))
+            if entry is None or time.time() - entry[0] > self.ttl:
+                return None
+            return entry[1]
+
+    def contains(self, text: str) -> bool:
+        """Indica si hay un lugar vigente para el texto (sin contar acierto ni fallo)"""
+        with self._lock:
+            entry = self._entries.get(normalize_place(text))
+            return entry is not None and time.time() - entry[0] <= self.ttl
+
+    def put(self, text: str, place: ResolvedPlace):
+        key = normalize_place(text)
+        with self._lock:
+            self._entries[key] = (time.time(), place)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, text: str):
+        """Descarta un lugar que ya no produjo tarifas"""
+        with self._lock:
+            if self._entries.pop(normalize_place(text), None) is not None:
+                self.invalidated += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "invalidados": self.invalidated,
+            }
@@ -0,0 +1,368 @@
+"""
+Historial de precios de DIGEMID
+
+Cada fila obtenida de DIGEMID (producto, laboratorio, farmacia, precio,
+fecha de actualización, ubicación de la búsqueda y de la farmacia, hora de
+la consulta) se guarda en una base SQLite local en modo WAL. Las filas no se
+escriben desde la petición: se encolan y un hilo en segundo plano las inserta
+por lotes, en una transacción por lote. La tabla está indexada por producto,
+por distrito y por fecha, y es la base para responder búsquedas e historiales
+sin volver a consultar DIGEMID.
+
+Al escribir cada lote se actualizan también dos tablas derivadas:
+`precios_dia`, con el último precio del día de cada producto en cada
+farmacia, y `precios_resumen`, con una fila por medicamento, producto,
+distrito y día que guarda cantidad, suma, mínimo, máximo y los precios de ese
+día ordenados (un arreglo de float64). Sólo se recalculan los grupos que
+tocó el lote. Las estadísticas de precios leen el resumen, que no crece con
+las consultas repetidas de un mismo día.
+
+Cuando DIGEMID no está disponible, `last_known` devuelve las filas más
+recientes guardadas para el mismo medicamento y ubicación, ampliando la
+búsqueda a la provincia y luego al departamento si el distrito no tiene datos.
+"""
+import queue
+import sqlite3
+from array import array
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .place_cache import normalize_place
+
+# Campos de cada fila de DIGEMID que se guardan, en el orden de la tabla
+ROW_FIELDS = (
+    "producto", "laboratorio", "farmacia_botica", "nombre_comercial", "tipo_establecimiento",
+    "precio_unitario", "fecha_actualizacion", "direccion", "telefono",
+    "departamento_farmacia", "provincia_farmacia",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS precios (
+    ts REAL NOT NULL,
+    consulta TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    provincia TEXT NOT NULL,
+    distrito TEXT NOT NULL,
+    producto TEXT NOT NULL,
+    laboratorio TEXT,
+    farmacia_botica TEXT,
+    nombre_comercial TEXT,
+    tipo_establecimiento TEXT,
+    precio_unitario REAL NOT NULL,
+    fecha_actualizacion TEXT,
+    direccion TEXT,
+    telefono TEXT,
+    departamento_farmacia TEXT,
+    provincia_farmacia TEXT
+);
+CREATE INDEX IF NOT EXISTS precios_producto ON precios (producto, ts);
+CREATE INDEX IF NOT EXISTS precios_distrito ON precios (distrito, ts);
+CREATE INDEX IF NOT EXISTS precios_consulta ON precios (consulta, distrito, ts);
+CREATE INDEX IF NOT EXISTS precios_consulta_provincia ON precios (consulta, departamento, provincia, ts);
+CREATE INDEX IF NOT EXISTS precios_ts ON precios (ts);
+CREATE TABLE IF NOT EXISTS precios_dia (
+    consulta TEXT NOT NULL,
+    producto TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    provincia TEXT NOT NULL,
+    distrito TEXT NOT NULL,
+    farmacia TEXT NOT NULL,
+    dia INTEGER NOT NULL,
+    precio_unitario REAL NOT NULL,
+    PRIMARY KEY (consulta, producto, departamento, provincia, distrito, dia, farmacia)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS precios_resumen (
+    consulta TEXT NOT NULL,
+    producto TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    provincia TEXT NOT NULL,
+    distrito TEXT NOT NULL,
+    dia INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    suma REAL NOT NULL,
+    minimo REAL NOT NULL,
+    maximo REAL NOT NULL,
+    precios BLOB NOT NULL,
+    PRIMARY KEY (consulta, producto, departamento, provincia, distrito, dia)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS precios_resumen_consulta ON precios_resumen (consulta, dia);
+"""
+
+# Columnas que identifican un grupo del resumen
+_GROUP = "consulta, producto, departamento, provincia, distrito, dia"
+
+# Resumen diario a partir de la tabla de filas (bases creadas antes del resumen)
+_BACKFILL_DAILY = """
+INSERT OR REPLACE INTO precios_dia
+SELECT consulta, producto, departamento, provincia, distrito,
+       farmacia_botica || '|' || nombre_comercial || '|' || direccion,
+       CAST((ts + ?) / 86400 AS INTEGER), precio_unitario
+FROM precios ORDER BY ts
+"""
+
+
+def canonical(text: str) -> str:
+    """Forma canónica de un medicamento o ubicación: mayúsculas, sin tildes, signos ni espacios repetidos"""
+    return normalize_place(text).upper()
+
+
+class PriceHistory:
+    """Almacén de filas de DIGEMID con escritura por lotes en segundo plano"""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_pending: int = 50000,
+        utc_offset_hours: int = -5
+    ):
+        """
+        Args:
+            path: Archivo SQLite del historial
+            batch_size: Filas máximas por transacción
+            flush_interval: Segundos máximos que una fila espera en la cola
+            max_pending: Filas encoladas a partir de las cuales se descartan las nuevas
+            utc_offset_hours: Desfase de la hora local que define el día del resumen (Perú: -5)
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.utc_offset = utc_offset_hours * 3600
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_pending)
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        if self._conn.execute("SELECT 1 FROM precios_resumen LIMIT 1").fetchone() is None:
+            with self._conn:
+                self._conn.execute(_BACKFILL_DAILY, (self.utc_offset,))
+                self._refresh_summary(self._conn.execute(f"SELECT DISTINCT {_GROUP} FROM precios_dia").fetchall())
+        # Las lecturas usan su propia conexión: en modo WAL no esperan al escritor
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-history", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el escritor después de guardar las filas pendientes"""
+        self._stop.set()
+        if self._thread is None:
+            self._conn.close()
+        else:
+            # El escritor cierra la conexión al salir; si sigue a mitad de un lote, la cierra él al terminarlo
+            self._thread.join(timeout=10)
+            self._thread = None
+        with self._read_lock:
+            self._reader.close()
+
+    def append(self, nombre_medicamento: str, departamento: str, provincia: str, distrito: str, rows: List[Dict]):
+        """
+        Encola las filas de una búsqueda (no bloquea)
+
+        Args:
+            nombre_medicamento: Medicamento buscado
+            departamento: Departamento de la búsqueda
+            provincia: Provincia de la búsqueda
+            distrito: Distrito de la búsqueda
+            rows: Filas devueltas por el scraper
+        """
+        now = time.time()
+        context = (now, canonical(nombre_medicamento), canonical(departamento), canonical(provincia), canonical(distrito))
+        for row in rows:
+            if row.get("precio_unitario") is None or not row.get("producto"):
+                continue
+            try:
+                self._queue.put_nowait(context + tuple(row.get(field, "") for field in ROW_FIELDS))
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._write(self._next_batch())
+            except Exception as e:
+                print(f"⚠ Error guardando historial de precios: {str(e)}")
+        # Lo que quedó en la cola se guarda antes de cerrar
+        try:
+            while not self._queue.empty():
+                self._write(self._next_batch(wait=False))
+        finally:
+            self._conn.close()
+
+    def _next_batch(self, wait: bool = True) -> List[tuple]:
+        """Junta filas hasta completar un lote o hasta que la primera lleve flush_interval en la cola"""
+        batch = []
+        expires = None
+        while len(batch) < self.batch_size:
+            try:
+                if not wait:
+                    batch.append(self._queue.get_nowait())
+                elif expires is None:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+                    expires = time.monotonic() + self.flush_interval
+                else:
+                    batch.append(self._queue.get(timeout=max(0.0, expires - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[tuple]):
+        if not batch:
+            return
+        placeholders = ", ".join("?" * (5 + len(ROW_FIELDS)))
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO precios VALUES ({placeholders})", batch)
+            # El lote viene en orden de llegada: queda el último precio del día
+            daily = [self._daily(values) for values in batch]
+            self._conn.executemany("INSERT OR REPLACE INTO precios_dia VALUES (?, ?, ?, ?, ?, ?, ?, ?)", daily)
+            self._refresh_summary({row[:5] + (row[6],) for row in daily})
+        self.written += len(batch)
+        self.batches += 1
+
+    def last_known(
+        self,
+        nombre_medicamento: str,
+        departamento: str,
+        provincia: str,
+        distrito: str,
+        limit: int,
+        max_age: float,
+        budget: float = 0.05,
+        widen: bool = True
+    ) -> Optional[Tuple[str, List[Dict], float]]:
+        """
+        Últimas filas guardadas de un medicamento, del distrito hacia el departamento
+
+        Se usa el primer alcance con datos: el distrito, el resto de la
+        provincia y el resto del departamento. Por cada producto y farmacia se
+        toma la fila más reciente.
+
+        Args:
+            nombre_medicamento: Medicamento buscado
+            departamento: Departamento de la búsqueda
+            provincia: Provincia de la búsqueda
+            distrito: Distrito de la búsqueda
+            limit: Filas máximas a devolver (las más baratas)
+            max_age: Antigüedad máxima de las filas en segundos
+            budget: Segundos máximos de consulta; al agotarse se devuelve None
+            widen: Si se amplía a la provincia y el departamento cuando el distrito no tiene datos
+
+        Returns:
+            Tupla (alcance, filas, antigüedad en segundos de la fila más antigua), o None
+        """
+        consulta = canonical(nombre_medicamento)
+        dep, prov, dist = canonical(departamento), canonical(provincia), canonical(distrito)
+        scopes = [
+            ("distrito", "consulta = ? AND distrito = ? AND departamento = ? AND provincia = ?", (consulta, dist, dep, prov)),
+            ("provincia", "consulta = ? AND departamento = ? AND provincia = ?", (consulta, dep, prov)),
+            ("departamento", "consulta = ? AND departamento = ?", (consulta, dep)),
+        ][:None if widen else 1]
+        now = time.time()
+        expires = time.monotonic() + budget
+        columns = ", ".join(("ts",) + ROW_FIELDS)
+
+        with self._read_lock:
+            # Interrumpe la consulta si se pasa del presupuesto
+            self._reader.set_progress_handler(lambda: int(time.monotonic() > expires), 1000)
+            try:
+                for scope, condition, params in scopes:
+                    cursor = self._reader.execute(
+                        f"SELECT {columns} FROM precios WHERE {condition} AND ts >= ? ORDER BY ts DESC LIMIT ?",
+                        params + (now - max_age, limit * 20)
+                    )
+                    latest: Dict[tuple, Dict] = {}
+                    for values in cursor:
+                        row = dict(zip(("ts",) + ROW_FIELDS, values))
+                        latest.setdefault((row["producto"], row["farmacia_botica"], row["direccion"]), row)
+                    if latest:
+                        rows = sorted(latest.values(), key=lambda r: r["precio_unitario"])[:limit]
+                        oldest = min(row.pop("ts") for row in rows)
+                        return scope, rows, now - oldest
+            except sqlite3.OperationalError as e:
+                print(f"⚠ Historial de precios sin respuesta a tiempo: {str(e)}")
+            finally:
+                self._reader.set_progress_handler(None, 1000)
+        return None
+
+    def _refresh_summary(self, groups):
+        """Recalcula las filas del resumen de los grupos (consulta, producto, ubicación, día) dados"""
+        where = " AND ".join(f"{column} = ?" for column in _GROUP.split(", "))
+        for group in groups:
+            prices = array("d", (p for (p,) in self._conn.execute(
+                f"SELECT precio_unitario FROM precios_dia WHERE {where} ORDER BY precio_unitario", group
+            )))
+            if prices:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO precios_resumen VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    tuple(group) + (len(prices), sum(prices), prices[0], prices[-1], prices.tobytes())
+                )
+
+    def _daily(self, values: tuple) -> tuple:
+        """Fila del resumen diario para una fila encolada"""
+        row = dict(zip(("ts", "consulta", "departamento", "provincia", "distrito") + ROW_FIELDS, values))
+        return (
+            row["consulta"], row["producto"], row["departamento"], row["provincia"], row["distrito"],
+            f"{row['farmacia_botica']}|{row['nombre_comercial']}|{row['direccion']}",
+            self.day(row["ts"]), row["precio_unitario"],
+        )
+
+    def day(self, ts: float) -> int:
+        """Día local (días desde 1970-01-01) de una marca de tiempo"""
+        return int((ts + self.utc_offset) // 86400)
+
+    def daily_summary(
+        self,
+        nombre_medicamento: str,
+        first_day: int,
+        last_day: int,
+        producto: Optional[str] = None,
+        departamento: Optional[str] = None,
+        provincia: Optional[str] = None,
+        distrito: Optional[str] = None
+    ) -> List[Tuple[int, str, str, bytes]]:
+        """
+        Filas del resumen diario de un medicamento entre dos días (inclusive)
+
+        Returns:
+            Lista de tuplas (día, distrito, producto, precios ordenados como float64)
+        """
+        condition = "consulta = ? AND dia BETWEEN ? AND ?"
+        params: list = [canonical(nombre_medicamento), first_day, last_day]
+        if producto:
+            condition += " AND producto = ?"
+            params.append(producto)
+        for column, value in (("departamento", departamento), ("provincia", provincia), ("distrito", distrito)):
+            if value:
+                condition += f" AND {column} = ?"
+                params.append(canonical(value))
+        with self._read_lock:
+            return self._reader.execute(
+                f"SELECT dia, distrito, producto, precios FROM precios_resumen WHERE {condition}", params
+            ).fetchall()
+
+    def stats(self) -> Dict:
+        return {
+            "filas_guardadas": self.written,
+            "lotes": self.batches,
+            "pendientes": self._queue.qsize(),
+            "descartadas": self.dropped,
+        }
@@ -0,0 +1,122 @@
+"""
+Estadísticas de precios agrupadas, calculadas con NumPy
+
+Recibe las filas del resumen diario del historial (día, distrito, producto y
+los precios del día) y calcula por grupo mínimo, promedio, mediana, percentiles y máximo
+sin recorrer los grupos en Python: los precios se ordenan una sola vez por
+grupo y precio, y los percentiles de todos los grupos se leen de ese orden
+con índices vectorizados. Las ventanas móviles por día se obtienen
+replicando cada precio en los días de la ventana que lo incluyen.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _percentiles(sorted_prices: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Percentil q (0-100) de cada grupo de un arreglo ordenado por grupo y precio (interpolación lineal)"""
+    position = starts + (counts - 1) * (q / 100.0)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts + counts - 1)
+    fraction = position - low
+    return sorted_prices[low] + (sorted_prices[high] - sorted_prices[low]) * fraction
+
+
+def grouped_stats(
+    summary: Sequence[Tuple[int, str, str, bytes]],
+    group_by: Sequence[str],
+    percentiles: Sequence[float] = (25, 75, 90),
+    window_days: int = 1,
+    first_day: Optional[int] = None,
+    last_day: Optional[int] = None
+) -> List[Dict]:
+    """
+    Estadísticas de precios por grupo
+
+    Args:
+        summary: Filas del resumen diario: (día, distrito, producto, precios en float64)
+        group_by: Dimensiones del grupo, entre "dia", "distrito" y "producto"
+        percentiles: Percentiles adicionales (0-100)
+        window_days: Con "dia" en el grupo, días de la ventana móvil que termina en cada día
+        first_day: Primer día a informar (los días anteriores sólo alimentan la ventana)
+        last_day: Último día a informar
+
+    Returns:
+        Un diccionario por grupo con sus claves y estadísticas, ordenados por clave
+    """
+    if not summary:
+        return []
+
+    # Las dimensiones se resuelven por fila del resumen (pocas) antes de expandir los precios
+    days = np.fromiter((r[0] for r in summary), dtype=np.int64, count=len(summary))
+    chunks = [np.frombuffer(r[3], dtype=np.float64) for r in summary]
+    lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+    dimensions = {"dia": days}
+    decoders = {}
+    for index, name in ((1, "distrito"), (2, "producto")):
+        uniques, codes = np.unique(np.array([r[index] for r in summary], dtype=object), return_inverse=True)
+        dimensions[name] = codes
+        decoders[name] = uniques
+    source = np.arange(len(summary))
+
+    if "dia" in group_by and window_days > 1:
+        # Cada día del resumen cuenta en las window_days ventanas que lo contienen
+        source = np.repeat(source, window_days)
+        dimensions["dia"] = np.repeat(days, window_days) + np.tile(np.arange(window_days), len(days))
+        dimensions = {
+            name: values if name == "dia" else values[source] for name, values in dimensions.items()
+        }
+    keep = np.ones(len(source), dtype=bool)
+    if first_day is not None:
+        keep &= dimensions["dia"] >= first_day
+    if last_day is not None:
+        keep &= dimensions["dia"] <= last_day
+    source = source[keep]
+    dimensions = {name: values[keep] for name, values in dimensions.items()}
+    if len(source) == 0:
+        return []
+
+    # Clave combinada del grupo por fila del resumen
+    key = np.zeros(len(source), dtype=np.int64)
+    sizes = []
+    for name in group_by:
+        uniques, codes = np.unique(dimensions[name], return_inverse=True)
+        key = key * len(uniques) + codes
+        sizes.append((name, uniques))
+
+    # Expandir a un precio por elemento, con la clave de su grupo
+    counts_by_row = lengths[source]
+    prices = np.concatenate([chunks[i] for i in source])
+    key = np.repeat(key, counts_by_row)
+
+    order = np.lexsort((prices, key))
+    key, prices = key[order], prices[order]
+    group_keys, starts, counts = np.unique(key, return_index=True, return_counts=True)
+
+    minimum = prices[starts]
+    maximum = prices[starts + counts - 1]
+    mean = np.add.reduceat(prices, starts) / counts
+    median = _percentiles(prices, starts, counts, 50)
+    extra = {f"p{q:g}": _percentiles(prices, starts, counts, q) for q in percentiles}
+
+    # Decodificar la clave combinada en sus dimensiones
+    columns = {}
+    remainder = group_keys.copy()
+    for name, uniques in reversed(sizes):
+        values = uniques[remainder % len(uniques)]
+        columns[name] = values if name == "dia" else decoders[name][values]
+        remainder //= len(uniques)
+
+    groups = []
+    for i in range(len(group_keys)):
+        group = {name: columns[name][i] for name in group_by}
+        group.update({
+            "n": int(counts[i]),
+            "minimo": round(float(minimum[i]), 4),
+            "promedio": round(float(mean[i]), 4),
+            "mediana": round(float(median[i]), 4),
+            "maximo": round(float(maximum[i]), 4),
+            "percentiles": {name: round(float(values[i]), 4) for name, values in extra.items()},
+        })
+        groups.append(group)
+    return groups
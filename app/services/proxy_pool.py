@@ -0,0 +1,290 @@
+"""
+Pool de proxies de salida con selección ponderada por latencia y éxito
+
+Los proxies vienen de proveedores intercambiables (una lista estática de
+proxies SOCKS/HTTP, los circuitos de TorPool, ...). Un hilo en segundo plano
+mide cada proxy contra una URL de prueba configurable y el tráfico real
+también actualiza su puntaje; al elegir, los proxies rápidos y sanos tienen
+más probabilidad. Cada navegador del pool conserva su proxy (sesión fija)
+mientras siga sano.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+from urllib.parse import urlsplit
+
+# Latencia asumida para un proxy que todavía no se ha medido
+DEFAULT_LATENCY = 2.0
+
+
+class ProxyEndpoint:
+    """Proxy SOCKS5 o HTTP con su puntaje"""
+
+    def __init__(self, url: str, provider: str, available: Optional[Callable[[], bool]] = None, circuit=None):
+        """
+        Args:
+            url: socks5://host:puerto o http://host:puerto (con usuario:clave opcionales)
+            provider: Nombre del proveedor (estatico, tor, ...)
+            available: Condición adicional del proveedor para usar el proxy
+            circuit: Circuito Tor al que corresponde, si aplica
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("socks5", "socks5h", "http"):
+            raise ValueError(f"Esquema de proxy no soportado: {url}")
+        self.url = url
+        self.scheme = "socks5" if parts.scheme.startswith("socks5") else "http"
+        self.host = parts.hostname
+        self.port = parts.port or (1080 if self.scheme == "socks5" else 8080)
+        self.username = parts.username
+        self.password = parts.password
+        self.provider = provider
+        self.circuit = circuit
+        self._available = available
+
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.failures = 0
+        self.healthy = True
+        self.in_use = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """Dirección sin credenciales (para logs y métricas)"""
+        return f"{self.scheme}://{self.host}:{self.port}"
+
+    @property
+    def chrome_argument(self) -> str:
+        """Valor para --proxy-server de Chrome (no admite credenciales)"""
+        return self.label
+
+    def requests_proxies(self) -> Dict[str, str]:
+        """Diccionario de proxies para requests (DNS remoto en SOCKS)"""
+        url = self.url.replace("socks5://", "socks5h://", 1)
+        return {"http": url, "https": url}
+
+    def open_socket(self, host: str, port: int, timeout: float):
+        """Abre una conexión TCP al origen a través del proxy (SOCKS5 o HTTP CONNECT)"""
+        import socks
+        return socks.create_connection(
+            (host, port),
+            timeout=timeout,
+            proxy_type=socks.SOCKS5 if self.scheme == "socks5" else socks.HTTP,
+            proxy_addr=self.host,
+            proxy_port=self.port,
+            proxy_rdns=True,
+            proxy_username=self.username,
+            proxy_password=self.password
+        )
+
+    def usable(self) -> bool:
+        return self.healthy and (self._available is None or self._available())
+
+    def weight(self) -> float:
+        """Peso para la selección: favorece éxito alto y latencia baja"""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return max(self.success_rate, 0.01) ** 2 / max(latency, 0.05)
+
+    def to_dict(self) -> Dict:
+        return {
+            "proxy": self.label,
+            "proveedor": self.provider,
+            "sano": self.usable(),
+            "latencia_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "tasa_exito": round(self.success_rate, 3),
+            "sesiones": self.in_use,
+            "ultimo_error": self.last_error,
+        }
+
+
+class StaticProxyProvider:
+    """Proxies configurados en una lista fija"""
+
+    name = "estatico"
+
+    def __init__(self, urls: List[str]):
+        self._endpoints = [ProxyEndpoint(url, self.name) for url in urls]
+
+    def endpoints(self) -> List[ProxyEndpoint]:
+        return self._endpoints
+
+
+class TorProxyProvider:
+    """Circuitos de un TorPool como proxies SOCKS5"""
+
+    name = "tor"
+
+    def __init__(self, tor_pool):
+        self._endpoints = [
+            ProxyEndpoint(
+                f"socks5://127.0.0.1:{circuit.socks_port}",
+                self.name,
+                available=lambda c=circuit: tor_pool.is_available(c),
+                circuit=circuit
+            )
+            for circuit in tor_pool.circuits
+        ]
+
+    def endpoints(self) -> List[ProxyEndpoint]:
+        return self._endpoints
+
+
+class ProxyPool:
+    """Elige proxies de salida ponderando latencia y tasa de éxito"""
+
+    def __init__(
+        self,
+        providers: List,
+        probe_url: str,
+        probe_interval: float = 60,
+        probe_timeout: float = 15,
+        max_failures: int = 3,
+        on_retire: Optional[Callable[[ProxyEndpoint, str], None]] = None
+    ):
+        """
+        Args:
+            providers: Proveedores de proxies (objetos con endpoints())
+            probe_url: URL que se descarga a través de cada proxy para medirlo
+            probe_interval: Segundos entre mediciones
+            probe_timeout: Timeout de la petición de prueba
+            max_failures: Fallos seguidos tras los cuales el proxy deja de usarse
+            on_retire: Callback (proxy, motivo) cuando un proxy deja de estar sano
+        """
+        self.providers = providers
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.on_retire = on_retire
+
+        self._lock = threading.Lock()
+        self._sticky: Dict[Hashable, ProxyEndpoint] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(8, len(self.endpoints()))), thread_name_prefix="proxy-probe")
+
+    def endpoints(self) -> List[ProxyEndpoint]:
+        return [endpoint for provider in self.providers for endpoint in provider.endpoints()]
+
+    def start(self):
+        """Inicia la medición periódica en segundo plano"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="proxy-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠ Error midiendo proxies: {str(e)}")
+            self._stop.wait(self.probe_interval)
+
+    def run_once(self):
+        """Mide todos los proxies en paralelo"""
+        list(self._executor.map(self.probe, self.endpoints()))
+
+    def probe(self, endpoint: ProxyEndpoint):
+        """Descarga la URL de prueba a través del proxy y registra el resultado"""
+        import requests
+
+        started = time.monotonic()
+        try:
+            response = requests.get(
+                self.probe_url, proxies=endpoint.requests_proxies(), timeout=self.probe_timeout
+            )
+            ok = response.status_code < 500
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            ok, error = False, str(e)
+        self.record(endpoint, ok, time.monotonic() - started, error=error)
+
+    def record(
+        self, endpoint: ProxyEndpoint, success: bool,
+        seconds: Optional[float] = None, error: Optional[str] = None
+    ):
+        """
+        Actualiza el puntaje de un proxy (mediciones y tráfico real)
+
+        Args:
+            endpoint: Proxy usado
+            success: Si la petición tuvo éxito
+            seconds: Duración de la petición de prueba; el tráfico real no la informa
+                porque una búsqueda completa no es comparable con la medición
+            error: Descripción del error, si lo hubo
+        """
+        with self._lock:
+            was_healthy = endpoint.healthy
+            endpoint.success_rate = 0.8 * endpoint.success_rate + 0.2 * (1.0 if success else 0.0)
+            if success:
+                endpoint.failures = 0
+                endpoint.healthy = True
+                endpoint.last_error = None
+                if seconds is not None:
+                    endpoint.latency = seconds if endpoint.latency is None else 0.7 * endpoint.latency + 0.3 * seconds
+            else:
+                endpoint.failures += 1
+                endpoint.last_error = error
+                if endpoint.failures >= self.max_failures:
+                    endpoint.healthy = False
+
+        if was_healthy and not endpoint.healthy:
+            print(f"⚠ Proxy {endpoint.label} fuera de servicio: {error}")
+            if self.on_retire:
+                self.on_retire(endpoint, f"proxy {endpoint.label} fuera de servicio")
+        elif success and not was_healthy:
+            print(f"✓ Proxy {endpoint.label} disponible de nuevo")
+
+    def choose(self, sticky_key: Optional[Hashable] = None) -> Optional[ProxyEndpoint]:
+        """
+        Elige un proxy, favoreciendo los rápidos y sanos
+
+        Args:
+            sticky_key: Identificador de la sesión; mientras su proxy siga sano se reutiliza
+
+        Returns:
+            El proxy elegido, o None si no hay ninguno utilizable
+        """
+        with self._lock:
+            current = self._sticky.get(sticky_key) if sticky_key is not None else None
+            if current is not None and current.usable():
+                return current
+
+            candidates = [e for e in self.endpoints() if e.usable()]
+            if not candidates:
+                return None
+            endpoint = random.choices(candidates, weights=[e.weight() for e in candidates])[0]
+
+            if sticky_key is not None:
+                if current is not None:
+                    current.in_use = max(0, current.in_use - 1)
+                self._sticky[sticky_key] = endpoint
+                endpoint.in_use += 1
+            return endpoint
+
+    def release(self, sticky_key: Hashable):
+        """Libera el proxy asignado a una sesión"""
+        with self._lock:
+            endpoint = self._sticky.pop(sticky_key, None)
+            if endpoint is not None:
+                endpoint.in_use = max(0, endpoint.in_use - 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = self.endpoints()
+            return {
+                "url_prueba": self.probe_url,
+                "sanos": sum(1 for e in endpoints if e.usable()),
+                "proxies": [e.to_dict() for e in endpoints],
+            }
@@ -0,0 +1,56 @@
+"""
+Últimos resultados exitosos por consulta, en memoria
+
+Cuando un servicio externo no está disponible se responde con el resultado
+más reciente de la misma consulta en lugar de esperar al navegador.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class RecentResults:
+    """Caché LRU con vencimiento de los últimos resultados exitosos"""
+
+    def __init__(self, max_entries: int = 500, ttl: float = 1800):
+        """
+        Args:
+            max_entries: Número máximo de consultas guardadas
+            ttl: Segundos que un resultado se considera utilizable
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, key: Hashable, result: Dict):
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Dict, float]]:
+        """
+        Obtiene el resultado guardado de una consulta
+
+        Returns:
+            Tupla (resultado, antigüedad en segundos), o None si no hay uno vigente
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], time.time() - entry[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entradas": len(self._entries), "aciertos": self.hits, "fallos": self.misses}
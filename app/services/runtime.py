@@ -0,0 +1,396 @@
+"""
+Recursos de larga duración compartidos por toda la aplicación
+
+Los pools de navegadores y los procesos en segundo plano se crean una sola vez
+al iniciar la aplicación y se liberan al detenerla.
+"""
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from .asset_proxy import AssetStore, CachingProxy
+from .browser_pool import BrowserPool, BrowserSession
+from .browser_profiles import ProfileManager
+from .circuit_breaker import CircuitBreaker
+from .digemid_scraper import DigemidScraper
+from .fare_history import FareHistory
+from .hedging import HedgedExecutor
+from .memory_governor import MemoryGovernor
+from .place_cache import PlaceCache
+from .price_history import PriceHistory
+from .proxy_pool import ProxyEndpoint, ProxyPool, StaticProxyProvider, TorProxyProvider
+from .recent_results import RecentResults
+from .scheduler import UpstreamScheduler
+from .tor_pool import TorCircuit, TorPool
+from .uber_scraper import UberScraper
+from .uber_session import UberCookies, UberSessionKeeper
+
+
+class ServiceRuntime:
+    """Contenedor de los recursos compartidos de la aplicación"""
+
+    def __init__(self):
+        self.digemid_pool: Optional[BrowserPool] = None
+        self.uber_pool: Optional[BrowserPool] = None
+        self.memory_governor: Optional[MemoryGovernor] = None
+        self.profiles: Optional[ProfileManager] = None
+        self.asset_store: Optional[AssetStore] = None
+        self.asset_proxies: Dict[str, CachingProxy] = {}
+        self._asset_lock = threading.Lock()
+        self._asset_intercept = False
+        self.tor_pool: Optional[TorPool] = None
+        self.proxy_pool: Optional[ProxyPool] = None
+        self.digemid_hedger: Optional[HedgedExecutor] = None
+        self.uber_hedger: Optional[HedgedExecutor] = None
+        self.digemid_scheduler: Optional[UpstreamScheduler] = None
+        self.uber_scheduler: Optional[UpstreamScheduler] = None
+        self.digemid_breaker: Optional[CircuitBreaker] = None
+        self.uber_breaker: Optional[CircuitBreaker] = None
+        self.digemid_recent: Optional[RecentResults] = None
+        self.uber_recent: Optional[RecentResults] = None
+        self.uber_cookies = UberCookies(settings.UBER_COOKIES_FILE)
+        self.uber_sessions: Optional[UberSessionKeeper] = None
+        self.uber_places: Optional[PlaceCache] = None
+        self.uber_fares: Optional[RecentResults] = None
+        self.fare_history: Optional[FareHistory] = None
+        self.price_history: Optional[PriceHistory] = None
+        self.started = False
+
+    def _user_data_dir(self, session: BrowserSession) -> Optional[str]:
+        """Prepara el perfil persistente del slot y lo libera al cerrar la sesión"""
+        if self.profiles is None:
+            return None
+        path = self.profiles.prepare(session.pool_name, session.slot)
+        session.on_close(lambda: self.profiles.release(session.pool_name, session.slot))
+        return path
+
+    def _egress(self, session: BrowserSession, upstream: str) -> Optional[ProxyEndpoint]:
+        """
+        Asigna a la sesión su proxy de salida fijo (si el servicio usa el ProxyPool)
+
+        Raises:
+            RuntimeError: Si el servicio usa el pool y no hay proxies sanos
+        """
+        if self.proxy_pool is None or upstream not in settings.PROXY_POOL_UPSTREAMS:
+            return None
+        key = (session.pool_name, session.slot)
+        endpoint = self.proxy_pool.choose(sticky_key=key)
+        if endpoint is None:
+            raise RuntimeError("No hay proxies de salida sanos disponibles")
+        session.proxy_endpoint = endpoint
+        session.tor_circuit = endpoint.circuit
+        session.on_close(lambda: self.proxy_pool.release(key))
+        return endpoint
+
+    def _proxy_options(self, endpoint: Optional[ProxyEndpoint]) -> Dict:
+        """Argumentos de proxy para un navegador que sale por `endpoint` (None = directo)"""
+        if self.asset_store is None:
+            return {"proxy_server": endpoint.chrome_argument} if endpoint is not None else {}
+
+        proxy = self._asset_proxy(endpoint)
+        extra = []
+        if proxy.server_tls_context is not None and settings.ASSET_PROXY_CERT_SPKI:
+            # Chrome sólo acepta el certificado local del proxy, no cualquier certificado
+            extra.append(f"--ignore-certificate-errors-spki-list={settings.ASSET_PROXY_CERT_SPKI}")
+        return {"proxy_server": proxy.address, "extra_arguments": extra}
+
+    def _asset_proxy(self, endpoint: Optional[ProxyEndpoint]) -> CachingProxy:
+        """
+        Proxy de recursos encadenado a una salida
+
+        Hay uno por salida (directa o cada proxy del pool), todos con el mismo
+        almacén; se crean la primera vez que un navegador los necesita.
+        """
+        key = endpoint.url if endpoint is not None else "directo"
+        with self._asset_lock:
+            proxy = self.asset_proxies.get(key)
+            if proxy is None:
+                intercept = self._asset_intercept
+                proxy = CachingProxy(
+                    self.asset_store,
+                    port=settings.ASSET_PROXY_PORT + len(self.asset_proxies),
+                    upstream_proxy=endpoint,
+                    intercept_hosts=settings.ASSET_PROXY_INTERCEPT_HOSTS if intercept else [],
+                    cert_file=settings.ASSET_PROXY_CERT_FILE if intercept else None,
+                    key_file=settings.ASSET_PROXY_KEY_FILE if intercept else None,
+                    upstream_timeout=settings.TIMEOUT
+                )
+                proxy.start()
+                self.asset_proxies[key] = proxy
+            return proxy
+
+    def _start_asset_store(self):
+        """Crea el almacén compartido del proxy de recursos e inicia el proxy de salida directa"""
+        self.asset_store = AssetStore(
+            cache_dir=settings.ASSET_PROXY_CACHE_DIR,
+            default_ttl=settings.ASSET_PROXY_DEFAULT_TTL
+        )
+        intercept = bool(settings.ASSET_PROXY_CERT_FILE and settings.ASSET_PROXY_KEY_FILE)
+        if intercept and not settings.ASSET_PROXY_CERT_SPKI:
+            print("⚠ ASSET_PROXY_CERT_SPKI no está configurado: el HTTPS se tunelizará sin cachear")
+            intercept = False
+        self._asset_intercept = intercept
+        self._asset_proxy(None)
+
+    def _create_digemid_driver(self, session: BrowserSession):
+        """Crea el navegador de una sesión del pool de DIGEMID"""
+        scraper = DigemidScraper(
+            headless=settings.HEADLESS_MODE,
+            timeout=settings.TIMEOUT,
+            user_data_dir=self._user_data_dir(session),
+            **self._proxy_options(self._egress(session, "digemid"))
+        )
+        return scraper._setup_driver()
+
+    def _create_uber_driver(self, session: BrowserSession):
+        """Crea el navegador de una sesión del pool de Uber, con login y en el formulario de tarifas"""
+        scraper = UberScraper(
+            headless=settings.HEADLESS_MODE,
+            timeout=settings.TIMEOUT,
+            session=session,
+            user_data_dir=self._user_data_dir(session),
+            cookies=self.uber_cookies,
+            network_capture=settings.UBER_NETWORK_CAPTURE,
+            **self._proxy_options(self._egress(session, "uber"))
+        )
+        driver = scraper._setup_driver()
+        # Si falla, la cotización vuelve a intentarlo e informa el error
+        if scraper._load_cookies() and not scraper._open_fare_form():
+            print(f"⚠ Navegador uber#{session.slot}: no cargó el formulario de tarifas")
+        return driver
+
+    def _retire_sessions(self, matches: Callable[[BrowserSession], bool], reason: str):
+        """Recicla los navegadores cuya salida dejó de estar disponible"""
+        for pool in (self.digemid_pool, self.uber_pool):
+            for session in pool.sessions():
+                if matches(session):
+                    pool.mark_for_recycle(session, reason)
+
+    def _retire_circuit_sessions(self, circuit: TorCircuit, reason: str):
+        """Recicla los navegadores que usan un circuito Tor caído o en rotación"""
+        self._retire_sessions(lambda session: session.tor_circuit is circuit, reason)
+
+    def _retire_proxy_sessions(self, endpoint: ProxyEndpoint, reason: str):
+        """Recicla los navegadores que usan un proxy fuera de servicio"""
+        self._retire_sessions(lambda session: session.proxy_endpoint is endpoint, reason)
+
+    def _create_hedger(self, upstream: str) -> HedgedExecutor:
+        """Crea el ejecutor con hedging de un servicio"""
+        return HedgedExecutor(
+            upstream,
+            enabled=settings.HEDGING_ENABLED,
+            percentile=settings.HEDGE_PERCENTILE,
+            max_hedge_rate=settings.HEDGE_MAX_RATE,
+            min_samples=settings.HEDGE_MIN_SAMPLES,
+            max_workers=settings.BROWSER_POOL_SIZE
+        )
+
+    def _create_scheduler(self, upstream: str, max_per_minute: float) -> UpstreamScheduler:
+        """Crea el planificador de cortesía de un servicio"""
+        return UpstreamScheduler(
+            upstream,
+            max_rate=max_per_minute / 60,
+            burst=settings.SCHEDULER_BURST,
+            max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+            block_cooldown=settings.SCHEDULER_BLOCK_COOLDOWN,
+            interactive_reserve=settings.SCHEDULER_INTERACTIVE_RESERVE
+        )
+
+    def _create_breaker(self, upstream: str) -> CircuitBreaker:
+        """Crea el circuit breaker de un servicio"""
+        return CircuitBreaker(
+            upstream,
+            failure_rate=settings.CIRCUIT_FAILURE_RATE,
+            slow_call_seconds=settings.CIRCUIT_SLOW_CALL_SECONDS,
+            slow_call_rate=settings.CIRCUIT_SLOW_CALL_RATE,
+            window=settings.CIRCUIT_WINDOW,
+            min_calls=settings.CIRCUIT_MIN_CALLS,
+            open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+            half_open_successes=settings.CIRCUIT_HALF_OPEN_SUCCESSES,
+            probe_timeout=settings.BROWSER_ACQUIRE_TIMEOUT + settings.CIRCUIT_SLOW_CALL_SECONDS
+        )
+
+    def start(self):
+        """Crea los pools e inicia las tareas en segundo plano"""
+        if self.started:
+            return
+
+        if settings.BROWSER_PERSISTENT_PROFILES:
+            self.profiles = ProfileManager(
+                base_dir=settings.BROWSER_PROFILES_DIR,
+                template_max_age=settings.BROWSER_PROFILE_TEMPLATE_MAX_AGE,
+                refresh_interval=settings.BROWSER_PROFILE_REFRESH_INTERVAL
+            )
+
+        if settings.USE_TOR:
+            self.tor_pool = TorPool(
+                size=settings.TOR_CIRCUITS,
+                base_socks_port=settings.TOR_PORT,
+                base_control_port=settings.TOR_CONTROL_PORT,
+                data_dir=settings.TOR_DATA_DIR,
+                check_interval=settings.TOR_HEALTH_INTERVAL,
+                check_timeout=settings.TIMEOUT,
+                rotate_after_requests=settings.TOR_ROTATE_AFTER_REQUESTS,
+                rotate_interval=settings.TOR_ROTATE_INTERVAL,
+                rotate_on_block=settings.TOR_ROTATE_ON_BLOCK,
+                on_retire=self._retire_circuit_sessions
+            )
+            self.tor_pool.start()
+
+        providers = []
+        if settings.PROXY_LIST:
+            providers.append(StaticProxyProvider(settings.PROXY_LIST))
+        if self.tor_pool is not None:
+            providers.append(TorProxyProvider(self.tor_pool))
+        if providers:
+            self.proxy_pool = ProxyPool(
+                providers,
+                probe_url=settings.PROXY_PROBE_URL,
+                probe_interval=settings.PROXY_PROBE_INTERVAL,
+                probe_timeout=settings.TIMEOUT,
+                on_retire=self._retire_proxy_sessions
+            )
+            self.proxy_pool.start()
+
+        if settings.ASSET_PROXY_ENABLED:
+            self._start_asset_store()
+
+        self.digemid_pool = BrowserPool(
+            "digemid",
+            self._create_digemid_driver,
+            size=settings.BROWSER_POOL_SIZE,
+            max_searches=settings.BROWSER_MAX_SEARCHES
+        )
+        self.uber_pool = BrowserPool(
+            "uber",
+            self._create_uber_driver,
+            size=settings.BROWSER_POOL_SIZE,
+            max_searches=settings.BROWSER_MAX_SEARCHES
+        )
+
+        self.digemid_hedger = self._create_hedger("digemid")
+        self.uber_hedger = self._create_hedger("uber")
+        self.digemid_scheduler = self._create_scheduler("digemid", settings.SCHEDULER_DIGEMID_PER_MINUTE)
+        self.uber_scheduler = self._create_scheduler("uber", settings.SCHEDULER_UBER_PER_MINUTE)
+        self.digemid_breaker = self._create_breaker("digemid")
+        self.uber_breaker = self._create_breaker("uber")
+        self.digemid_recent = RecentResults(settings.RECENT_RESULTS_MAX_ENTRIES, settings.RECENT_RESULTS_TTL)
+        self.uber_recent = RecentResults(settings.RECENT_RESULTS_MAX_ENTRIES, settings.RECENT_RESULTS_TTL)
+        if settings.PRICE_HISTORY_ENABLED:
+            self.price_history = PriceHistory(
+                settings.PRICE_HISTORY_DB,
+                batch_size=settings.PRICE_HISTORY_BATCH_SIZE,
+                flush_interval=settings.PRICE_HISTORY_FLUSH_INTERVAL,
+                max_pending=settings.PRICE_HISTORY_MAX_PENDING,
+                utc_offset_hours=settings.PRICE_HISTORY_UTC_OFFSET
+            )
+            self.price_history.start()
+
+        self.uber_places = PlaceCache(settings.PLACE_CACHE_MAX_ENTRIES, settings.PLACE_CACHE_TTL)
+        self.uber_fares = RecentResults(settings.FARE_CACHE_MAX_ENTRIES, settings.FARE_CACHE_TTL)
+        if settings.FARE_HISTORY_ENABLED:
+            self.fare_history = FareHistory(
+                settings.FARE_HISTORY_DB,
+                geohash_precision=settings.FARE_HISTORY_GEOHASH_PRECISION,
+                distance_bucket_km=settings.FARE_HISTORY_DISTANCE_BUCKET_KM,
+                hour_window=settings.FARE_HISTORY_HOUR_WINDOW,
+                min_samples=settings.FARE_HISTORY_MIN_SAMPLES,
+                max_age_days=settings.FARE_HISTORY_MAX_AGE_DAYS,
+                utc_offset_hours=settings.FARE_HISTORY_UTC_OFFSET
+            )
+            self.fare_history.start()
+        self.uber_sessions = UberSessionKeeper(
+            self.uber_pool,
+            self.uber_cookies,
+            interval=settings.UBER_SESSION_CHECK_INTERVAL,
+            refresh_margin=settings.UBER_COOKIE_EXPIRY_WARNING,
+            prewarm=settings.UBER_PREWARM_SESSIONS
+        )
+        self.uber_sessions.start()
+
+        self.memory_governor = MemoryGovernor(
+            [self.digemid_pool, self.uber_pool],
+            max_rss_mb=settings.BROWSER_MAX_RSS_MB,
+            max_js_heap_mb=settings.BROWSER_MAX_JS_HEAP_MB,
+            interval=settings.MEMORY_GOVERNOR_INTERVAL,
+            node_high_percent=settings.NODE_MEMORY_HIGH_PERCENT,
+            node_critical_percent=settings.NODE_MEMORY_CRITICAL_PERCENT
+        )
+        self.memory_governor.start()
+        self.started = True
+
+    def stop(self):
+        """Detiene las tareas en segundo plano y cierra los navegadores"""
+        if not self.started:
+            return
+
+        self.memory_governor.stop()
+        self.uber_sessions.stop()
+        self.digemid_hedger.shutdown()
+        self.uber_hedger.shutdown()
+        self.digemid_pool.close()
+        self.uber_pool.close()
+        self.memory_governor.reap_orphans()
+        if self.profiles is not None:
+            self.profiles.close()
+        for proxy in list(self.asset_proxies.values()):
+            proxy.stop()
+        self.asset_proxies = {}
+        if self.proxy_pool is not None:
+            self.proxy_pool.stop()
+            self.proxy_pool = None
+        if self.tor_pool is not None:
+            self.tor_pool.stop()
+            self.tor_pool = None
+        if self.fare_history is not None:
+            self.fare_history.stop()
+            self.fare_history = None
+        if self.price_history is not None:
+            self.price_history.stop()
+            self.price_history = None
+        self.started = False
+
+    def stats(self) -> Dict:
+        """Estado de los recursos compartidos"""
+        if not self.started:
+            return {"iniciado": False}
+
+        return {
+            "iniciado": True,
+            "navegadores": {
+                "digemid": self.digemid_pool.stats(),
+                "uber": self.uber_pool.stats(),
+            },
+            "memoria": self.memory_governor.stats(),
+            "hedging": {
+                "digemid": self.digemid_hedger.stats(),
+                "uber": self.uber_hedger.stats(),
+            },
+            "planificador": {
+                "digemid": self.digemid_scheduler.stats(),
+                "uber": self.uber_scheduler.stats(),
+            },
+            "circuitos": {
+                "digemid": self.digemid_breaker.stats(),
+                "uber": self.uber_breaker.stats(),
+            },
+            "resultados_recientes": {
+                "digemid": self.digemid_recent.stats(),
+                "uber": self.uber_recent.stats(),
+            },
+            "sesiones_uber": self.uber_sessions.stats(),
+            "lugares_uber": self.uber_places.stats(),
+            "tarifas_uber": self.uber_fares.stats(),
+            "historial_tarifas": self.fare_history.stats() if self.fare_history else None,
+            "historial_precios": self.price_history.stats() if self.price_history else None,
+            "tor": self.tor_pool.stats() if self.tor_pool else None,
+            "proxies_salida": self.proxy_pool.stats() if self.proxy_pool else None,
+            "perfiles": self.profiles.stats() if self.profiles else None,
+            "proxy_recursos": {
+                "almacen": self.asset_store.stats(),
+                "proxies": [proxy.stats() for proxy in list(self.asset_proxies.values())],
+            } if self.asset_store else None,
+        }
+
+
+runtime = ServiceRuntime()
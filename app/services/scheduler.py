@@ -0,0 +1,331 @@
+"""
+Planificador de cortesía por servicio externo
+
+Toda búsqueda pasa por el planificador de su servicio antes de usar un
+navegador. El planificador limita el ritmo (token bucket) y la concurrencia
+contra el origen, reparte los turnos entre clases de prioridad y ajusta ambos límites según
+lo que observa: sube de a poco mientras las respuestas son buenas y baja a la
+mitad ante errores, lentitud o páginas de bloqueo (AIMD), de modo que el
+ritmo se mantiene en el máximo que el origen tolera.
+
+Las clases (interactiva, lote, fondo) comparten los turnos con una cola
+ponderada; parte de la concurrencia queda reservada para las interactivas y
+un trabajo de fondo cede su turno en la siguiente fase si una interactiva
+está esperando.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional
+
+from .hedging import PhaseLatencyTracker
+
+# Resultados que informa quien usó el turno
+OK = "ok"
+ERROR = "error"
+SLOW = "lento"
+BLOCKED = "bloqueo"
+
+
+def classify(success: bool, seconds: float, slow_seconds: float, blocked: bool = False) -> str:
+    """Resultado de una búsqueda desde el punto de vista del origen"""
+    if blocked:
+        return BLOCKED
+    if not success:
+        return ERROR
+    if seconds >= slow_seconds:
+        return SLOW
+    return OK
+
+
+class Preempted(Exception):
+    """El trabajo de fondo cedió su turno a una petición interactiva"""
+
+
+# Clases de prioridad del trabajo de scraping
+INTERACTIVE = "interactiva"
+BATCH = "lote"
+BACKGROUND = "fondo"
+
+# Peso de cada clase en la cola ponderada (a mayor peso, más turnos)
+CLASS_WEIGHTS = {INTERACTIVE: 8, BATCH: 3, BACKGROUND: 1}
+
+
+class ScheduledTurn:
+    """Turno concedido por el planificador; quien lo usa informa el resultado"""
+
+    def __init__(self, klass: str, waited: float):
+        self.klass = klass
+        self.waited = waited
+        self.granted_at = time.monotonic()
+        self.outcome: Optional[str] = None
+        self._preempt = threading.Event()
+
+    @property
+    def preemptible(self) -> bool:
+        return self.klass == BACKGROUND
+
+    def preempt(self):
+        self._preempt.set()
+
+    def check(self, phase: str):
+        """
+        Callback de progreso: el trabajo de fondo se interrumpe entre fases si se le pidió
+
+        Raises:
+            Preempted: Si una petición interactiva necesita el turno
+        """
+        if self._preempt.is_set():
+            raise Preempted(f"Trabajo de fondo interrumpido en la fase '{phase}'")
+
+    def watch(self, progress: Callable[[str], None]) -> Callable[[str], None]:
+        """Envuelve un callback de progreso para comprobar la interrupción en cada fase"""
+        def callback(phase: str):
+            progress(phase)
+            self.check(phase)
+        return callback
+
+
+class _Waiter:
+    __slots__ = ("klass", "tag", "sequence")
+
+    def __init__(self, klass: str, tag: float, sequence: int):
+        self.klass = klass
+        self.tag = tag
+        self.sequence = sequence
+
+
+class UpstreamScheduler:
+    """Token bucket + límite de concurrencia adaptativos para un servicio externo"""
+
+    def __init__(
+        self,
+        name: str,
+        max_rate: float,
+        burst: int = 3,
+        max_concurrency: int = 2,
+        min_rate_fraction: float = 0.1,
+        block_cooldown: float = 30,
+        interactive_reserve: int = 1
+    ):
+        """
+        Args:
+            name: Nombre del servicio (para logs y métricas)
+            max_rate: Peticiones por segundo máximas hacia el origen
+            burst: Peticiones que pueden salir seguidas tras un periodo inactivo
+            max_concurrency: Búsquedas simultáneas máximas contra el origen
+            min_rate_fraction: Fracción de max_rate por debajo de la cual no se baja
+            block_cooldown: Segundos sin enviar peticiones tras detectar un bloqueo
+            interactive_reserve: Turnos simultáneos reservados para peticiones interactivas
+        """
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = max_rate * min_rate_fraction
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.block_cooldown = block_cooldown
+        self.interactive_reserve = max(0, interactive_reserve)
+
+        self.rate = max_rate
+        self.concurrency = float(self.max_concurrency)
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._running: List[ScheduledTurn] = []
+        self._sequence = itertools.count()
+        self._counters = {OK: 0, ERROR: 0, SLOW: 0, BLOCKED: 0, "rechazados": 0, "interrumpidos": 0, "descartados": 0}
+
+        # Cola ponderada (WFQ): cada clase tiene su fila y las etiquetas de
+        # finalización virtual deciden a quién le toca
+        self._queues: Dict[str, Deque[_Waiter]] = {klass: deque() for klass in CLASS_WEIGHTS}
+        self._last_tag = {klass: 0.0 for klass in CLASS_WEIGHTS}
+        self._virtual_time = 0.0
+        self.queue_wait = PhaseLatencyTracker(window=200, min_samples=1)
+        # Duración de los turnos completados, para estimar la espera de los que llegan
+        self.service_time = PhaseLatencyTracker(window=50, min_samples=5)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _capacity(self, klass: str) -> int:
+        """Turnos simultáneos que puede ocupar una clase (las no interactivas respetan la reserva)"""
+        limit = int(self.concurrency)
+        if klass == INTERACTIVE:
+            return limit
+        return limit - min(self.interactive_reserve, limit - 1)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Siguiente en la cola ponderada entre las clases que tienen capacidad"""
+        heads = [
+            queue[0] for klass, queue in self._queues.items()
+            if queue and len(self._running) < self._capacity(klass)
+        ]
+        return min(heads, key=lambda w: (w.tag, w.sequence), default=None)
+
+    def _ready_in(self, now: float) -> float:
+        """Segundos hasta que haya un token disponible (0 = ya)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _request_preemption(self):
+        """Pide a un trabajo de fondo en curso que ceda su turno a un interactivo"""
+        if self._queues[INTERACTIVE] and len(self._running) >= self._capacity(INTERACTIVE):
+            candidates = [t for t in self._running if t.preemptible and not t._preempt.is_set()]
+            if candidates:
+                print(f"⤵ {self.name}: interrumpiendo trabajo de fondo para atender una petición interactiva")
+                candidates[-1].preempt()
+
+    def acquire(self, klass: str = INTERACTIVE, timeout: Optional[float] = None) -> ScheduledTurn:
+        """
+        Espera un turno para enviar una petición al origen
+
+        Args:
+            klass: Clase de prioridad (interactiva, lote, fondo)
+            timeout: Segundos máximos de espera (0 = sólo si hay capacidad ahora)
+
+        Raises:
+            TimeoutError: Si no se obtuvo turno a tiempo
+        """
+        if klass not in CLASS_WEIGHTS:
+            raise ValueError(f"Clase de prioridad desconocida: {klass}")
+        started = time.monotonic()
+        expires = started + timeout if timeout is not None else None
+
+        with self._cond:
+            tag = max(self._virtual_time, self._last_tag[klass]) + 1 / CLASS_WEIGHTS[klass]
+            self._last_tag[klass] = tag
+            waiter = _Waiter(klass, tag, next(self._sequence))
+            self._queues[klass].append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ready_in = None
+                    if self._next_waiter() is waiter:
+                        ready_in = self._ready_in(now)
+                        if ready_in == 0.0:
+                            self._queues[klass].popleft()
+                            self._virtual_time = max(self._virtual_time, waiter.tag)
+                            self._tokens -= 1
+                            turn = ScheduledTurn(klass, now - started)
+                            self._running.append(turn)
+                            self.queue_wait.record(klass, turn.waited)
+                            return turn
+                    elif klass == INTERACTIVE:
+                        self._request_preemption()
+
+                    remaining = expires - now if expires is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self._counters["rechazados"] += 1
+                        raise TimeoutError(f"Sin turno para consultar {self.name} (límite de ritmo)")
+                    waits = [w for w in (ready_in, remaining) if w is not None]
+                    self._cond.wait(min(waits) if waits else None)
+            finally:
+                if waiter in self._queues[klass]:
+                    self._queues[klass].remove(waiter)
+                # El siguiente de la cola puede ser ahora el primero
+                self._cond.notify_all()
+
+    def release(self, turn: ScheduledTurn):
+        """
+        Devuelve el turno y ajusta los límites según el resultado
+
+        Un turno sin resultado (intento cancelado, error local) no ajusta nada.
+        """
+        with self._cond:
+            self._running.remove(turn)
+            outcome = turn.outcome
+            if outcome == OK:
+                # Aumento aditivo: un 5% del máximo por respuesta buena
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            elif outcome in (ERROR, SLOW, BLOCKED):
+                # Disminución multiplicativa
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self._tokens = min(self._tokens, 0.0)
+                if outcome == BLOCKED:
+                    self._paused_until = time.monotonic() + self.block_cooldown
+                    print(f"⏸ {self.name}: bloqueo detectado, pausa de {self.block_cooldown:.0f}s")
+                print(f"↓ {self.name}: {outcome}, ritmo {self.rate * 60:.1f}/min, concurrencia {int(self.concurrency)}")
+            if outcome is not None:
+                self._counters[outcome] += 1
+                self.service_time.record("turno", time.monotonic() - turn.granted_at)
+            self._cond.notify_all()
+
+    def estimate_wait(self, klass: str = INTERACTIVE) -> Optional[float]:
+        """
+        Espera estimada para un turno nuevo de una clase
+
+        Combina la cola por delante (según los pesos de la cola ponderada), los
+        turnos en curso y la duración reciente de los turnos con el ritmo permitido.
+
+        Returns:
+            Segundos, o None si aún no hay suficientes turnos medidos
+        """
+        service = self.service_time.percentile("turno", 50)
+        if service is None:
+            return None
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            own = len(self._queues[klass]) + 1
+            ahead = len(self._queues[klass]) + sum(
+                min(len(queue), own * CLASS_WEIGHTS[other] / CLASS_WEIGHTS[klass])
+                for other, queue in self._queues.items() if other != klass
+            )
+            slots = max(1, self._capacity(klass))
+            busy = len(self._running) + ahead
+            by_concurrency = 0.0 if busy < slots else (busy - slots + 1) / slots * service
+            by_rate = max(0.0, (ahead + 1 - self._tokens) / self.rate)
+            paused = max(0.0, self._paused_until - now)
+            return max(by_concurrency, by_rate, paused)
+
+    def typical_service(self) -> Optional[float]:
+        """Duración típica (p50) de un turno, o None si aún no hay suficientes medidos"""
+        return self.service_time.percentile("turno", 50)
+
+    def shed(self):
+        """Cuenta una petición rechazada por el control de admisión"""
+        with self._cond:
+            self._counters["descartados"] += 1
+
+    @contextmanager
+    def turn(self, klass: str = INTERACTIVE, timeout: Optional[float] = None):
+        """
+        Context manager que espera un turno y lo devuelve al terminar
+
+        Si el bloque lanza Preempted el turno se devuelve sin ajustar los límites.
+        """
+        turn = self.acquire(klass, timeout)
+        try:
+            yield turn
+        except Preempted:
+            with self._cond:
+                self._counters["interrumpidos"] += 1
+            raise
+        finally:
+            self.release(turn)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "ritmo_por_minuto": round(self.rate * 60, 2),
+                "ritmo_maximo_por_minuto": round(self.max_rate * 60, 2),
+                "concurrencia": int(self.concurrency),
+                "en_curso": len(self._running),
+                "en_cola": {klass: len(queue) for klass, queue in self._queues.items()},
+                "pausado_segundos": round(max(0.0, self._paused_until - time.monotonic()), 1),
+                "resultados": dict(self._counters),
+                "espera_en_cola": self.queue_wait.stats(),
+                "duracion_turno": self.service_time.stats().get("turno"),
+            }
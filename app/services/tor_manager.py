@@ -6,7 +6,7 @@ import socks
 import subprocess
 import time
 import os
-from typing import Optional
+from typing import Dict, Optional
 from pathlib import Path
 
 
@@ -17,7 +17,8 @@ class TorManager:
         self,
         tor_port: int = 9050,
         control_port: int = 9051,
-        tor_password: Optional[str] = None
+        tor_password: Optional[str] = None,
+        data_dir: Optional[str] = None
     ):
         """
         Inicializa el gestor de Tor
@@ -26,10 +27,13 @@ class TorManager:
             tor_port: Puerto SOCKS de Tor (default: 9050)
             control_port: Puerto de control de Tor (default: 9051)
             tor_password: Contraseña para el puerto de control
+            data_dir: Directorio de datos propio; permite correr varias instancias
+                en paralelo (los puertos se pasan por línea de comandos, sin torrc)
         """
         self.tor_port = tor_port
         self.control_port = control_port
         self.tor_password = tor_password
+        self.data_dir = data_dir
         self.tor_process = None
 
     def is_tor_running(self) -> bool:
@@ -79,12 +83,22 @@ class TorManager:
             # Intentar ejecutar "tor" si está en el PATH
             tor_exe = "tor"
 
+        command = [tor_exe]
+        if self.data_dir:
+            Path(self.data_dir).mkdir(parents=True, exist_ok=True)
+            command += [
+                "--SocksPort", str(self.tor_port),
+                "--ControlPort", str(self.control_port),
+                "--DataDirectory", str(Path(self.data_dir).resolve()),
+                "--CookieAuthentication", "1",
+            ]
+
         try:
             # Intentar iniciar Tor
             self.tor_process = subprocess.Popen(
-                [tor_exe],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
                 creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
 
@@ -119,10 +133,14 @@ class TorManager:
             except:
                 self.tor_process.kill()
 
-    def get_new_identity(self) -> bool:
+    def get_new_identity(self, wait_seconds: float = 5) -> bool:
         """
         Solicita una nueva identidad a Tor (cambia la IP)
 
+        Args:
+            wait_seconds: Segundos a esperar para que se establezca la nueva identidad
+                (0 si quien llama espera por su cuenta, p. ej. en segundo plano)
+
         Returns:
             True si se obtuvo nueva identidad exitosamente
         """
@@ -138,13 +156,48 @@ class TorManager:
 
                 controller.signal(Signal.NEWNYM)
                 print("✓ Nueva identidad de Tor solicitada")
-                time.sleep(5)  # Esperar a que se establezca la nueva identidad
+                if wait_seconds:
+                    time.sleep(wait_seconds)  # Esperar a que se establezca la nueva identidad
                 return True
 
         except Exception as e:
             print(f"⚠ No se pudo obtener nueva identidad: {str(e)}")
             return False
 
+    def check(self, timeout: float = 30) -> Dict:
+        """
+        Consulta la IP de salida a través de Tor
+
+        Returns:
+            Diccionario con is_tor, ip y latencia (segundos)
+
+        Raises:
+            Exception: Si la petición de prueba falla
+        """
+        import requests
+
+        # Configurar el proxy SOCKS
+        proxies = {
+            'http': f'socks5h://127.0.0.1:{self.tor_port}',
+            'https': f'socks5h://127.0.0.1:{self.tor_port}'
+        }
+
+        # Hacer una petición de prueba para verificar la IP
+        started = time.monotonic()
+        response = requests.get(
+            'https://check.torproject.org/api/ip',
+            proxies=proxies,
+            timeout=timeout
+        )
+        latency = time.monotonic() - started
+
+        data = response.json()
+        return {
+            "is_tor": data.get('IsTor', False),
+            "ip": data.get('IP', 'Unknown'),
+            "latency": latency,
+        }
+
     def test_connection(self) -> bool:
         """
         Prueba la conexión a través de Tor
@@ -153,24 +206,9 @@ class TorManager:
             True si la conexión funciona correctamente
         """
         try:
-            import requests
-
-            # Configurar el proxy SOCKS
-            proxies = {
-                'http': f'socks5h://127.0.0.1:{self.tor_port}',
-                'https': f'socks5h://127.0.0.1:{self.tor_port}'
-            }
-
-            # Hacer una petición de prueba para verificar la IP
-            response = requests.get(
-                'https://check.torproject.org/api/ip',
-                proxies=proxies,
-                timeout=30
-            )
-
-            data = response.json()
-            is_tor = data.get('IsTor', False)
-            ip = data.get('IP', 'Unknown')
+            result = self.check()
+            is_tor = result["is_tor"]
+            ip = result["ip"]
 
             if is_tor:
                 print(f"✓ Conexión Tor verificada - IP: {ip}")
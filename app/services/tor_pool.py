@@ -0,0 +1,319 @@
+"""
+Pool de circuitos Tor de larga duración
+
+Varias instancias de Tor (cada una con su puerto SOCKS y su directorio de
+datos, por lo tanto con circuitos aislados) se inician junto con la
+aplicación. Un hilo en segundo plano mide su salud y latencia; las sesiones
+de navegador reciben un circuito sano (a través de ProxyPool) sin iniciar,
+detener ni probar Tor durante la petición.
+
+El mismo hilo rota las identidades (NEWNYM) según las políticas configuradas:
+cada N peticiones, al detectar un bloqueo o cada cierto tiempo. Un circuito
+que rota sale de la rotación hasta tener su nueva salida verificada, de modo
+que siempre queda otro circuito listo para las sesiones nuevas.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+from .tor_manager import TorManager
+
+
+class TorCircuit:
+    """Instancia de Tor administrada por el pool"""
+
+    def __init__(self, index: int, manager: TorManager):
+        self.index = index
+        self.manager = manager
+        self.healthy = False
+        self.latency: Optional[float] = None
+        self.exit_ip: Optional[str] = None
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.failures = 0
+        self.requests = 0
+        self.blocks = 0
+        self.requests_since_rotation = 0
+        self.rotated_at = time.time()
+        self.rotations = 0
+        # Motivo de la rotación pendiente o en curso
+        self.rotate_reason: Optional[str] = None
+
+    @property
+    def socks_port(self) -> int:
+        return self.manager.tor_port
+
+    def to_dict(self) -> Dict:
+        return {
+            "indice": self.index,
+            "puerto_socks": self.socks_port,
+            "sano": self.healthy,
+            "latencia_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "ip_salida": self.exit_ip,
+            "fallos_seguidos": self.failures,
+            "peticiones": self.requests,
+            "bloqueos": self.blocks,
+            "rotaciones": self.rotations,
+            "rotando": self.rotate_reason,
+            "ultimo_error": self.last_error,
+        }
+
+
+class TorPool:
+    """Mantiene varias instancias de Tor sanas y con identidades renovadas"""
+
+    def __init__(
+        self,
+        size: int = 2,
+        base_socks_port: int = 9050,
+        base_control_port: int = 9051,
+        data_dir: str = ".tor",
+        check_interval: float = 60,
+        check_timeout: float = 30,
+        max_failures: int = 2,
+        tor_password: Optional[str] = None,
+        rotate_after_requests: int = 0,
+        rotate_interval: float = 0,
+        rotate_on_block: bool = True,
+        on_retire: Optional[Callable[["TorCircuit", str], None]] = None
+    ):
+        """
+        Args:
+            size: Número de instancias de Tor
+            base_socks_port: Puerto SOCKS de la primera instancia (las siguientes suman 2)
+            base_control_port: Puerto de control de la primera instancia (las siguientes suman 2)
+            data_dir: Directorio base para los datos de cada instancia
+            check_interval: Segundos entre verificaciones de salud
+            check_timeout: Timeout de la petición de verificación
+            max_failures: Verificaciones fallidas seguidas para considerar un circuito caído
+            tor_password: Contraseña del puerto de control (si no, autenticación por cookie)
+            rotate_after_requests: Peticiones tras las cuales se rota la identidad (0 = nunca)
+            rotate_interval: Segundos tras los cuales se rota la identidad (0 = nunca)
+            rotate_on_block: Si se rota la identidad al detectar un bloqueo o CAPTCHA
+            on_retire: Callback (circuito, motivo) cuando un circuito cae o sale de la
+                rotación; las sesiones que lo usan deben dejar de usarlo
+        """
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.max_failures = max_failures
+        self.rotate_after_requests = rotate_after_requests
+        self.rotate_interval = rotate_interval
+        self.rotate_on_block = rotate_on_block
+        self.on_retire = on_retire
+
+        # La primera instancia usa los puertos configurados: si ya hay un Tor del
+        # sistema escuchando en ellos, se reutiliza
+        self.circuits: List[TorCircuit] = [
+            TorCircuit(i, TorManager(
+                tor_port=base_socks_port + 2 * i,
+                control_port=base_control_port + 2 * i,
+                tor_password=tor_password,
+                data_dir=str(Path(data_dir) / f"tor-{i}")
+            ))
+            for i in range(max(1, size))
+        ]
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Verificaciones y rotaciones comparten hilos: hasta dos tareas por circuito
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.circuits), thread_name_prefix="tor-check")
+        self._rotating: List[TorCircuit] = []
+
+        # Qué salida atendió cada petición, para correlacionar bloqueos por salida
+        self.history: Deque[Dict] = deque(maxlen=200)
+        self._exits: Dict[str, Dict[str, int]] = {}
+
+    def start(self):
+        """Inicia las instancias y la verificación de salud en segundo plano"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="tor-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene la verificación de salud y las instancias iniciadas por el pool"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for circuit in self.circuits:
+            circuit.manager.stop_tor()
+            circuit.healthy = False
+
+    def _loop(self):
+        # Las instancias arrancan en paralelo: cada una puede tardar decenas de segundos
+        list(self._executor.map(lambda c: c.manager.start_tor(), self.circuits))
+        next_check = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_check:
+                    self.run_once()
+                    next_check = time.monotonic() + self.check_interval
+                self._start_rotations()
+            except Exception as e:
+                print(f"⚠ Error verificando circuitos Tor: {str(e)}")
+            # Un bloqueo despierta el hilo para rotar sin esperar al siguiente ciclo
+            self._wake.wait(max(0.0, min(next_check - time.monotonic(), 10.0)))
+            self._wake.clear()
+
+    def run_once(self):
+        """Verifica todos los circuitos en paralelo"""
+        list(self._executor.map(self._check, self.circuits))
+
+    def _check(self, circuit: TorCircuit):
+        """Mide la salud y latencia de un circuito y reinicia la instancia si murió"""
+        if self._stop.is_set():
+            return
+
+        manager = circuit.manager
+        if not manager.is_tor_running():
+            if manager.tor_process is not None and manager.tor_process.poll() is not None:
+                print(f"⚠ Tor #{circuit.index} terminó, reiniciando...")
+                manager.tor_process = None
+            if manager.tor_process is None:
+                manager.start_tor()
+
+        try:
+            result = manager.check(timeout=self.check_timeout)
+            ok = result["is_tor"]
+            error = None if ok else "la salida no es Tor"
+        except Exception as e:
+            ok, result, error = False, None, str(e)
+
+        with self._lock:
+            was_healthy = circuit.healthy
+            circuit.last_check = time.time()
+            circuit.last_error = error
+            if ok:
+                circuit.failures = 0
+                circuit.healthy = True
+                circuit.exit_ip = result["ip"]
+                # Promedio móvil para no reaccionar a una sola medición lenta
+                latency = result["latency"]
+                circuit.latency = latency if circuit.latency is None else 0.7 * circuit.latency + 0.3 * latency
+            else:
+                circuit.failures += 1
+                if circuit.failures >= self.max_failures:
+                    circuit.healthy = False
+
+        if was_healthy and not circuit.healthy:
+            print(f"⚠ Circuito Tor #{circuit.index} no responde: {error}")
+            if self.on_retire:
+                self.on_retire(circuit, f"circuito Tor #{circuit.index} caído")
+        elif ok and not was_healthy:
+            print(f"🧅 Circuito Tor #{circuit.index} listo (salida {circuit.exit_ip}, {circuit.latency:.1f}s)")
+
+    def request_rotation(self, circuit: TorCircuit, reason: str):
+        """Programa la rotación de la identidad de un circuito (no bloquea)"""
+        with self._lock:
+            if circuit.rotate_reason is None:
+                circuit.rotate_reason = reason
+        self._wake.set()
+
+    def _start_rotations(self):
+        """Lanza en segundo plano las rotaciones pendientes y las vencidas por tiempo"""
+        now = time.time()
+        to_start = []
+        with self._lock:
+            for circuit in self.circuits:
+                if (
+                    self.rotate_interval and circuit.rotate_reason is None
+                    and now - circuit.rotated_at >= self.rotate_interval
+                ):
+                    circuit.rotate_reason = f"{self.rotate_interval:.0f}s desde la última rotación"
+
+            for circuit in self.circuits:
+                if circuit.rotate_reason is None or circuit in self._rotating:
+                    continue
+                # Salvo ante un bloqueo, se rota sólo si otro circuito queda disponible
+                others = [
+                    c for c in self.circuits
+                    if c is not circuit and c.healthy and c not in self._rotating
+                ]
+                if not others and not circuit.rotate_reason.startswith("bloqueo"):
+                    continue
+                self._rotating.append(circuit)
+                to_start.append(circuit)
+
+        for circuit in to_start:
+            print(f"🔄 Rotando identidad del circuito Tor #{circuit.index}: {circuit.rotate_reason}")
+            if self.on_retire:
+                self.on_retire(circuit, f"rotación del circuito Tor #{circuit.index}")
+            self._executor.submit(self._rotate, circuit)
+
+    def _rotate(self, circuit: TorCircuit):
+        """Pide una identidad nueva y devuelve el circuito a la rotación cuando está verificado"""
+        try:
+            previous_exit = circuit.exit_ip
+            if circuit.manager.get_new_identity(wait_seconds=0):
+                # Tor necesita unos segundos para construir circuitos nuevos
+                self._stop.wait(5)
+            self._check(circuit)
+            if circuit.exit_ip == previous_exit:
+                print(f"⚠ El circuito Tor #{circuit.index} conserva la salida {previous_exit}")
+            with self._lock:
+                circuit.rotations += 1
+                circuit.requests_since_rotation = 0
+                circuit.rotated_at = time.time()
+        finally:
+            with self._lock:
+                circuit.rotate_reason = None
+                if circuit in self._rotating:
+                    self._rotating.remove(circuit)
+
+    def record_request(self, circuit: TorCircuit, blocked: bool = False):
+        """
+        Registra qué circuito y salida atendió una petición
+
+        Aplica las políticas de rotación por número de peticiones y por bloqueo.
+        """
+        with self._lock:
+            circuit.requests += 1
+            circuit.requests_since_rotation += 1
+            exit_ip = circuit.exit_ip or "desconocida"
+            exit_stats = self._exits.setdefault(exit_ip, {"peticiones": 0, "bloqueos": 0})
+            exit_stats["peticiones"] += 1
+            if blocked:
+                circuit.blocks += 1
+                exit_stats["bloqueos"] += 1
+            self.history.append({
+                "momento": time.time(),
+                "circuito": circuit.index,
+                "salida": exit_ip,
+                "bloqueado": blocked,
+            })
+            over_limit = (
+                self.rotate_after_requests
+                and circuit.requests_since_rotation >= self.rotate_after_requests
+            )
+
+        if blocked:
+            print(f"⛔ Bloqueo detectado en el circuito Tor #{circuit.index} (salida {exit_ip})")
+            if self.rotate_on_block:
+                self.request_rotation(circuit, f"bloqueo en la salida {exit_ip}")
+        elif over_limit:
+            self.request_rotation(circuit, f"{self.rotate_after_requests} peticiones")
+
+    def is_available(self, circuit: TorCircuit) -> bool:
+        """Indica si el circuito puede asignarse a una sesión nueva (sano y sin rotar)"""
+        with self._lock:
+            return circuit.healthy and circuit not in self._rotating
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sanos": sum(1 for c in self.circuits if c.healthy),
+                "circuitos": [c.to_dict() for c in self.circuits],
+                "salidas": {
+                    ip: {**counts, "tasa_bloqueo": round(counts["bloqueos"] / counts["peticiones"], 3)}
+                    for ip, counts in self._exits.items()
+                },
+            }
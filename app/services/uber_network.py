@@ -0,0 +1,159 @@
+"""
+Captura de tarifas de Uber desde las respuestas de red
+
+La página de tarifas de m.uber.com pide los productos y sus precios a su API
+(GraphQL) y luego los dibuja. Con el log de rendimiento de Chrome activado
+(`goog:loggingPrefs`) se ven esas respuestas a través de DevTools: apenas
+llega la respuesta con los productos se lee su cuerpo y se devuelven tipo de
+viaje, precio y tiempo de espera, sin esperar al render ni depender de las
+clases CSS de la página. Si no llega ninguna respuesta reconocible el scraper
+vuelve a leer el DOM.
+
+El parser puede ejecutarse sin navegador sobre una respuesta guardada:
+
+    python -m app.services.uber_network respuesta.json
+"""
+import base64
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Fragmentos de URL de las peticiones que pueden traer las tarifas
+FARE_URL_MARKERS = ("graphql", "fare", "product")
+
+
+def parse_fare_payload(payload: Any) -> List[Dict]:
+    """
+    Extrae las opciones de viaje de una respuesta JSON de la app de Uber
+
+    Recorre la respuesta buscando productos: objetos con nombre visible y
+    tarifa (`fare`, `fares` o `fareString`), sin depender de la ruta exacta.
+
+    Returns:
+        Lista de diccionarios con el mismo formato que UberScraper._extract_prices
+    """
+    results: List[Dict] = []
+    seen = set()
+
+    def walk(node: Any):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+
+        name = node.get("displayName") or node.get("productName")
+        fares = node.get("fares") if isinstance(node.get("fares"), list) else []
+        price = node.get("fare") or node.get("fareString") or next(
+            (f.get("fare") for f in fares if isinstance(f, dict) and f.get("fare")), None
+        )
+        if isinstance(name, str) and isinstance(price, str) and name.strip() and price.strip():
+            eta = node.get("etaStringShort") or node.get("etaString") or ""
+            key = (name.strip(), price.strip())
+            if key not in seen:
+                seen.add(key)
+                ride = {
+                    "tipo_viaje": name.strip(),
+                    "precio": price.strip(),
+                    "tiempo_espera": eta.strip() if isinstance(eta, str) else "",
+                }
+                # Si la API trae el monto numérico se usa en vez de leerlo del texto
+                if isinstance(node.get("fareAmountE5"), (int, float)):
+                    ride["precio_valor"] = node["fareAmountE5"] / 1e5
+                if isinstance(node.get("currencyCode"), str):
+                    ride["moneda"] = node["currencyCode"]
+                results.append(ride)
+            return
+
+        for value in node.values():
+            walk(value)
+
+    walk(payload)
+    return results
+
+
+class FareCapture:
+    """Lee del log de rendimiento de Chrome las respuestas con tarifas"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.available = True
+
+    def drain(self):
+        """Descarta los eventos acumulados (navegaciones anteriores)"""
+        try:
+            self.driver.get_log("performance")
+        except Exception:
+            # El navegador no se creó con el log de rendimiento activado
+            self.available = False
+
+    def wait_for_fares(self, timeout: float = 15) -> List[Dict]:
+        """
+        Espera la respuesta de la API con las tarifas
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            Opciones de viaje, o lista vacía si no llegó ninguna respuesta reconocible
+        """
+        if not self.available:
+            return []
+
+        candidates: Dict[str, str] = {}
+        expires = time.monotonic() + timeout
+        while time.monotonic() < expires:
+            try:
+                entries = self.driver.get_log("performance")
+            except Exception:
+                return []
+
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])["message"]
+                except (KeyError, ValueError):
+                    continue
+                method = message.get("method")
+                params = message.get("params", {})
+
+                if method == "Network.responseReceived":
+                    response = params.get("response", {})
+                    url = response.get("url", "").lower()
+                    if "json" in response.get("mimeType", "") and any(m in url for m in FARE_URL_MARKERS):
+                        candidates[params.get("requestId")] = url
+                elif method == "Network.loadingFinished" and params.get("requestId") in candidates:
+                    fares = self._read_fares(params["requestId"])
+                    if fares:
+                        return fares
+            time.sleep(0.2)
+        return []
+
+    def _read_fares(self, request_id: str) -> List[Dict]:
+        body = self._response_body(request_id)
+        if body is None:
+            return []
+        try:
+            return parse_fare_payload(json.loads(body))
+        except ValueError:
+            return []
+
+    def _response_body(self, request_id: str) -> Optional[str]:
+        try:
+            result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception:
+            return None
+        if result.get("base64Encoded"):
+            return base64.b64decode(result["body"]).decode("utf-8", errors="replace")
+        return result.get("body")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m app.services.uber_network respuesta.json")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        parsed = parse_fare_payload(json.load(f))
+    print(json.dumps(parsed, indent=2, ensure_ascii=False))
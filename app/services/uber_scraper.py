@@ -1,25 +1,92 @@
-import json
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
+from .browser_pool import BrowserSession
+from .html_extract import parse_uber_prices, with_price_value
+from .scheduler import Preempted
+from .uber_session import UberCookies, UberLogin
+from .place_cache import PlaceCache, ResolvedPlace
+from .uber_network import FareCapture
+
+# Campo de origen del formulario de tarifas: si está vacío la sesión está lista para cotizar
+PICKUP_INPUT = "input[data-testid='dotcom-ui.pickup-destination.input.pickup']"
+
+# Campo del formulario y parámetro de la URL donde m.uber.com deja el lugar elegido
+LOCATION_FIELDS = {
+    "pickup": "dotcom-ui.pickup-destination.input.pickup",
+    "drop[0]": "dotcom-ui.pickup-destination.input.destination.drop0",
+}
+FARES_URL = "https://m.uber.com/go/product-selection"
+
+# Lee todas las opciones de viaje en una sola llamada a execute_script (en vez
+# de 3 consultas WebDriver por botón); devuelve null mientras no haya ninguna
+RIDE_OPTIONS_SCRIPT = """
+const pick = (root, selector) => {
+    const el = root.querySelector(selector);
+    return el ? el.innerText.trim() : "";
+};
+const seen = new Set();
+const options = [];
+for (const option of document.querySelectorAll("div[role='button']")) {
+    const tipo_viaje = pick(option, "h3, h4, div[class*='title'], div[class*='name']");
+    const precio = pick(option, "p.css-iQlrzm, p[class*='price'], span[class*='price']");
+    const tiempo_espera = pick(option, "p[class*='time'], span[class*='time'], div[class*='time']");
+    const key = tipo_viaje + "|" + precio;
+    if (tipo_viaje && precio && !seen.has(key)) {
+        seen.add(key);
+        options.push({tipo_viaje, precio, tiempo_espera});
+    }
+}
+return options.length ? options : null;
+"""
 
 
 class UberScraper:
-    def __init__(self, headless: bool = True, timeout: int = 30, cookies_file: str = "galleta_uber.json"):
+    def __init__(
+        self,
+        headless: bool = True,
+        timeout: int = 30,
+        cookies_file: str = "galleta_uber.json",
+        session: Optional[BrowserSession] = None,
+        user_data_dir: Optional[str] = None,
+        proxy_server: Optional[str] = None,
+        extra_arguments: Optional[List[str]] = None,
+        extraction_mode: str = "dom",
+        cookies: Optional[UberCookies] = None,
+        places: Optional[PlaceCache] = None,
+        network_capture: bool = False
+    ):
         self.headless = headless
         self.timeout = timeout
         self.cookies_file = cookies_file
+        # Las sesiones del pool comparten las cookies ya leídas del archivo
+        self.cookies = cookies or UberCookies(cookies_file)
+        self.places = places
+        # Leer las tarifas de las respuestas de la API (log de rendimiento de Chrome)
+        self.network_capture = network_capture
+        self.session = session
+        self.user_data_dir = user_data_dir
+        self.proxy_server = proxy_server
+        self.extra_arguments = extra_arguments or []
+        self.extraction_mode = extraction_mode
         self.driver = None
+        self.progress: Optional[Callable[[str], None]] = None
+
+    def _phase(self, name: str):
+        """Notifica el inicio de una fase de la cotización al callback de progreso"""
+        if self.progress is not None:
+            self.progress(name)
 
     def _setup_driver(self):
-        """Configura el WebDriver de Chrome"""
+        """Configura el WebDriver de Chrome y lo devuelve"""
         chrome_options = webdriver.ChromeOptions()
 
         if self.headless:
@@ -30,6 +97,18 @@ class UberScraper:
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
+        if self.user_data_dir:
+            # Perfil persistente: caché de la app web y cookies de sesión
+            chrome_options.add_argument(f'--user-data-dir={self.user_data_dir}')
+            chrome_options.add_argument('--no-first-run')
+            chrome_options.add_argument('--no-default-browser-check')
+            chrome_options.add_argument('--hide-crash-restore-bubble')
+        if self.proxy_server:
+            chrome_options.add_argument(f'--proxy-server={self.proxy_server}')
+        for argument in self.extra_arguments:
+            chrome_options.add_argument(argument)
+        if self.network_capture:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         chrome_options.add_argument('user-agent=Mozilla/5.0 (Linux; Android 10; Pixel 3) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36')
 
         driver_path = ChromeDriverManager().install()
@@ -49,49 +128,84 @@ class UberScraper:
         service = Service(driver_path)
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         self.driver.set_page_load_timeout(self.timeout)
+        return self.driver
 
     def _load_cookies(self):
-        """Carga las cookies desde el archivo JSON"""
+        """Carga las cookies del archivo en el navegador y registra el login en la sesión"""
         try:
-            cookies_path = Path(self.cookies_file)
-            if not cookies_path.exists():
-                print(f"Archivo de cookies no encontrado: {self.cookies_file}")
+            try:
+                cookies = self.cookies.current()
+            except FileNotFoundError:
+                print(f"Archivo de cookies no encontrado: {self.cookies.path}")
                 return False
 
-            with open(cookies_path, 'r', encoding='utf-8') as f:
-                cookies = json.load(f)
-
             self.driver.get("https://m.uber.com")
             time.sleep(2)
 
-            for cookie in cookies:
+            for cookie_dict in cookies:
                 try:
-                    cookie_dict = {
-                        'name': cookie.get('name'),
-                        'value': cookie.get('value'),
-                        'domain': cookie.get('domain', '.uber.com'),
-                    }
-                    if cookie.get('path'):
-                        cookie_dict['path'] = cookie['path']
-                    if cookie.get('expirationDate'):
-                        cookie_dict['expiry'] = int(cookie['expirationDate'])
-                    if 'httpOnly' in cookie:
-                        cookie_dict['httpOnly'] = cookie['httpOnly']
-                    if 'secure' in cookie:
-                        cookie_dict['secure'] = cookie['secure']
-
                     self.driver.add_cookie(cookie_dict)
                 except Exception as e:
-                    print(f"Error agregando cookie {cookie.get('name')}: {str(e)}")
+                    print(f"Error agregando cookie {cookie_dict.get('name')}: {str(e)}")
                     continue
 
+            if self.session is not None:
+                self.session.login = UberLogin(self.cookies.version, self.cookies.expires_at)
             return True
         except Exception as e:
             print(f"Error cargando cookies: {str(e)}")
             return False
 
-    def _enter_location(self, test_id: str, location: str):
-        """Ingresa una ubicación en el campo de entrada"""
+    def _has_login(self) -> bool:
+        """Indica si la sesión del pool ya tiene cargadas las cookies vigentes"""
+        return (
+            self.session is not None and self.session.login is not None
+            and self.session.login.valid(self.cookies)
+        )
+
+    def _on_fare_form(self) -> bool:
+        """Indica si el navegador está en el formulario de tarifas con el origen vacío"""
+        try:
+            if "m.uber.com" not in self.driver.current_url:
+                return False
+            inputs = self.driver.find_elements(By.CSS_SELECTOR, PICKUP_INPUT)
+            return bool(inputs) and not inputs[0].get_attribute("value")
+        except Exception:
+            return False
+
+    def _open_fare_form(self) -> bool:
+        """
+        Deja el navegador en el formulario de tarifas (sin navegar si ya está ahí)
+
+        Returns:
+            True si el formulario está listo
+        """
+        if self._on_fare_form():
+            return True
+        self.driver.get("https://m.uber.com")
+        try:
+            WebDriverWait(self.driver, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, PICKUP_INPUT))
+            )
+            return True
+        except TimeoutException:
+            return False
+
+    def _logged_out(self) -> bool:
+        """Indica si Uber redirigió al login (las cookies ya no sirven)"""
+        try:
+            url = self.driver.current_url
+        except Exception:
+            return False
+        return "auth.uber.com" in url or "/login" in url
+
+    def _enter_location(self, test_id: str, location: str) -> Optional[str]:
+        """
+        Ingresa una ubicación en el campo de entrada y elige la primera sugerencia
+
+        Returns:
+            Texto de la sugerencia elegida, o None si no hubo sugerencias
+        """
         from selenium.common.exceptions import StaleElementReferenceException
 
         try:
@@ -123,10 +237,13 @@ class UberScraper:
                     EC.element_to_be_clickable((By.CSS_SELECTOR, "li[role='option']"))
                 )
                 time.sleep(0.5)
+                suggestion_text = suggestion.text.strip()
                 self.driver.execute_script("arguments[0].click();", suggestion)
                 time.sleep(2)
+                return suggestion_text
             except TimeoutException:
                 print(f"No se encontraron sugerencias para: {location}")
+                return None
 
         except Exception as e:
             print(f"Error ingresando ubicación {test_id}: {str(e)}")
@@ -134,8 +251,58 @@ class UberScraper:
             print(f"Screenshot guardado en uber_error_{test_id}.png")
             raise
 
-    def _click_search_button(self):
-        """Hace clic en el botón de búsqueda"""
+    def _selected_place(self, param: str, suggestion: Optional[str]) -> Optional[ResolvedPlace]:
+        """Lugar elegido en el formulario, leído del parámetro `param` de la URL"""
+        if suggestion is None:
+            return None
+        values = parse_qs(urlsplit(self.driver.current_url).query).get(param)
+        return ResolvedPlace(suggestion, values[0]) if values else None
+
+    def _resolve_locations(self, locations: Dict[str, str]) -> Dict[str, ResolvedPlace]:
+        """
+        Resuelve las ubicaciones: desde la caché o escribiéndolas en el formulario
+
+        Las que se escriben se guardan en la caché. Si alguna no pudo resolverse
+        se escriben en el formulario las que faltan, para cotizar por la vía normal.
+
+        Args:
+            locations: Texto de cada ubicación por parámetro de la URL (pickup, drop[0])
+
+        Returns:
+            Lugar resuelto por parámetro (sólo los que se pudieron resolver)
+        """
+        resolved: Dict[str, ResolvedPlace] = {}
+        typed = set()
+        for param, text in locations.items():
+            self._phase("origen" if param == "pickup" else "destino")
+            place = self.places.get(text) if self.places is not None else None
+            if place is None:
+                suggestion = self._enter_location(LOCATION_FIELDS[param], text)
+                typed.add(param)
+                place = self._selected_place(param, suggestion)
+                if place is not None and self.places is not None:
+                    self.places.put(text, place)
+            if place is not None:
+                resolved[param] = place
+
+        if len(resolved) < len(locations):
+            for param, text in locations.items():
+                if param not in typed:
+                    self._enter_location(LOCATION_FIELDS[param], text)
+        return resolved
+
+    def _open_fares(self, resolved: Dict[str, ResolvedPlace]):
+        """Abre directamente la página de tarifas con los lugares ya resueltos"""
+        query = urlencode({param: place.param for param, place in resolved.items()})
+        self.driver.get(f"{FARES_URL}?{query}")
+
+    def _click_search_button(self, settle: float = 4):
+        """
+        Hace clic en el botón de búsqueda
+
+        Args:
+            settle: Segundos de espera tras el clic para que se dibujen las tarifas
+        """
         try:
             wait = WebDriverWait(self.driver, 10)
             search_button = wait.until(
@@ -150,7 +317,7 @@ class UberScraper:
             except Exception:
                 self.driver.execute_script("arguments[0].click();", search_button)
 
-            time.sleep(4)
+            time.sleep(settle)
         except Exception as e:
             print(f"Error haciendo clic en buscar: {str(e)}")
             raise
@@ -159,35 +326,15 @@ class UberScraper:
         """Extrae los precios de los diferentes tipos de viaje"""
         results = []
         try:
-            time.sleep(3)
             wait = WebDriverWait(self.driver, 15)
 
-            ride_options = wait.until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div[role='button']"))
-            )
-
-            for option in ride_options:
-                try:
-                    ride_info = {}
-
-                    ride_name = option.find_element(By.CSS_SELECTOR, "h3, h4, div[class*='title'], div[class*='name']")
-                    ride_info["tipo_viaje"] = ride_name.text.strip() if ride_name else ""
-
-                    price_element = option.find_element(By.CSS_SELECTOR, "p.css-iQlrzm, p[class*='price'], span[class*='price']")
-                    price_text = price_element.text.strip() if price_element else ""
-                    ride_info["precio"] = price_text
+            if self.extraction_mode == "snapshot":
+                wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div[role='button']")))
+                # Una sola lectura del HTML en lugar de 3 consultas por botón
+                return parse_uber_prices(self.driver.page_source)
 
-                    try:
-                        time_element = option.find_element(By.CSS_SELECTOR, "p[class*='time'], span[class*='time'], div[class*='time']")
-                        ride_info["tiempo_espera"] = time_element.text.strip() if time_element else ""
-                    except NoSuchElementException:
-                        ride_info["tiempo_espera"] = ""
-
-                    if ride_info["tipo_viaje"] and ride_info["precio"]:
-                        results.append(ride_info)
-
-                except NoSuchElementException:
-                    continue
+            # Se reintenta el script hasta que aparezca al menos una opción con precio
+            results = wait.until(lambda driver: driver.execute_script(RIDE_OPTIONS_SCRIPT) or False)
 
         except TimeoutException:
             print("No se encontraron opciones de viaje")
@@ -196,40 +343,70 @@ class UberScraper:
 
         return results
 
-    def get_ride_prices(self, pickup_location: str, destination: str) -> Dict:
+    def get_ride_prices(
+        self,
+        pickup_location: str,
+        destination: str,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> Dict:
         """
         Obtiene los precios de viaje de Uber
 
         Args:
             pickup_location: Ubicación de recogida
             destination: Destino
+            progress: Callback que recibe el nombre de cada fase alcanzada
 
         Returns:
             Dict con los resultados
         """
+        self.progress = progress
         try:
-            self._setup_driver()
-
-            if not self._load_cookies():
+            self._phase("navegador")
+            if self.session is not None:
+                self.driver = self.session.driver
+            else:
+                self._setup_driver()
+
+            # Las sesiones del pool ya tienen las cookies cargadas y esperan en el formulario
+            self._phase("cookies")
+            if not self._has_login() and not self._load_cookies():
                 return {
                     "success": False,
                     "error": "No se pudieron cargar las cookies",
                     "resultados": []
                 }
 
-            self.driver.get("https://m.uber.com")
-            time.sleep(5)
-
-            wait = WebDriverWait(self.driver, 20)
-            wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
-            time.sleep(2)
-
-            self._enter_location("dotcom-ui.pickup-destination.input.pickup", pickup_location)
-            self._enter_location("dotcom-ui.pickup-destination.input.destination.drop0", destination)
-
-            self._click_search_button()
-
-            prices = self._extract_prices()
+            self._phase("pagina")
+            if not self._open_fare_form():
+                if self.session is not None and self._logged_out() and self.session.login is not None:
+                    self.session.login.lost = True
+                raise TimeoutException("No cargó el formulario de tarifas de Uber")
+
+            locations = {"pickup": pickup_location, "drop[0]": destination}
+            resolved = self._resolve_locations(locations)
+
+            self._phase("tarifas")
+            capture = FareCapture(self.driver) if self.network_capture else None
+            if capture is not None:
+                capture.drain()
+            if len(resolved) == len(locations):
+                # Con los dos lugares resueltos se va directo a las tarifas
+                self._open_fares(resolved)
+            else:
+                self._click_search_button(settle=0 if capture is not None and capture.available else 4)
+
+            self._phase("precios")
+            # Las tarifas llegan primero por la red; el DOM queda como respaldo
+            prices = capture.wait_for_fares(timeout=15) if capture is not None else []
+            if not prices:
+                prices = self._extract_prices()
+            prices = [with_price_value(ride) for ride in prices]
+            if not prices and len(resolved) == len(locations) and self.places is not None:
+                # Un lugar guardado que ya no produce tarifas se vuelve a resolver la próxima vez
+                for text in locations.values():
+                    self.places.invalidate(text)
+            self._phase("fin")
 
             return {
                 "success": True,
@@ -239,6 +416,8 @@ class UberScraper:
                 "total_opciones": len(prices)
             }
 
+        except Preempted:
+            raise
         except Exception as e:
             return {
                 "success": False,
@@ -246,5 +425,5 @@ class UberScraper:
                 "resultados": []
             }
         finally:
-            if self.driver:
+            if self.driver and self.session is None:
                 self.driver.quit()
@@ -0,0 +1,235 @@
+"""
+Sesiones de Uber con login persistente
+
+Las cookies de `galleta_uber.json` se leen una sola vez (y de nuevo sólo si el
+archivo cambia) y se cargan en cada navegador del pool de Uber al crearlo. La
+sesión queda estacionada en el formulario de tarifas de m.uber.com, de modo
+que una cotización sólo ingresa origen y destino y lee los precios.
+
+Un hilo en segundo plano revisa las sesiones libres: carga en ellas las
+cookies nuevas apenas se actualiza el archivo (sin esperar a una cotización),
+avisa cuando el login está por vencer, recicla las sesiones que perdieron el
+login y devuelve al formulario las que quedaron en otra página. Además, cada
+sesión se devuelve al formulario vacío apenas termina una cotización (que la
+deja en la página de tarifas), fuera del hilo de la petición.
+"""
+import json
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from .browser_pool import BrowserPool, BrowserSession
+
+# Cookies que sostienen el login; su vencimiento es el de la sesión
+AUTH_COOKIES = ("sid", "csid", "jwt-session")
+
+
+class UberCookies:
+    """Cookies del archivo exportado, convertidas una sola vez al formato de Selenium"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._cookies: List[Dict] = []
+        self._version: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self.reloads = 0
+
+    @property
+    def version(self) -> Optional[float]:
+        """Fecha de modificación del archivo leído (None si no se ha leído)"""
+        return self._version
+
+    def current(self) -> List[Dict]:
+        """
+        Cookies vigentes del archivo (se vuelve a leer sólo si cambió)
+
+        Raises:
+            FileNotFoundError: Si el archivo de cookies no existe
+        """
+        mtime = self.path.stat().st_mtime
+        with self._lock:
+            if mtime != self._version:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                self._cookies = [self._to_selenium(cookie) for cookie in raw if cookie.get('name')]
+                self._version = mtime
+                self.expires_at = self._expiry(raw)
+                self.reloads += 1
+                print(f"🍪 Cookies de Uber leídas ({len(self._cookies)} cookies)")
+            return list(self._cookies)
+
+    @staticmethod
+    def _to_selenium(cookie: Dict) -> Dict:
+        cookie_dict = {
+            'name': cookie.get('name'),
+            'value': cookie.get('value'),
+            'domain': cookie.get('domain', '.uber.com'),
+        }
+        if cookie.get('path'):
+            cookie_dict['path'] = cookie['path']
+        if cookie.get('expirationDate'):
+            cookie_dict['expiry'] = int(cookie['expirationDate'])
+        if 'httpOnly' in cookie:
+            cookie_dict['httpOnly'] = cookie['httpOnly']
+        if 'secure' in cookie:
+            cookie_dict['secure'] = cookie['secure']
+        return cookie_dict
+
+    @staticmethod
+    def _expiry(raw: List[Dict]) -> Optional[float]:
+        """Vencimiento del login: el de las cookies de autenticación, o el más próximo"""
+        expiring = [c for c in raw if c.get('expirationDate')]
+        auth = [c for c in expiring if c.get('name') in AUTH_COOKIES]
+        candidates = auth or expiring
+        return min(float(c['expirationDate']) for c in candidates) if candidates else None
+
+    def expires_in(self) -> Optional[float]:
+        """Segundos hasta que venza el login (negativo si ya venció)"""
+        return self.expires_at - time.time() if self.expires_at is not None else None
+
+
+class UberLogin:
+    """Estado del login de una sesión del pool de Uber"""
+
+    def __init__(self, version: Optional[float], expires_at: Optional[float]):
+        self.version = version
+        self.expires_at = expires_at
+        self.loaded_at = time.time()
+        self.lost = False
+
+    def valid(self, cookies: UberCookies, margin: float = 0) -> bool:
+        """Indica si la sesión tiene las cookies actuales del archivo y no están por vencer"""
+        if self.lost or self.version != cookies.version:
+            return False
+        return self.expires_at is None or self.expires_at - time.time() > margin
+
+
+class UberSessionKeeper:
+    """Mantiene las sesiones del pool de Uber con login y en el formulario de tarifas"""
+
+    def __init__(
+        self,
+        pool: BrowserPool,
+        cookies: UberCookies,
+        interval: float = 60,
+        refresh_margin: float = 3600,
+        prewarm: int = 1
+    ):
+        """
+        Args:
+            pool: Pool de navegadores de Uber
+            cookies: Archivo de cookies compartido por las sesiones
+            interval: Segundos entre revisiones de las sesiones libres
+            refresh_margin: Segundos antes del vencimiento a partir de los cuales se avisa
+            prewarm: Sesiones que se crean al iniciar, antes de la primera cotización
+        """
+        self.pool = pool
+        self.cookies = cookies
+        self.interval = interval
+        self.refresh_margin = refresh_margin
+        self.prewarm = prewarm
+        self.refreshes = 0
+        self.lost_logins = 0
+        self.parked = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._to_park: Deque[BrowserSession] = deque()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="uber-sessions", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def park(self, session: BrowserSession):
+        """Pide devolver al formulario vacío una sesión que acaba de cotizar"""
+        self._to_park.append(session)
+        self._wake.set()
+
+    def _run(self):
+        self._prewarm()
+        next_check = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_check - time.monotonic()))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                # Si la sesión ya se volvió a prestar no se toca: la cotización abre el formulario
+                while self._to_park:
+                    self.parked += self.pool.maintain(self._maintain, only=self._to_park.popleft())
+                if time.monotonic() >= next_check:
+                    next_check = time.monotonic() + self.interval
+                    self.run_once()
+            except Exception as e:
+                print(f"⚠ Error revisando sesiones de Uber: {str(e)}")
+
+    def _prewarm(self):
+        """Crea las primeras sesiones (con login y en el formulario) antes de que lleguen cotizaciones"""
+        sessions = []
+        try:
+            for _ in range(min(self.prewarm, self.pool.size)):
+                if self._stop.is_set():
+                    break
+                sessions.append(self.pool.acquire(timeout=0))
+        except Exception as e:
+            print(f"⚠ No se pudieron precalentar sesiones de Uber: {str(e)}")
+        for session in sessions:
+            self.pool.release(session)
+
+    def run_once(self):
+        """Relee el archivo de cookies si cambió y revisa las sesiones libres"""
+        try:
+            self.cookies.current()
+        except FileNotFoundError:
+            print(f"⚠ Archivo de cookies de Uber no encontrado: {self.cookies.path}")
+        expires_in = self.cookies.expires_in()
+        if expires_in is not None and expires_in < self.refresh_margin:
+            print(f"⚠ Las cookies de Uber vencen en {max(0, expires_in) / 60:.0f} min: exporte unas nuevas")
+        self.pool.maintain(self._maintain)
+
+    def _maintain(self, session: BrowserSession) -> Optional[str]:
+        """Carga las cookies nuevas si hace falta y estaciona la sesión en el formulario"""
+        from .uber_scraper import UberScraper
+
+        scraper = UberScraper(session=session, cookies=self.cookies)
+        scraper.driver = session.driver
+        login = session.login
+        if login is None or login.lost or login.version != self.cookies.version:
+            if not scraper._load_cookies():
+                return "no se pudieron cargar las cookies de Uber"
+            self.refreshes += 1
+
+        if not scraper._open_fare_form():
+            if scraper._logged_out():
+                session.login.lost = True
+                self.lost_logins += 1
+                return "la sesión de Uber perdió el login"
+            return "no se pudo volver al formulario de tarifas"
+        return None
+
+    def stats(self) -> Dict:
+        sessions = self.pool.sessions()
+        expires_in = self.cookies.expires_in()
+        return {
+            "con_login": sum(
+                1 for s in sessions if s.login is not None and s.login.valid(self.cookies)
+            ),
+            "cookies_vencen_en_segundos": round(expires_in) if expires_in is not None else None,
+            "lecturas_archivo": self.cookies.reloads,
+            "renovaciones": self.refreshes,
+            "logins_perdidos": self.lost_logins,
+            "reestacionadas": self.parked,
+        }
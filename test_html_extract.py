@@ -0,0 +1,97 @@
+"""
+Pruebas del modo snapshot contra páginas de DIGEMID y Uber guardadas
+
+No necesitan navegador ni red: los parsers de app/services/html_extract.py
+se ejecutan sobre el HTML de fixtures/html y se comparan con los diccionarios
+esperados. Si cambian los selectores de DIGEMID o Uber, se guarda la página
+nueva junto a su resultado esperado y se vuelve a correr este archivo.
+
+Ejecutado como script, además mide el tiempo de cada parser.
+"""
+import json
+import timeit
+from pathlib import Path
+
+from selenium.webdriver.common.by import By
+
+from app.services.digemid_scraper import DigemidScraper
+from app.services.html_extract import parse_digemid_results, parse_html, parse_uber_prices
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+
+
+def _fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def _expected(name: str):
+    return json.loads(_fixture(name))
+
+
+class _Element:
+    """Elemento mínimo con la interfaz de WebDriver que usa la extracción DOM"""
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def text(self) -> str:
+        return self.node.text()
+
+    def find_elements(self, by, value):
+        if by == By.TAG_NAME:
+            return [_Element(n) for n in self.node.find_all(lambda n: n.tag == value)]
+        if by == By.CSS_SELECTOR and value == "tbody tr":
+            return [
+                _Element(row)
+                for tbody in self.node.find_all(lambda n: n.tag == "tbody")
+                for row in tbody.find_all(lambda n: n.tag == "tr")
+            ]
+        raise AssertionError(f"La extracción DOM usó un selector que la prueba no reproduce: {by}={value!r}")
+
+
+def test_digemid_snapshot():
+    """Las filas de DIGEMID salen iguales a las esperadas"""
+    html = _fixture("digemid_resultados.html")
+    assert parse_digemid_results(html) == _expected("digemid_resultados.json")
+    assert parse_digemid_results(html, limit=2) == _expected("digemid_resultados.json")[:2]
+
+
+def test_digemid_snapshot_matches_dom():
+    """El modo snapshot devuelve lo mismo que la extracción celda por celda"""
+    html = _fixture("digemid_resultados.html")
+    table = _Element(parse_html(html).find(lambda n: n.tag == "table"))
+    scraper = DigemidScraper(extraction_mode="dom")
+
+    rows = scraper._extract_rows(table, table.find_elements(By.CSS_SELECTOR, "tbody tr"), limit=10)
+    dom = [{**row, **scraper._empty_details()} for row in rows]
+    assert parse_digemid_results(html) == dom
+
+
+def test_digemid_without_table():
+    assert parse_digemid_results("<div class='alert'>No se encontraron resultados</div>") == []
+
+
+def test_uber_snapshot():
+    """Las opciones de Uber salen iguales a las esperadas, sin botones repetidos ni sin precio"""
+    assert parse_uber_prices(_fixture("uber_tarifas.html")) == _expected("uber_tarifas.json")
+
+
+def benchmark(number: int = 200):
+    """Tiempo promedio de cada parser sobre las páginas guardadas"""
+    cases = [
+        ("digemid", parse_digemid_results, _fixture("digemid_resultados.html")),
+        ("uber", parse_uber_prices, _fixture("uber_tarifas.html")),
+    ]
+    for name, parser, html in cases:
+        seconds = timeit.timeit(lambda: parser(html), number=number)
+        print(f"{name:8s} {seconds / number * 1000:.3f} ms por página ({len(html)} bytes)")
+
+
+if __name__ == "__main__":
+    test_digemid_snapshot()
+    test_digemid_snapshot_matches_dom()
+    test_digemid_without_table()
+    test_uber_snapshot()
+    print("✓ Los parsers coinciden con las páginas guardadas")
+    benchmark()
@@ -0,0 +1,71 @@
+"""
+Pruebas del orden en tandas de las cotizaciones en lote de Uber
+
+No necesitan navegador: sólo verifican qué pares se cotizan juntos para que
+cada ubicación nueva se escriba en el formulario una sola vez.
+"""
+from app.api.routes import uber
+from app.models.schemas import UberBatchRequest
+from app.services.place_cache import normalize_place
+from app.services.runtime import runtime
+
+
+def _waves(request: UberBatchRequest, known=()):
+    """Tandas del lote con una caché de lugares que sólo contiene `known`"""
+    class Places:
+        def contains(self, text):
+            return normalize_place(text) in {normalize_place(k) for k in known}
+
+    previous = runtime.uber_places
+    runtime.uber_places = Places()
+    try:
+        pairs = uber._batch_pairs(request)
+        return pairs, uber._batch_waves(pairs)
+    finally:
+        runtime.uber_places = previous
+
+
+def _typed(pairs, waves, known=()):
+    """Cuántas veces se escribe cada ubicación: una por tanda en la que aún no estaba resuelta"""
+    resolved, typed = set(known), {}
+    for wave in waves:
+        new = set()
+        for index in wave:
+            for text in (pairs[index].pickup_location, pairs[index].destination):
+                if text not in resolved:
+                    typed[text] = typed.get(text, 0) + 1
+                    new.add(text)
+        resolved |= new
+    return typed
+
+
+def test_one_origin_many_destinations():
+    """Con un origen y N destinos el origen se resuelve una vez y se reutiliza en la segunda tanda"""
+    destinos = [f"Destino {i}" for i in range(5)]
+    pairs, waves = _waves(UberBatchRequest(origenes=["Plaza de Armas"], destinos=destinos))
+
+    assert waves == [[0], [1, 2, 3, 4]]
+    assert all(count == 1 for count in _typed(pairs, waves).values())
+
+
+def test_matrix_resolves_each_place_once():
+    """En una matriz ninguna ubicación se escribe en dos pares a la vez"""
+    pairs, waves = _waves(UberBatchRequest(origenes=["A", "B", "C"], destinos=["X", "Y"]))
+
+    assert sorted(i for wave in waves for i in wave) == list(range(len(pairs)))
+    assert all(count == 1 for count in _typed(pairs, waves).values())
+
+
+def test_cached_places_share_the_first_wave():
+    """Los pares con todos sus lugares ya en la caché no esperan"""
+    request = UberBatchRequest(origenes=["Plaza de Armas"], destinos=["Destino 0", "Destino 1"])
+    _, waves = _waves(request, known={"Plaza de Armas", "Destino 0", "Destino 1"})
+
+    assert waves == [[0, 1]]
+
+
+if __name__ == "__main__":
+    test_one_origin_many_destinations()
+    test_matrix_resolves_each_place_once()
+    test_cached_places_share_the_first_wave()
+    print("✓ Las tandas resuelven cada ubicación una sola vez")